@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# Agregación por tabla hash para el reducer: suma los conteos de registros
+# "clave\tconteo" sin necesidad de que lleguen ordenados. Si el diccionario
+# supera max_claves claves distintas se vuelca a disco repartido en
+# particiones por hash de la clave (estilo grace hash join) y al final cada
+# partición se agrega por separado; si una partición sigue sin caber se
+# vuelve a partir con otra semilla de hash.
+import os
+import shutil
+import tempfile
+import zlib
+
+import flujo_io
+from ordenacion_externa import abrir_run, fusionar
+
+# A partir de este nivel de recursión se agrega en memoria sin volcar
+MAX_NIVEL = 8
+
+class AgregadorHash:
+    def __init__(self, max_claves=1000000, particiones=16, tmp=None, compresion=None, nivel=0):
+        self.max_claves = max_claves
+        self.num_particiones = particiones
+        self.compresion = compresion
+        self.nivel = nivel
+        self.tmp = tempfile.mkdtemp(prefix="hash{}-".format(nivel), dir=tmp)
+        self.conteos = {}
+        self.particiones = None
+        self.rutas = []
+
+    def agregar(self, lineas):
+        conteos = self.conteos
+        for line in lineas:
+            if not line:
+                continue
+            word, count = line.split(b"\t", 1)
+            conteos[word] = conteos.get(word, 0) + int(count)
+        if len(conteos) >= self.max_claves and self.nivel < MAX_NIVEL:
+            self.volcar()
+
+    # Reparte el contenido del diccionario entre los ficheros de partición
+    def volcar(self):
+        if self.particiones is None:
+            self.rutas = [os.path.join(self.tmp, "particion{}".format(p)) for p in range(self.num_particiones)]
+            self.particiones = [abrir_run(ruta, "wb", self.compresion) for ruta in self.rutas]
+        lotes = [[] for _ in range(self.num_particiones)]
+        for word, count in self.conteos.items():
+            # la semilla cambia con el nivel para que una partición que no
+            # cabe se reparta de otra forma en la siguiente pasada
+            lotes[zlib.crc32(word, self.nivel) % self.num_particiones].append(b"%s\t%d\n" % (word, count))
+        for fichero, lote in zip(self.particiones, lotes):
+            fichero.write(b"".join(lote))
+        self.conteos = {}
+
+    # Pares (clave, conteo) con todos los conteos sumados. Si ordenada es
+    # True salen ordenados por clave; si no, en el orden del diccionario.
+    def resultados(self, ordenada=False):
+        if self.particiones is None:
+            if ordenada:
+                yield from sorted(self.conteos.items())
+            else:
+                yield from self.conteos.items()
+            self.conteos = {}
+            return
+
+        self.volcar()
+        for fichero in self.particiones:
+            fichero.close()
+        if not ordenada:
+            for ruta in self.rutas:
+                yield from self.agregar_particion(ruta, False)
+            return
+
+        # Cada partición se agrega y se escribe ordenada; como las claves de
+        # distintas particiones no se repiten, basta mezclar los resultados
+        ordenadas = []
+        for i, ruta in enumerate(self.rutas):
+            destino = os.path.join(self.tmp, "ordenada{}".format(i))
+            with abrir_run(destino, "wb", self.compresion) as f:
+                f.write(b"".join(b"%s\t%d\n" % par for par in self.agregar_particion(ruta, True)))
+            ordenadas.append(destino)
+        for linea in fusionar(ordenadas, self.compresion):
+            word, count = linea.split(b"\t", 1)
+            yield word, int(count)
+
+    def agregar_particion(self, ruta, ordenada):
+        with AgregadorHash(self.max_claves, self.num_particiones, self.tmp,
+                           self.compresion, self.nivel + 1) as sub:
+            with abrir_run(ruta, "rb", self.compresion) as f:
+                for lineas in flujo_io.leer_lineas(f):
+                    sub.agregar(lineas)
+            os.remove(ruta)
+            yield from sub.resultados(ordenada)
+
+    def cerrar(self):
+        if self.particiones is not None:
+            for fichero in self.particiones:
+                fichero.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+# Benchmark de rendimiento (MB/s) de pymap.py y pyreduce.py: compara la
+# versión original línea a línea (--por-lineas) con la lectura/escritura
+# por bloques de flujo_io.py sobre el_quijote.txt replicado varias veces.
+#
+#   python3 benchmark_io.py --gb 4
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+QUIJOTE = os.path.join(DIRECTORIO, "..", "Spark", "recursos", "el_quijote.txt")
+MB = 1024 * 1024
+
+# Crea un fichero de al menos `tam` bytes repitiendo el texto original
+def replicar(origen, destino, tam):
+    with open(origen, "rb") as f:
+        datos = f.read()
+    if not datos.endswith(b"\n"):
+        datos += b"\n"
+    escritos = 0
+    with open(destino, "wb") as f:
+        while escritos < tam:
+            f.write(datos)
+            escritos += len(datos)
+    return escritos
+
+# Entrada ya ordenada para el reducer, equivalente a la salida del mapper
+# pasada por sort: cada palabra se repite tantas veces como aparece en el
+# texto original multiplicado por el número de réplicas
+def entrada_reducer(origen, destino, tam):
+    with open(origen, "rb") as f:
+        conteos = Counter(f.read().decode("utf-8", "surrogateescape").split())
+    bloque = sum((len(w.encode("utf-8", "surrogateescape")) + 3) * c for w, c in conteos.items())
+    replicas = max(1, -(-tam // bloque))
+    with open(destino, "wb") as f:
+        for word in sorted(w.encode("utf-8", "surrogateescape") for w in conteos):
+            f.write(b"%s\t1\n" % word * (conteos[word.decode("utf-8", "surrogateescape")] * replicas))
+    return os.path.getsize(destino)
+
+# Ejecuta un script con la entrada y salida dadas y devuelve segundos y hash
+# de la salida, para comprobar que ambas versiones producen lo mismo
+def ejecutar(script, opciones, entrada, salida):
+    orden = [sys.executable, os.path.join(DIRECTORIO, script)] + opciones
+    with open(entrada, "rb") as fin, open(salida, "wb") as fout:
+        inicio = time.perf_counter()
+        subprocess.run(orden, stdin=fin, stdout=fout, check=True)
+        segundos = time.perf_counter() - inicio
+    h = hashlib.md5()
+    with open(salida, "rb") as f:
+        for bloque in iter(lambda: f.read(MB), b""):
+            h.update(bloque)
+    return segundos, h.hexdigest()
+
+def medir(nombre, script, entrada, tmp, variantes):
+    tam = os.path.getsize(entrada)
+    hashes = set()
+    for etiqueta, opciones in variantes:
+        segundos, digest = ejecutar(script, opciones, entrada, os.path.join(tmp, "salida"))
+        hashes.add(digest)
+        print("{:<8} {:<22} {:>8.1f} MB {:>8.2f} s {:>8.1f} MB/s".format(
+            nombre, etiqueta, tam / MB, segundos, tam / MB / segundos))
+    if len(hashes) != 1:
+        print("AVISO: las salidas de {} no coinciden".format(nombre))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de E/S de pymap.py y pyreduce.py")
+    parser.add_argument("--fichero", default=QUIJOTE, help="texto que se replica")
+    parser.add_argument("--gb", type=float, default=2.0, help="tamaño de la entrada en GB")
+    parser.add_argument("--tmp", default=None, help="directorio para los ficheros temporales")
+    args = parser.parse_args()
+
+    tam = int(args.gb * 1024 * MB)
+    with tempfile.TemporaryDirectory(dir=args.tmp) as tmp:
+        texto = os.path.join(tmp, "texto.txt")
+        ordenado = os.path.join(tmp, "ordenado.txt")
+        replicar(args.fichero, texto, tam)
+        entrada_reducer(args.fichero, ordenado, tam)
+
+        medir("mapper", "pymap.py", texto, tmp, [
+            ("original", ["--por-lineas"]),
+            ("bloques", []),
+        ])
+        medir("mapper", "pymap.py", texto, tmp, [
+            ("original -c", ["--por-lineas", "-c"]),
+            ("bloques -c", ["-c"]),
+        ])
+        medir("reducer", "pyreduce.py", ordenado, tmp, [
+            ("original", ["--por-lineas"]),
+            ("bloques", []),
+        ])
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# N-gramas y coocurrencia de palabras para pymap.py y pyreduce.py.
+#   - n-gramas: claves "w1 w2 ... wn" de una ventana deslizante por línea
+#   - pares: clave "w u" por cada palabra u a distancia <= ventana de w
+#   - franjas (stripes): una clave w por palabra con todos sus vecinos en
+#     el valor, "w\tu1:3 u2:1", agregados en el mapper
+# Las claves de n-gramas y pares son texto normal y se reducen como el
+# conteo de palabras; las franjas se fusionan con pyreduce.py --franjas.
+# Las palabras nunca contienen espacios, así que el espacio separa tanto
+# las palabras de una clave como los vecinos de una franja.
+from collections import Counter
+
+# Claves de n-gramas de una lista de palabras
+def ngramas(palabras, n):
+    if n == 1:
+        return palabras
+    return [" ".join(palabras[i:i + n]) for i in range(len(palabras) - n + 1)]
+
+# Claves "w u" de los pares de palabras a distancia <= ventana
+def pares(palabras, ventana):
+    claves = []
+    total = len(palabras)
+    for i, w in enumerate(palabras):
+        for j in range(max(0, i - ventana), min(total, i + ventana + 1)):
+            if j != i:
+                claves.append(w + " " + palabras[j])
+    return claves
+
+# Suma en `franjas` (dict palabra -> Counter) los vecinos de cada palabra.
+# Devuelve el número de celdas nuevas creadas, para controlar la memoria.
+def acumular_franjas(franjas, palabras, ventana):
+    nuevas = 0
+    total = len(palabras)
+    for i, w in enumerate(palabras):
+        franja = franjas.get(w)
+        if franja is None:
+            franja = franjas[w] = Counter()
+        antes = len(franja)
+        franja.update(palabras[max(0, i - ventana):i])
+        franja.update(palabras[i + 1:min(total, i + ventana + 1)])
+        nuevas += len(franja) - antes
+    return nuevas
+
+# Una franja como valor de texto "u1:3 u2:1", con los vecinos ordenados
+def formatear_franja(franja):
+    return " ".join("{}:{}".format(u, c) for u, c in sorted(franja.items()))
+
+# Operación inversa; rpartition porque la palabra puede contener ':'
+def leer_franja(valor):
+    franja = Counter()
+    for celda in valor.split():
+        u, _, c = celda.rpartition(b":")
+        franja[u] += int(c)
+    return franja
+
+# Fusiona las franjas de una entrada ordenada por clave y devuelve pares
+# (palabra, Counter) con todas las franjas de cada palabra sumadas
+def fusionar_franjas(bloques):
+    actual = None
+    franja = None
+    for lineas in bloques:
+        for line in lineas:
+            if not line:
+                continue
+            w, _, valor = line.partition(b"\t")
+            if w != actual:
+                if actual is not None:
+                    yield actual, franja
+                actual = w
+                franja = Counter()
+            franja.update(leer_franja(valor))
+    if actual is not None:
+        yield actual, franja
+
+def linea_franja(w, franja):
+    if isinstance(w, str):
+        return "{}\t{}\n".format(w, formatear_franja(franja))
+    celdas = b" ".join(b"%s:%d" % (u, c) for u, c in sorted(franja.items()))
+    return b"%s\t%s\n" % (w, celdas)
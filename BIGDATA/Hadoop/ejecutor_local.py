@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+# Ejecutor MapReduce local que imita a Hadoop streaming con pymap.py y
+# pyreduce.py tal cual, sin necesidad de un clúster:
+#   1. parte el fichero de entrada en rangos de bytes alineados a fin de línea
+#   2. ejecuta el mapper sobre cada rango en un pool de procesos, reparte su
+#      salida por clave entre R particiones y la vuelca ordenada a disco en
+#      tandas (runs) cuando se llena la memoria asignada, opcionalmente
+#      comprimidas (ver ordenacion_externa.py)
+#   3. ejecuta R reducers en paralelo, cada uno sobre la mezcla ordenada de
+#      los runs de su partición, y deja el resultado en part-00000, part-00001...
+# Si el mapper emite el formato binario (pymap.py --binario) se reconoce su
+# cabecera y los runs y la entrada de los reducers también van en binario,
+# sin pasar los pares a texto en ningún momento.
+#
+#   python3 ejecutor_local.py ../Spark/recursos/el_quijote.txt resultado \
+#       --mapper "pymap.py -c" --reducer pyreduce.py
+import argparse
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import flujo_io
+import formato_binario
+from ordenacion_externa import (clave, compresiones, escribir_pares, escribir_run, escribir_run_binario,
+                                fusionar, fusionar_binario)
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+MB = 1024 * 1024
+
+# Convierte "pymap.py -c" en una orden ejecutable: los .py se lanzan con el
+# mismo intérprete y, si no existen en el directorio actual, se buscan junto
+# a este script
+def orden_script(texto):
+    partes = shlex.split(texto)
+    if partes and partes[0].endswith(".py"):
+        script = partes[0]
+        if not os.path.exists(script):
+            script = os.path.join(DIRECTORIO, script)
+        partes = [sys.executable, script] + partes[1:]
+    return partes
+
+# Rangos [inicio, fin) de unos tam_split bytes que empiezan siempre al
+# principio de una línea
+def calcular_splits(ruta, tam_split):
+    tam = os.path.getsize(ruta)
+    limites = [0]
+    with open(ruta, "rb") as f:
+        pos = tam_split
+        while pos < tam:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= tam:
+                break
+            limites.append(pos)
+            pos += tam_split
+    limites.append(tam)
+    return list(zip(limites[:-1], limites[1:]))
+
+# Partición de una clave; crc32 da lo mismo en todos los procesos, al
+# contrario que hash()
+def particion(clave_registro, reducers):
+    return zlib.crc32(clave_registro) % reducers
+
+# Pasa el rango [inicio, fin) del fichero a la entrada del proceso
+def alimentar(destino, ruta, inicio, fin):
+    try:
+        with open(ruta, "rb") as f:
+            f.seek(inicio)
+            pendiente = fin - inicio
+            while pendiente > 0:
+                bloque = f.read(min(MB, pendiente))
+                if not bloque:
+                    break
+                destino.write(bloque)
+                pendiente -= len(bloque)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            destino.close()
+        except BrokenPipeError:
+            pass
+
+# Ordena por clave los registros de cada partición (líneas o, en binario,
+# pares) y los escribe en un run
+def volcar_run(particiones, tmp, prefijo, numero, compresion, binario=False):
+    rutas = {}
+    for r, lineas in enumerate(particiones):
+        if not lineas:
+            continue
+        ruta = os.path.join(tmp, "{}-run{}-part{}".format(prefijo, numero, r))
+        if binario:
+            escribir_run_binario(lineas, ruta, compresion)
+        else:
+            escribir_run(lineas, ruta, compresion)
+        rutas[r] = ruta
+        lineas.clear()
+    return rutas
+
+# Registros de la salida del mapper con la clave por la que se reparten y
+# los bytes que ocupan: líneas de texto o, en binario, pares (clave, conteo)
+def registros_mapper(fichero, binario):
+    if binario:
+        for pares in formato_binario.leer_pares(fichero, formato_binario.leer_cabecera(fichero)):
+            yield [(par[0], par, len(par[0]) + 2) for par in pares]
+    else:
+        for lineas in flujo_io.leer_lineas(fichero):
+            yield [(clave(linea), linea, len(linea) + 1) for linea in lineas if linea]
+
+# Tarea map: ejecuta el mapper sobre un split y devuelve, por partición, la
+# lista de runs ordenados que ha generado y si están en formato binario
+def tarea_map(indice, ruta, inicio, fin, mapper, reducers, tmp, memoria, compresion):
+    proc = subprocess.Popen(orden_script(mapper), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    hilo = threading.Thread(target=alimentar, args=(proc.stdin, ruta, inicio, fin))
+    hilo.start()
+
+    binario = formato_binario.es_binaria(proc.stdout)
+    particiones = [[] for _ in range(reducers)]
+    runs = {r: [] for r in range(reducers)}
+    ocupado = 0
+    volcados = 0
+    registros = 0
+    for bloque in registros_mapper(proc.stdout, binario):
+        for clave_registro, registro, tam in bloque:
+            particiones[particion(clave_registro, reducers)].append(registro)
+            ocupado += tam
+        registros += len(bloque)
+        if ocupado >= memoria:
+            for r, run in volcar_run(particiones, tmp, "map{}".format(indice), volcados, compresion,
+                                     binario).items():
+                runs[r].append(run)
+            volcados += 1
+            ocupado = 0
+    for r, run in volcar_run(particiones, tmp, "map{}".format(indice), volcados, compresion, binario).items():
+        runs[r].append(run)
+
+    hilo.join()
+    if proc.wait() != 0:
+        raise RuntimeError("el mapper terminó con código {} en el split {}".format(proc.returncode, indice))
+    return runs, registros, binario
+
+# Tarea reduce: mezcla los runs de una partición (k-way merge con heap) y
+# pasa el resultado ordenado al reducer, en binario si así eran los runs
+def tarea_reduce(r, rutas, reducer, salida, compresion, binario=False):
+    ruta_salida = os.path.join(salida, "part-{:05d}".format(r))
+    with open(ruta_salida, "wb") as fout:
+        proc = subprocess.Popen(orden_script(reducer), stdin=subprocess.PIPE, stdout=fout)
+        if binario:
+            escribir_pares(fusionar_binario(rutas, compresion), proc.stdin)
+        else:
+            with flujo_io.EscritorBuffer(proc.stdin) as escritor:
+                for linea in fusionar(rutas, compresion):
+                    escritor.escribir(linea)
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError("el reducer terminó con código {} en la partición {}".format(proc.returncode, r))
+    return os.path.getsize(ruta_salida)
+
+def ejecutar(entrada, salida, mapper, reducer, procesos, reducers, tam_split, memoria,
+             tmp=None, compresion=None):
+    os.makedirs(salida, exist_ok=True)
+    tam = os.path.getsize(entrada)
+    splits = calcular_splits(entrada, tam_split)
+    directorio_tmp = tempfile.mkdtemp(prefix="mapreduce-", dir=tmp)
+    try:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            inicio = time.perf_counter()
+            tareas = [pool.submit(tarea_map, i, entrada, a, b, mapper, reducers, directorio_tmp,
+                                  memoria, compresion)
+                      for i, (a, b) in enumerate(splits)]
+            runs = {r: [] for r in range(reducers)}
+            registros = 0
+            formatos = set()
+            for tarea in tareas:
+                runs_tarea, n, binario = tarea.result()
+                registros += n
+                formatos.add(binario)
+                for r, rutas in runs_tarea.items():
+                    runs[r].extend(rutas)
+            t_map = time.perf_counter() - inicio
+            if len(formatos) > 1:
+                raise RuntimeError("el mapper ha emitido texto en unos splits y binario en otros")
+            binario = formatos.pop() if formatos else False
+            intermedio = sum(os.path.getsize(ruta) for rutas in runs.values() for ruta in rutas)
+
+            inicio = time.perf_counter()
+            tareas = [pool.submit(tarea_reduce, r, runs[r], reducer, salida, compresion, binario)
+                      for r in range(reducers)]
+            tam_salida = sum(tarea.result() for tarea in tareas)
+            t_reduce = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(directorio_tmp, ignore_errors=True)
+
+    print("map:    {} splits, {:.1f} MB de entrada, {} registros, {:.2f} s, {:.1f} MB/s".format(
+        len(splits), tam / MB, registros, t_map, tam / MB / max(t_map, 1e-9)), file=sys.stderr)
+    print("reduce: {} particiones, {:.1f} MB intermedios{}, {:.2f} s, {:.1f} MB/s".format(
+        reducers, intermedio / MB, " (binario)" if binario else "", t_reduce, intermedio / MB / max(t_reduce, 1e-9)), file=sys.stderr)
+    print("total:  {:.2f} s, {:.1f} MB de salida en {}".format(
+        t_map + t_reduce, tam_salida / MB, salida), file=sys.stderr)
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Ejecuta un trabajo MapReduce de streaming en local")
+    parser.add_argument("entrada", help="fichero de entrada")
+    parser.add_argument("salida", help="directorio donde se escriben los part-NNNNN")
+    parser.add_argument("--mapper", default="pymap.py", help="orden del mapper")
+    parser.add_argument("--reducer", default="pyreduce.py", help="orden del reducer")
+    parser.add_argument("-p", "--procesos", type=int, default=cpus, help="procesos del pool")
+    parser.add_argument("-r", "--reducers", type=int, default=cpus, help="número de reducers")
+    parser.add_argument("--split-mb", type=int, default=64, help="tamaño de cada split en MB")
+    parser.add_argument("--memoria-mb", type=int, default=100,
+                        help="MB de salida del mapper en memoria antes de volcar un run")
+    parser.add_argument("--tmp", default=None, help="directorio para los ficheros intermedios")
+    parser.add_argument("--comprimir", choices=compresiones(), default=None,
+                        help="comprime los runs intermedios")
+    args = parser.parse_args()
+
+    ejecutar(args.entrada, args.salida, args.mapper, args.reducer, args.procesos,
+             args.reducers, args.split_mb * MB, args.memoria_mb * MB, args.tmp, args.comprimir)
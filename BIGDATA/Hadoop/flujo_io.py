@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+# Capa de entrada/salida por bloques compartida por pymap.py y pyreduce.py.
+# En lugar de iterar sys.stdin línea a línea y hacer un print por registro,
+# se lee la entrada binaria en bloques grandes cortados en fin de línea y se
+# escribe a través de un único buffer de salida.
+import sys
+
+TAM_BLOQUE = 4 * 1024 * 1024   # bytes leídos de golpe de la entrada
+TAM_BUFFER = 1024 * 1024       # bytes acumulados antes de escribir la salida
+CODIFICACION = "utf-8"
+# surrogateescape deja pasar bytes no válidos sin romper el trabajo
+ERRORES = "surrogateescape"
+
+# Entrada y salida estándar en binario
+def entrada_binaria():
+    return sys.stdin.buffer
+
+def salida_binaria():
+    return sys.stdout.buffer
+
+# Devuelve bloques de bytes que siempre terminan en un fin de línea completo
+# (salvo quizá el último), así ningún registro queda partido entre bloques
+def leer_bloques(fichero, tam_bloque=TAM_BLOQUE):
+    resto = b""
+    while True:
+        bloque = fichero.read(tam_bloque)
+        if not bloque:
+            break
+        corte = bloque.rfind(b"\n")
+        if corte == -1:
+            resto += bloque
+            continue
+        yield resto + bloque[:corte + 1]
+        resto = bloque[corte + 1:]
+    if resto:
+        yield resto
+
+# Igual que leer_bloques pero decodificando cada bloque a texto
+def leer_texto(fichero, tam_bloque=TAM_BLOQUE):
+    for bloque in leer_bloques(fichero, tam_bloque):
+        yield bloque.decode(CODIFICACION, ERRORES)
+
+# Devuelve listas de líneas (bytes, sin el fin de línea), una por bloque
+def leer_lineas(fichero, tam_bloque=TAM_BLOQUE):
+    for bloque in leer_bloques(fichero, tam_bloque):
+        yield bloque.splitlines()
+
+# Pasa texto a bytes con la misma codificación que usa la lectura
+def codificar(texto):
+    return texto.encode(CODIFICACION, ERRORES)
+
+# Buffer de salida: junta muchos trozos pequeños y hace una sola escritura
+# cuando se supera tam_buffer
+class EscritorBuffer:
+    def __init__(self, fichero, tam_buffer=TAM_BUFFER):
+        self.fichero = fichero
+        self.tam_buffer = tam_buffer
+        self.partes = []
+        self.pendiente = 0
+
+    def escribir(self, datos):
+        if not datos:
+            return
+        self.partes.append(datos)
+        self.pendiente += len(datos)
+        if self.pendiente >= self.tam_buffer:
+            self.vaciar()
+
+    # Escribe pares (clave, conteo) como "clave\tconteo\n"; la clave puede
+    # venir como texto o como bytes
+    def escribir_pares(self, pares):
+        lineas = []
+        for clave, conteo in pares:
+            if isinstance(clave, str):
+                clave = codificar(clave)
+            lineas.append(b"%s\t%d\n" % (clave, conteo))
+        self.escribir(b"".join(lineas))
+
+    # Palabras sueltas con conteo 1: se unen y codifican de una vez
+    def escribir_palabras(self, palabras):
+        if palabras:
+            self.escribir(codificar("\t1\n".join(palabras) + "\t1\n"))
+
+    def vaciar(self):
+        if self.partes:
+            self.fichero.write(b"".join(self.partes))
+            self.partes.clear()
+            self.pendiente = 0
+
+    def cerrar(self):
+        self.vaciar()
+        self.fichero.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+# Formato binario compacto para los registros (clave, conteo) entre
+# pymap.py y pyreduce.py, como alternativa a las líneas "clave\tconteo":
+#
+#   cabecera:  b"WCB1" + 1 byte con la compresión (0 ninguna, 1 zlib,
+#              2 zstd, 3 lz4)
+#   bloques:   varint(tamaño sin comprimir) varint(tamaño comprimido) datos
+#   registros: varint(longitud de la clave) clave varint(conteo)
+#
+# El reducer reconoce la cabecera y, si no está, lee el texto de siempre.
+# ordenacion_externa.py y ejecutor_local.py también lo entienden: ordenan,
+# vuelcan y mezclan los pares sin pasarlos a texto, así que los runs
+# intermedios y el shuffle ocupan lo mismo que la salida del mapper.
+#
+# Solo sirve en tuberías locales (pymap | ordenacion_externa | pyreduce, o
+# ejecutor_local.py). El shuffle de Hadoop streaming parte la salida del
+# mapper por líneas y rompería los bloques: con hadoop-streaming se usa
+# siempre el formato de texto.
+#
+#   python3 pymap.py < texto.txt | python3 formato_binario.py
+#       -> bytes del texto frente a cada variante binaria
+import argparse
+import zlib
+
+import flujo_io
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+MAGICO = b"WCB1"
+TAM_BLOQUE = 1024 * 1024
+COMPRESIONES = {"ninguna": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+def compresiones():
+    disponibles = ["ninguna", "zlib"]
+    if zstandard is not None:
+        disponibles.append("zstd")
+    if lz4 is not None:
+        disponibles.append("lz4")
+    return disponibles
+
+# Varints de un byte precalculados: son casi todas las longitudes y conteos
+VARINT_CORTO = [bytes((i,)) for i in range(128)]
+
+def varint(n):
+    if n < 128:
+        return VARINT_CORTO[n]
+    partes = bytearray()
+    while n >= 128:
+        partes.append((n & 0x7f) | 0x80)
+        n >>= 7
+    partes.append(n)
+    return bytes(partes)
+
+# Devuelve (valor, siguiente posición)
+def leer_varint(datos, pos):
+    byte = datos[pos]
+    if byte < 128:
+        return byte, pos + 1
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = datos[pos]
+        pos += 1
+        valor |= (byte & 0x7f) << desplazamiento
+        if byte < 128:
+            return valor, pos
+        desplazamiento += 7
+
+def comprimir(datos, codigo):
+    if codigo == 1:
+        return zlib.compress(datos, 1)
+    if codigo == 2:
+        return zstandard.ZstdCompressor(level=1).compress(datos)
+    if codigo == 3:
+        return lz4.block.compress(datos, store_size=False)
+    return datos
+
+def descomprimir(datos, codigo, tam):
+    if codigo == 1:
+        return zlib.decompress(datos)
+    if codigo == 2:
+        if zstandard is None:
+            raise ValueError("la entrada usa zstd y no está instalado zstandard")
+        return zstandard.ZstdDecompressor().decompress(datos, max_output_size=tam)
+    if codigo == 3:
+        if lz4 is None:
+            raise ValueError("la entrada usa lz4 y no está instalado lz4")
+        return lz4.block.decompress(datos, uncompressed_size=tam)
+    return datos
+
+# Escritor con la misma interfaz que flujo_io.EscritorBuffer para los
+# registros; junta TAM_BLOQUE bytes de registros y escribe un bloque
+class EscritorBinario:
+    def __init__(self, fichero, compresion="ninguna", tam_bloque=TAM_BLOQUE):
+        if compresion not in compresiones():
+            raise ValueError("compresión no disponible: {}".format(compresion))
+        self.fichero = fichero
+        self.codigo = COMPRESIONES[compresion]
+        self.tam_bloque = tam_bloque
+        self.bloque = bytearray()
+        self.escritos = 0
+        self.escribir_crudo(MAGICO + bytes((self.codigo,)))
+
+    def escribir_crudo(self, datos):
+        self.fichero.write(datos)
+        self.escritos += len(datos)
+
+    def escribir_pares(self, pares):
+        bloque = self.bloque
+        for clave, conteo in pares:
+            if isinstance(clave, str):
+                clave = flujo_io.codificar(clave)
+            bloque += varint(len(clave))
+            bloque += clave
+            bloque += varint(conteo)
+        if len(bloque) >= self.tam_bloque:
+            self.vaciar()
+
+    # Palabras sueltas con conteo 1 (mapper sin combinador)
+    def escribir_palabras(self, palabras):
+        uno = VARINT_CORTO[1]
+        bloque = self.bloque
+        # las claves no tienen saltos de línea: se codifican todas de una vez
+        claves = flujo_io.codificar("\n".join(palabras)).split(b"\n") if palabras else []
+        for clave in claves:
+            bloque += varint(len(clave))
+            bloque += clave
+            bloque += uno
+        if len(bloque) >= self.tam_bloque:
+            self.vaciar()
+
+    def vaciar(self):
+        if self.bloque:
+            datos = comprimir(bytes(self.bloque), self.codigo)
+            self.escribir_crudo(varint(len(self.bloque)) + varint(len(datos)) + datos)
+            self.bloque = bytearray()
+
+    def cerrar(self):
+        self.vaciar()
+        self.fichero.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+def leer_exacto(fichero, n):
+    datos = fichero.read(n)
+    while len(datos) < n:
+        resto = fichero.read(n - len(datos))
+        if not resto:
+            raise ValueError("bloque binario incompleto")
+        datos += resto
+    return datos
+
+def leer_varint_fichero(fichero):
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = fichero.read(1)
+        if not byte:
+            return None
+        valor |= (byte[0] & 0x7f) << desplazamiento
+        if byte[0] < 128:
+            return valor
+        desplazamiento += 7
+
+# Pares (clave, conteo) de cada bloque; se supone leída ya la cabecera
+def leer_pares(fichero, codigo):
+    while True:
+        tam = leer_varint_fichero(fichero)
+        if tam is None:
+            return
+        tam_comprimido = leer_varint_fichero(fichero)
+        datos = descomprimir(leer_exacto(fichero, tam_comprimido), codigo, tam)
+        pares = []
+        pos = 0
+        fin = len(datos)
+        while pos < fin:
+            n, pos = leer_varint(datos, pos)
+            clave = datos[pos:pos + n]
+            conteo, pos = leer_varint(datos, pos + n)
+            pares.append((clave, conteo))
+        yield pares
+
+# Lee la cabecera y devuelve el código de compresión
+def leer_cabecera(fichero):
+    cabecera = leer_exacto(fichero, len(MAGICO) + 1)
+    if cabecera[:len(MAGICO)] != MAGICO:
+        raise ValueError("la entrada no tiene la cabecera del formato binario")
+    return cabecera[-1]
+
+# Pares (clave, conteo) de un fichero binario completo, uno a uno
+def iterar_pares(fichero):
+    for pares in leer_pares(fichero, leer_cabecera(fichero)):
+        yield from pares
+
+# Bloques de líneas "clave\tconteo" a partir de la entrada binaria, con el
+# mismo formato que flujo_io.leer_lineas, para usar los modos del reducer
+def leer_lineas_binarias(fichero, codigo):
+    for pares in leer_pares(fichero, codigo):
+        yield [b"%s\t%d" % par for par in pares]
+
+# Detecta el formato mirando la cabecera sin consumirla si no es binaria
+def es_binaria(fichero):
+    return fichero.peek(len(MAGICO))[:len(MAGICO)] == MAGICO
+
+def leer_lineas_auto(fichero, tam_bloque=flujo_io.TAM_BLOQUE, formato="auto"):
+    if formato == "binaria" or (formato == "auto" and es_binaria(fichero)):
+        return leer_lineas_binarias(fichero, leer_cabecera(fichero))
+    return flujo_io.leer_lineas(fichero, tam_bloque)
+
+# Cuenta los bytes que ocuparía un fichero binario sin escribirlo
+class Contador:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, datos):
+        self.bytes += len(datos)
+
+    def flush(self):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el tamaño de los registros en texto y en binario")
+    parser.parse_args()
+
+    total_texto = 0
+    contadores = {nombre: Contador() for nombre in compresiones()}
+    escritores = {nombre: EscritorBinario(contadores[nombre], nombre) for nombre in compresiones()}
+    for lineas in flujo_io.leer_lineas(flujo_io.entrada_binaria()):
+        pares = []
+        for line in lineas:
+            if line:
+                clave, conteo = line.split(b"\t", 1)
+                pares.append((clave, int(conteo)))
+                total_texto += len(line) + 1
+        for escritor in escritores.values():
+            escritor.escribir_pares(pares)
+    print("{:<10} {:>12} {:>8}".format("formato", "bytes", "ratio"))
+    print("{:<10} {:>12} {:>8.2f}".format("texto", total_texto, 1.0))
+    for nombre, escritor in escritores.items():
+        escritor.cerrar()
+        tam = contadores[nombre].bytes
+        print("{:<10} {:>12} {:>8.2f}".format(nombre, tam, total_texto / max(tam, 1)))
@@ -1,30 +1,85 @@
+import argparse
 import csv
 import re
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
 
-# Leer el archivo CSV original
-with open('marvel_movies.csv', 'r', newline='', encoding='utf-8') as file:
-    reader = csv.reader(file)
-    data = list(reader)
+import limpieza
+
+# Expresión regular compilada una sola vez para todas las celdas: un número
+# con coma decimal que ocupa la celda entera, p. ej. "7,9" o "-12,5". En el
+# CSV esas celdas van entre comillas (por la coma), pero csv.reader ya las
+# ha quitado, así que se mira el valor tal cual
+PATRON_DECIMAL = re.compile(r'-?\d+,\d+')
 
 # Función para procesar cada fila del CSV
 def process_row(row):
     processed_row = []
-    for i, cell in enumerate(row):
-        if cell.startswith('"') and cell.endswith('"'):
-            # Si la celda está entre comillas, procesa el contenido
-            content = cell[1:-1]  # Elimina las comillas
-            processed_content = re.sub(r'(\d+,\.\d+)', lambda m: m.group(0).replace(',', '.'), content)
-            processed_row.append(f'"{processed_content}"')
+    for cell in row:
+        if ',' in cell and PATRON_DECIMAL.fullmatch(cell):
+            processed_row.append(cell.replace(',', '.'))
         else:
             processed_row.append(cell)
     return processed_row
 
-# Procesar cada fila del CSV
-processed_data = [process_row(row) for row in data]
+# Procesa un lote de filas (lo usan los procesos del pool)
+def process_rows(rows):
+    return [process_row(row) for row in rows]
+
+# Lotes de como mucho `tam` filas del lector
+def lotes(reader, tam):
+    while True:
+        lote = list(islice(reader, tam))
+        if not lote:
+            break
+        yield lote
+
+# Lee, procesa y escribe fila a fila por lotes: en memoria solo hay unos
+# pocos lotes a la vez, sea cual sea el tamaño del fichero. Con procesos > 1
+# los lotes se procesan en un pool manteniendo el orden de las filas.
+def limpiar(entrada, salida, procesos=1, filas_lote=10000):
+    filas = 0
+    with open(entrada, 'r', newline='', encoding='utf-8', buffering=1024 * 1024) as fin, \
+            open(salida, 'w', newline='', encoding='utf-8', buffering=1024 * 1024) as fout:
+        reader = csv.reader(fin)
+        writer = csv.writer(fout)
+        if procesos > 1:
+            # Pool.imap leería todo el fichero por adelantado; aquí como
+            # mucho hay 2 lotes por proceso en vuelo
+            with Pool(procesos) as pool:
+                pendientes = deque()
+                for lote in lotes(reader, filas_lote):
+                    pendientes.append(pool.apply_async(process_rows, (lote,)))
+                    if len(pendientes) >= 2 * procesos:
+                        hecho = pendientes.popleft().get()
+                        writer.writerows(hecho)
+                        filas += len(hecho)
+                while pendientes:
+                    hecho = pendientes.popleft().get()
+                    writer.writerows(hecho)
+                    filas += len(hecho)
+        else:
+            for lote in lotes(reader, filas_lote):
+                writer.writerows(process_rows(lote))
+                filas += len(lote)
+    return filas
 
-# Escribir el resultado en un nuevo archivo CSV
-with open('marvel_movies_processed.csv', 'w', newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerows(processed_data)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corrige las comas decimales de un CSV")
+    parser.add_argument("entrada", nargs="?", default="marvel_movies.csv")
+    parser.add_argument("salida", nargs="?", default="marvel_movies_processed.csv")
+    parser.add_argument("-p", "--procesos", type=int, default=1,
+                        help="procesos para ficheros muy grandes (1 = sin pool)")
+    parser.add_argument("--filas-lote", type=int, default=10000,
+                        help="filas leídas y escritas de cada vez")
+    parser.add_argument("-f", "--formato", choices=["texto"] + limpieza.FORMATOS, default="texto",
+                        help="texto deja el CSV como está salvo las comas; el resto usa "
+                             "limpieza.py con los tipos de tabla.txt")
+    args = parser.parse_args()
 
-print("Proceso completado. El archivo procesado se ha guardado como marvel_movies_processed.csv")
\ No newline at end of file
+    if args.formato == "texto":
+        limpiar(args.entrada, args.salida, args.procesos, args.filas_lote)
+    else:
+        limpieza.limpiar(args.entrada, args.salida, args.formato, args.filas_lote)
+    print("Proceso completado. El archivo procesado se ha guardado como {}".format(args.salida))
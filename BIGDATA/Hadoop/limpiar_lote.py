@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# Limpia de una vez muchos CSV con el formato de Marvel_Movies_Dataset.csv:
+#   - acepta rutas y patrones glob ("exportaciones/*.csv")
+#   - reparte los ficheros entre un pool de procesos
+#   - guarda en <salida>/.limpiados.json el hash del contenido de cada
+#     entrada y se salta las que no han cambiado desde la última pasada
+#   - informa del tiempo y las filas/s de cada fichero
+# Cada salida conserva la ruta de su entrada respecto al directorio común de
+# todas (a/datos.csv y b/datos.csv -> <salida>/a/datos.csv y
+# <salida>/b/datos.csv), y si aun así dos entradas van al mismo destino se
+# para antes de empezar. Tampoco se limpian las entradas que ya están
+# dentro del directorio de salida ni se escribe nunca encima de una entrada.
+# El formato "texto" usa limpiar_csv.py; csv, parquet y feather usan
+# limpieza.py con los tipos de tabla.txt.
+#
+#   python3 limpiar_lote.py "exportaciones/*.csv" limpios -f parquet
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import limpieza
+import limpiar_csv
+
+ESTADO = ".limpiados.json"
+MB = 1024 * 1024
+# os.umask solo se puede leer cambiándola
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def hash_fichero(ruta):
+    h = hashlib.sha1()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(MB), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+# Ficheros de entrada sin repetir, en el orden en que se dan los patrones
+def expandir(patrones):
+    rutas = []
+    for patron in patrones:
+        encontradas = sorted(glob.glob(patron)) if glob.has_magic(patron) else [patron]
+        for ruta in encontradas:
+            ruta = os.path.abspath(ruta)
+            if os.path.isfile(ruta) and ruta not in rutas:
+                rutas.append(ruta)
+    return rutas
+
+def ruta_salida(entrada, raiz, salida, formato):
+    base = os.path.splitext(os.path.relpath(entrada, raiz))[0]
+    return os.path.join(salida, "{}.{}".format(base, "csv" if formato == "texto" else formato))
+
+def dentro_de(ruta, directorio):
+    ruta, directorio = os.path.realpath(ruta), os.path.realpath(directorio)
+    return os.path.commonpath([ruta, directorio]) == directorio
+
+# Destino de cada entrada relativo al directorio común de todas. Las
+# entradas que ya están dentro de `salida` (p. ej. limpiezas anteriores) no
+# se limpian y no aparecen en el resultado. ValueError si dos entradas
+# darían el mismo fichero (p. ej. datos.csv y datos.txt) o si un destino es
+# una de las entradas, que se sobrescribiría con su versión limpia.
+def rutas_salida(entradas, salida, formato):
+    originales = {os.path.realpath(entrada): entrada for entrada in entradas}
+    entradas = [entrada for entrada in entradas if not dentro_de(entrada, salida)]
+    if not entradas:
+        return {}
+    raiz = os.path.commonpath([os.path.dirname(entrada) for entrada in entradas])
+    destinos = {}
+    usados = {}
+    for entrada in entradas:
+        destino = ruta_salida(entrada, raiz, salida, formato)
+        if os.path.realpath(destino) in originales:
+            raise ValueError("{} se escribiría encima de la entrada {}".format(
+                entrada, originales[os.path.realpath(destino)]))
+        if destino in usados:
+            raise ValueError("{} y {} se escribirían los dos en {}".format(usados[destino], entrada, destino))
+        usados[destino] = entrada
+        destinos[entrada] = destino
+    return destinos
+
+def cargar_estado(salida):
+    ruta = os.path.join(salida, ESTADO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_estado(salida, estado):
+    ruta = os.path.join(salida, ESTADO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+
+# Tarea de cada proceso: calcula el hash y limpia si ha cambiado respecto a
+# `anterior` (la entrada del estado de la última pasada). Devuelve un dict
+# con el resultado para el informe y el nuevo estado.
+def tarea_limpiar(entrada, destino, formato, filas_lote, filas_malas, anterior):
+    inicio = time.perf_counter()
+    contenido = hash_fichero(entrada)
+    resultado = {"entrada": entrada, "salida": destino, "formato": formato, "hash": contenido}
+    if (anterior and anterior.get("hash") == contenido and anterior.get("formato") == formato
+            and anterior.get("salida") == destino and os.path.exists(destino)):
+        resultado.update(saltado=True, filas=anterior.get("filas", 0),
+                         descartadas=anterior.get("descartadas", 0))
+    else:
+        # Se escribe en un temporal con nombre único junto al destino para no
+        # dejar a medias una salida que el estado da por buena si la limpieza
+        # falla; os.replace es atómico dentro del mismo directorio
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(prefix="." + os.path.basename(destino) + ".",
+                                                suffix=".tmp", dir=os.path.dirname(destino))
+        os.close(descriptor)
+        # mkstemp lo crea con permisos 0600; la salida lleva los de siempre
+        os.chmod(temporal, 0o666 & ~UMASK)
+        try:
+            if formato == "texto":
+                filas, descartadas = limpiar_csv.limpiar(entrada, temporal, 1, filas_lote), 0
+            else:
+                filas, descartadas = limpieza.limpiar(entrada, temporal, formato, filas_lote,
+                                                      filas_malas=filas_malas)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        os.replace(temporal, destino)
+        resultado.update(saltado=False, filas=filas, descartadas=descartadas)
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+def limpiar_lote(patrones, salida, formato="csv", procesos=1, filas_lote=10000, filas_malas="saltar",
+                 forzar=False):
+    os.makedirs(salida, exist_ok=True)
+    todas = expandir(patrones)
+    destinos = rutas_salida(todas, salida, formato)
+    for entrada in todas:
+        if entrada not in destinos:
+            print("{} está dentro de {}, no se limpia".format(entrada, salida), file=sys.stderr)
+    entradas = list(destinos)
+    estado = {} if forzar else cargar_estado(salida)
+    resultados = []
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        tareas = [pool.submit(tarea_limpiar, entrada, destinos[entrada], formato,
+                              filas_lote, filas_malas, estado.get(entrada))
+                  for entrada in entradas]
+        for tarea in as_completed(tareas):
+            try:
+                r = tarea.result()
+            except Exception as e:
+                print("error: {}".format(e), file=sys.stderr)
+                continue
+            resultados.append(r)
+            estado[r["entrada"]] = {"hash": r["hash"], "formato": r["formato"], "salida": r["salida"],
+                                    "filas": r["filas"], "descartadas": r["descartadas"]}
+            if r["saltado"]:
+                print("{:<40} sin cambios".format(os.path.relpath(r["salida"], salida)))
+            else:
+                print("{:<40} {:>10} filas {:>6} descartadas {:>8.2f} s {:>12.0f} filas/s".format(
+                    os.path.relpath(r["salida"], salida), r["filas"], r["descartadas"], r["segundos"],
+                    r["filas"] / max(r["segundos"], 1e-9)))
+    guardar_estado(salida, estado)
+    segundos = time.perf_counter() - inicio
+    limpiados = [r for r in resultados if not r["saltado"]]
+    filas = sum(r["filas"] for r in limpiados)
+    print("total: {} ficheros, {} limpiados, {} sin cambios, {} filas en {:.2f} s ({:.0f} filas/s)".format(
+        len(entradas), len(limpiados), len(resultados) - len(limpiados), filas, segundos,
+        filas / max(segundos, 1e-9)))
+    return len(resultados) == len(entradas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limpia en paralelo muchos CSV, saltándose los que no han cambiado")
+    parser.add_argument("entradas", nargs="+", help="ficheros o patrones glob (entre comillas)")
+    parser.add_argument("salida", help="directorio donde se dejan los ficheros limpios")
+    parser.add_argument("-f", "--formato", choices=["texto"] + limpieza.FORMATOS, default="csv")
+    parser.add_argument("-p", "--procesos", type=int, default=os.cpu_count() or 1, help="procesos del pool")
+    parser.add_argument("--filas-lote", type=int, default=10000,
+                        help="filas leídas y escritas de cada vez")
+    parser.add_argument("--filas-malas", choices=limpieza.FILAS_MALAS, default="saltar",
+                        help="filas con otro número de campos que el esquema")
+    parser.add_argument("--forzar", action="store_true",
+                        help="limpia todos los ficheros aunque no hayan cambiado")
+    args = parser.parse_args()
+
+    try:
+        completo = limpiar_lote(args.entradas, args.salida, args.formato, args.procesos, args.filas_lote,
+                                args.filas_malas, args.forzar)
+    except ValueError as e:
+        sys.exit("error: {}".format(e))
+    if not completo:
+        sys.exit(1)
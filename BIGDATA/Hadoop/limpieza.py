@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+# Limpieza por lotes de ficheros con el formato de Marvel_Movies_Dataset.csv
+# (común a limpiar_csv.py y cambio_csv.py). Se lee en trozos de `filas_lote`
+# filas, se corrigen las comas decimales, se convierte cada
+# columna al tipo de la tabla de Hive (tabla.txt) y se escribe lote a lote:
+#   csv      texto sin cabecera, listo para LOAD DATA en la tabla de Hive
+#   parquet  un row group por lote, con el esquema explícito de ESQUEMA
+#   feather  Arrow IPC (Feather v2), un record batch por lote
+# Parquet y Feather necesitan pyarrow; Spark/Hive/pandas los cargan sin
+# volver a parsear texto.
+#
+#   python3 limpieza.py Marvel_Movies_Dataset.csv marvel.parquet -f parquet
+import argparse
+import csv
+import sys
+import time
+from itertools import islice
+
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Columnas y tipos de CREATE TABLE marvel_movies en tabla.txt
+ESQUEMA = [
+    ("title", "STRING"),
+    ("director_1", "STRING"),
+    ("director_2", "STRING"),
+    ("releasedate", "STRING"),
+    ("imdb", "FLOAT"),
+    ("imdb_metascore", "INT"),
+    ("rottentomatoes_critics", "FLOAT"),
+    ("rottentomatoes_audience", "FLOAT"),
+    ("letterboxd", "FLOAT"),
+    ("cinemascore", "STRING"),
+    ("budget", "FLOAT"),
+    ("domestic_gross", "FLOAT"),
+    ("worldwide_gross", "FLOAT"),
+]
+
+# Tipo de pandas (con nulos) y de Arrow para cada tipo de Hive
+TIPOS_PANDAS = {"STRING": "string", "FLOAT": "float32", "INT": "Int32"}
+
+# Valores que se leen como nulos; en CSV se escriben con el nulo de Hive
+NULOS = ["null", "NULL", "\\N", ""]
+NULO_HIVE = "\\N"
+
+FORMATOS = ["csv", "parquet", "feather"]
+
+# Qué hacer con las filas con otro número de campos que el esquema (p. ej.
+# decimales con coma sin comillas, como "Avengers: Endgame" en el dataset) o
+# con algo que no es un número en una columna numérica
+FILAS_MALAS = ["error", "avisar", "saltar"]
+
+def esquema_arrow(esquema=ESQUEMA):
+    tipos = {"STRING": pyarrow.string(), "FLOAT": pyarrow.float32(), "INT": pyarrow.int32()}
+    return pyarrow.schema([(nombre, tipos[tipo]) for nombre, tipo in esquema])
+
+# Hay cabecera si en la primera fila un campo numérico no es un número
+def tiene_cabecera(primera, esquema=ESQUEMA):
+    for i, (nombre, tipo) in enumerate(esquema):
+        if tipo != "STRING" and i < len(primera):
+            valor = primera[i].replace(",", ".")
+            if valor in NULOS:
+                continue
+            try:
+                float(valor)
+            except ValueError:
+                return True
+            return False
+    return False
+
+# Convierte un lote leído como texto a los tipos del esquema; la coma
+# decimal se cambia por punto en todas las columnas numéricas de una vez.
+# Las filas con un valor que no es un número en una columna numérica no se
+# dejan con un nulo: siguen `filas_malas` como las de campos de más y se
+# apuntan en `malas` (el índice del lote es la línea del fichero).
+def convertir_lote(df, esquema=ESQUEMA, filas_malas="avisar", malas=None, entrada=""):
+    df = df.mask(df.isin(NULOS))
+    numericas = [nombre for nombre, tipo in esquema if tipo != "STRING"]
+    if numericas:
+        valores = pd.concat([df[c] for c in numericas], ignore_index=True).str.replace(",", ".", regex=False)
+        numeros = pd.to_numeric(valores, errors="coerce").to_numpy().reshape(len(numericas), len(df))
+        no_numeros = valores.notna().to_numpy().reshape(len(numericas), len(df)) & pd.isna(numeros)
+        if no_numeros.any():
+            for j in map(int, no_numeros.any(axis=0).nonzero()[0]):
+                i = int(no_numeros[:, j].nonzero()[0][0])
+                motivo = "{!r} en {} no es un número".format(df[numericas[i]].iloc[j], numericas[i])
+                if filas_malas == "error":
+                    raise ValueError("{}: la línea {} tiene {}".format(entrada, df.index[j], motivo))
+                if filas_malas == "avisar":
+                    print("{}: se descarta la línea {} ({})".format(entrada, df.index[j], motivo), file=sys.stderr)
+                if malas is not None:
+                    malas.append(df.index[j])
+            buenas = ~no_numeros.any(axis=0)
+            df, numeros = df[buenas].copy(), numeros[:, buenas]
+        for i, nombre in enumerate(numericas):
+            df[nombre] = numeros[i]
+    for nombre, tipo in esquema:
+        if tipo == "INT":
+            df[nombre] = df[nombre].round()
+        df[nombre] = df[nombre].astype(TIPOS_PANDAS[tipo])
+    return df
+
+# DataFrames de texto de como mucho `filas_lote` filas. Se trocea con
+# csv.reader y no con read_csv(chunksize=...) porque este, según dónde caiga
+# el corte entre trozos, deja pasar filas con campos de más recortadas.
+# Las filas malas se cuentan en `malas` (una lista para poder leerla al
+# terminar el generador).
+def leer_lotes(entrada, filas_lote=10000, cabecera=None, esquema=ESQUEMA, filas_malas="avisar", malas=None):
+    nombres = [nombre for nombre, _ in esquema]
+    with open(entrada, "r", newline="", encoding="utf-8", buffering=1024 * 1024) as fichero:
+        reader = csv.reader(fichero)
+        primera = next(reader, None)
+        if primera is None:
+            return
+        if cabecera is None:
+            cabecera = tiene_cabecera(primera, esquema)
+        pendientes = [] if cabecera else [primera]
+        linea = 1 if cabecera else 0
+        while True:
+            lote = pendientes + list(islice(reader, filas_lote - len(pendientes)))
+            pendientes = []
+            if not lote:
+                break
+            buenas = []
+            lineas = []
+            for fila in lote:
+                linea += 1
+                if len(fila) == len(nombres):
+                    buenas.append(fila)
+                    lineas.append(linea)
+                    continue
+                if filas_malas == "error":
+                    raise ValueError("{}: la línea {} tiene {} campos y el esquema {}".format(
+                        entrada, linea, len(fila), len(nombres)))
+                if filas_malas == "avisar":
+                    print("{}: se descarta la línea {} ({} campos)".format(entrada, linea, len(fila)), file=sys.stderr)
+                if malas is not None:
+                    malas.append(linea)
+            if buenas:
+                yield pd.DataFrame(buenas, columns=nombres, index=lineas)
+
+class EscritorCSV:
+    def __init__(self, salida, esquema=ESQUEMA):
+        self.fichero = open(salida, "w", newline="", encoding="utf-8", buffering=1024 * 1024)
+
+    def escribir(self, df):
+        df.to_csv(self.fichero, header=False, index=False, na_rep=NULO_HIVE)
+
+    def cerrar(self):
+        self.fichero.close()
+
+class EscritorParquet:
+    def __init__(self, salida, esquema=ESQUEMA):
+        self.esquema = esquema_arrow(esquema)
+        self.escritor = pyarrow.parquet.ParquetWriter(salida, self.esquema, compression="snappy")
+
+    def escribir(self, df):
+        self.escritor.write_table(pyarrow.Table.from_pandas(df, schema=self.esquema, preserve_index=False))
+
+    def cerrar(self):
+        self.escritor.close()
+
+class EscritorFeather:
+    def __init__(self, salida, esquema=ESQUEMA):
+        self.esquema = esquema_arrow(esquema)
+        self.fichero = pyarrow.OSFile(salida, "wb")
+        self.escritor = pyarrow.ipc.new_file(self.fichero, self.esquema)
+
+    def escribir(self, df):
+        self.escritor.write_table(pyarrow.Table.from_pandas(df, schema=self.esquema, preserve_index=False))
+
+    def cerrar(self):
+        self.escritor.close()
+        self.fichero.close()
+
+ESCRITORES = {"csv": EscritorCSV, "parquet": EscritorParquet, "feather": EscritorFeather}
+
+def escritor(salida, formato="csv", esquema=ESQUEMA):
+    if formato != "csv" and pyarrow is None:
+        raise ValueError("el formato {} necesita el paquete pyarrow".format(formato))
+    return ESCRITORES[formato](salida, esquema)
+
+# Limpia `entrada` y la escribe en `salida` lote a lote; devuelve las filas
+# escritas y las descartadas
+def limpiar(entrada, salida, formato="csv", filas_lote=10000, cabecera=None, esquema=ESQUEMA,
+            filas_malas="avisar"):
+    filas = 0
+    malas = []
+    destino = escritor(salida, formato, esquema)
+    try:
+        for lote in leer_lotes(entrada, filas_lote, cabecera, esquema, filas_malas, malas):
+            lote = convertir_lote(lote, esquema, filas_malas, malas, entrada)
+            destino.escribir(lote)
+            filas += len(lote)
+    finally:
+        destino.cerrar()
+    return filas, len(malas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limpia un CSV de películas de Marvel por lotes con los tipos de tabla.txt")
+    parser.add_argument("entrada", nargs="?", default="Marvel_Movies_Dataset.csv")
+    parser.add_argument("salida", nargs="?", default=None,
+                        help="por defecto la entrada con la extensión del formato")
+    parser.add_argument("-f", "--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--filas-lote", type=int, default=10000,
+                        help="filas leídas, convertidas y escritas de cada vez")
+    parser.add_argument("--cabecera", choices=["auto", "si", "no"], default="auto",
+                        help="si la entrada tiene fila de cabecera (auto la detecta)")
+    parser.add_argument("--filas-malas", choices=FILAS_MALAS, default="avisar",
+                        help="filas con campos de más o con texto en una columna numérica: "
+                             "parar, avisar y descartar, o descartar")
+    args = parser.parse_args()
+
+    salida = args.salida
+    if salida is None:
+        base = args.entrada[:-4] if args.entrada.endswith(".csv") else args.entrada
+        salida = "{}_limpio.{}".format(base, args.formato)
+    cabecera = {"auto": None, "si": True, "no": False}[args.cabecera]
+
+    inicio = time.perf_counter()
+    filas, descartadas = limpiar(args.entrada, salida, args.formato, args.filas_lote, cabecera,
+                                 filas_malas=args.filas_malas)
+    segundos = time.perf_counter() - inicio
+    print("{} filas en {:.2f} s ({:.0f} filas/s), {} descartadas -> {}".format(
+        filas, segundos, filas / max(segundos, 1e-9), descartadas, salida))
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# Contadores y tiempos por etapa para pymap.py y pyreduce.py (opcionales,
+# con --metricas / --metricas-json). Se miden envolviendo la entrada, la
+# función de tokenizado y el escritor de salida, así que el camino normal
+# no cambia cuando no se piden:
+#   lectura    tiempo dentro de read() de la entrada (incluye esperar a stdin)
+#   tokenizado tiempo partiendo el texto en claves (solo el mapper)
+#   formato    tiempo formateando y codificando registros de salida
+#   escritura  tiempo dentro de write() de la salida (bloqueo en stdout)
+#   proceso    el resto: agregación, ordenación, etc.
+# Se informan con el protocolo de Hadoop streaming por stderr
+# (reporter:counter:grupo,contador,valor) y/o como un JSON. Las claves
+# distintas del mapper se cuentan con un HyperLogLog de resumenes.py
+# (4 KB fijos, error típico ~1.6%), no con un conjunto que crecería con el
+# vocabulario.
+import json
+import resource
+import sys
+import time
+from collections import Counter
+
+import resumenes
+
+ETAPAS = ["lectura", "tokenizado", "formato", "escritura"]
+
+# Memoria residente máxima del proceso en bytes (ru_maxrss viene en KB en
+# Linux y en bytes en macOS)
+def pico_rss():
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo if sys.platform == "darwin" else maximo * 1024
+
+class Metricas:
+    def __init__(self, grupo):
+        self.grupo = grupo
+        self.contadores = Counter()
+        self.tiempos = Counter()
+        self.claves = None
+        self.inicio = time.perf_counter()
+        self.fin = None
+
+    # Fichero de entrada cuyas lecturas se cronometran; con contar_lineas
+    # cuenta también los registros de texto que pasan por él
+    def medir_entrada(self, fichero, contar_lineas=True):
+        return EntradaMedida(fichero, self, contar_lineas)
+
+    # Bloques de líneas (reducer): cuenta registros de entrada
+    def contar_bloques(self, bloques):
+        for lineas in bloques:
+            self.contadores["registros_entrada"] += len(lineas)
+            yield lineas
+
+    # Envuelve la función de tokenizado: cronometra y estima las claves
+    # distintas vistas por el mapper. Cada bloque se reduce antes a sus
+    # claves distintas, que son muchas menos que las palabras
+    def medir_tokenizado(self, tokenizar):
+        self.claves = resumenes.HyperLogLog()
+        actualizar = self.claves.actualizar
+
+        def medida(texto):
+            inicio = time.perf_counter()
+            claves = tokenizar(texto)
+            self.tiempos["tokenizado"] += time.perf_counter() - inicio
+            for clave in set(claves):
+                actualizar(clave)
+            return claves
+        return medida
+
+    # Envuelve un EscritorBuffer o EscritorBinario
+    def medir_salida(self, escritor):
+        # EscritorBinario ya ha escrito su cabecera al crearse
+        self.contadores["bytes_salida"] += getattr(escritor, "escritos", 0)
+        escritor.fichero = FicheroMedido(escritor.fichero, self)
+        return EscritorMedido(escritor, self)
+
+    def terminar(self):
+        self.fin = time.perf_counter()
+
+    def resumen(self):
+        total = (self.fin or time.perf_counter()) - self.inicio
+        tiempos = {etapa: round(self.tiempos[etapa], 6) for etapa in ETAPAS}
+        tiempos["proceso"] = round(max(0.0, total - sum(self.tiempos[etapa] for etapa in ETAPAS)), 6)
+        tiempos["total"] = round(total, 6)
+        contadores = dict(self.contadores)
+        if self.claves is not None:
+            contadores["claves_distintas_aprox"] = self.claves.estimar()
+        contadores["pico_rss"] = pico_rss()
+        return {"grupo": self.grupo, "contadores": contadores, "tiempos_s": tiempos}
+
+    # Contadores con el protocolo de Hadoop streaming; los tiempos en ms
+    def reportar_hadoop(self, fichero=sys.stderr):
+        resumen = self.resumen()
+        for nombre, valor in sorted(resumen["contadores"].items()):
+            print("reporter:counter:{},{},{}".format(self.grupo, nombre, valor), file=fichero)
+        for etapa, segundos in resumen["tiempos_s"].items():
+            print("reporter:counter:{},ms_{},{}".format(self.grupo, etapa, int(segundos * 1000)), file=fichero)
+        fichero.flush()
+
+    def guardar_json(self, ruta):
+        texto = json.dumps(self.resumen(), indent=2)
+        if ruta == "-":
+            print(texto, file=sys.stderr)
+        else:
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(texto + "\n")
+
+class EntradaMedida:
+    def __init__(self, fichero, metricas, contar_lineas):
+        self.fichero = fichero
+        self.metricas = metricas
+        self.contar_lineas = contar_lineas
+
+    def read(self, n=-1):
+        inicio = time.perf_counter()
+        datos = self.fichero.read(n)
+        self.metricas.tiempos["lectura"] += time.perf_counter() - inicio
+        self.metricas.contadores["bytes_entrada"] += len(datos)
+        if self.contar_lineas:
+            self.metricas.contadores["registros_entrada"] += datos.count(b"\n")
+        return datos
+
+    def peek(self, n=0):
+        return self.fichero.peek(n)
+
+class FicheroMedido:
+    def __init__(self, fichero, metricas):
+        self.fichero = fichero
+        self.metricas = metricas
+
+    def write(self, datos):
+        inicio = time.perf_counter()
+        self.fichero.write(datos)
+        self.metricas.tiempos["escritura"] += time.perf_counter() - inicio
+        self.metricas.contadores["bytes_salida"] += len(datos)
+
+    def flush(self):
+        inicio = time.perf_counter()
+        self.fichero.flush()
+        self.metricas.tiempos["escritura"] += time.perf_counter() - inicio
+
+# El tiempo de formato es el que pasa dentro del escritor menos lo que ya
+# cuenta FicheroMedido como escritura
+class EscritorMedido:
+    def __init__(self, escritor, metricas):
+        self.escritor = escritor
+        self.metricas = metricas
+
+    def medir(self, metodo, *args):
+        tiempos = self.metricas.tiempos
+        escritura = tiempos["escritura"]
+        inicio = time.perf_counter()
+        metodo(*args)
+        tiempos["formato"] += time.perf_counter() - inicio - (tiempos["escritura"] - escritura)
+
+    def escribir(self, datos):
+        self.metricas.contadores["registros_salida"] += datos.count(b"\n")
+        self.medir(self.escritor.escribir, datos)
+
+    def escribir_pares(self, pares):
+        pares = list(pares)
+        self.metricas.contadores["registros_salida"] += len(pares)
+        self.medir(self.escritor.escribir_pares, pares)
+
+    def escribir_palabras(self, palabras):
+        self.metricas.contadores["registros_salida"] += len(palabras)
+        self.medir(self.escritor.escribir_palabras, palabras)
+
+    def cerrar(self):
+        self.medir(self.escritor.cerrar)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+# Opciones comunes de los dos scripts
+def anadir_argumentos(parser):
+    parser.add_argument("--metricas", action="store_true",
+                        help="informa de contadores y tiempos por etapa con reporter:counter en stderr")
+    parser.add_argument("--metricas-json", default=None, metavar="RUTA",
+                        help="guarda el resumen de métricas en JSON ('-' para stderr)")
+
+def desde_argumentos(args, grupo):
+    if args.metricas or args.metricas_json:
+        return Metricas(grupo)
+    return None
+
+def informar(metricas, args):
+    if metricas is None:
+        return
+    metricas.terminar()
+    if args.metricas:
+        metricas.reportar_hadoop()
+    if args.metricas_json:
+        metricas.guardar_json(args.metricas_json)
@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+# Ordenación externa por clave de registros "clave\tvalor" para colocar
+# entre el mapper y el reducer cuando los datos no caben en memoria:
+#   - se acumulan registros hasta llenar la memoria asignada, se ordenan y
+#     se escriben a un fichero temporal (run), opcionalmente comprimido
+#   - al final se mezclan todos los runs con un heap (k-way merge); si hay
+#     más runs que max_fusion se mezclan antes por grupos
+# Si la entrada viene en el formato binario de formato_binario.py (pymap.py
+# --binario) se ordenan los pares (clave, conteo) sin pasarlos a texto, los
+# runs se escriben en ese mismo formato y la salida también es binaria.
+#
+#   python3 pymap.py < texto.txt | python3 ordenacion_externa.py --memoria-mb 256 \
+#       --comprimir gzip | python3 pyreduce.py
+import argparse
+import bz2
+import gzip
+import heapq
+import io
+import lzma
+import os
+import shutil
+import tempfile
+from itertools import islice
+from operator import itemgetter
+
+import flujo_io
+import formato_binario
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MB = 1024 * 1024
+
+# Clave de un registro "clave\tvalor"
+def clave(linea):
+    return linea.split(b"\t", 1)[0]
+
+def compresiones():
+    disponibles = ["gzip", "bz2", "lzma"]
+    if zstandard is not None:
+        disponibles.append("zstd")
+    return disponibles
+
+# Abre un run para leer ("rb") o escribir ("wb") con la compresión indicada.
+# Los niveles son bajos a propósito: el objetivo es ahorrar disco sin que
+# comprimir cueste más que escribir.
+def abrir_run(ruta, modo, compresion=None):
+    if compresion is None:
+        return open(ruta, modo, buffering=MB)
+    if compresion == "gzip":
+        return gzip.open(ruta, modo, compresslevel=1)
+    if compresion == "bz2":
+        return bz2.open(ruta, modo, compresslevel=1)
+    if compresion == "lzma":
+        return lzma.open(ruta, modo, preset=0 if "w" in modo else None)
+    if compresion == "zstd":
+        if zstandard is None:
+            raise ValueError("la compresión zstd necesita el paquete zstandard")
+        if "w" in modo:
+            return zstandard.open(ruta, modo, cctx=zstandard.ZstdCompressor(level=1))
+        # el lector de zstandard no itera por líneas; BufferedReader sí
+        return io.BufferedReader(zstandard.open(ruta, modo), MB)
+    raise ValueError("compresión desconocida: {}".format(compresion))
+
+# Ordena las líneas (sin fin de línea) por clave y las escribe en un run
+def escribir_run(lineas, ruta, compresion=None):
+    lineas.sort(key=clave)
+    with abrir_run(ruta, "wb", compresion) as f:
+        f.write(b"\n".join(lineas))
+        f.write(b"\n")
+
+# Escribe pares (clave, conteo) en formato binario por lotes, para no
+# juntar todos los registros en un único bloque
+def escribir_pares(pares, fichero, tam_lote=10000):
+    with formato_binario.EscritorBinario(fichero) as escritor:
+        pares = iter(pares)
+        while True:
+            lote = list(islice(pares, tam_lote))
+            if not lote:
+                break
+            escritor.escribir_pares(lote)
+
+# Ordena los pares (clave, conteo) por clave y los escribe en un run binario
+def escribir_run_binario(pares, ruta, compresion=None):
+    pares.sort(key=itemgetter(0))
+    with abrir_run(ruta, "wb", compresion) as f:
+        escribir_pares(pares, f)
+
+# Mezcla ordenada de varios runs; devuelve las líneas con su fin de línea
+def fusionar(rutas, compresion=None):
+    ficheros = [abrir_run(ruta, "rb", compresion) for ruta in rutas]
+    try:
+        yield from heapq.merge(*ficheros, key=clave)
+    finally:
+        for f in ficheros:
+            f.close()
+
+# Mezcla ordenada de varios runs binarios; devuelve pares (clave, conteo)
+def fusionar_binario(rutas, compresion=None):
+    ficheros = [abrir_run(ruta, "rb", compresion) for ruta in rutas]
+    try:
+        yield from heapq.merge(*[formato_binario.iterar_pares(f) for f in ficheros], key=itemgetter(0))
+    finally:
+        for f in ficheros:
+            f.close()
+
+# Reduce el número de runs a como mucho max_fusion mezclándolos por grupos,
+# para no abrir miles de ficheros a la vez en la mezcla final
+def reducir_runs(rutas, tmp, compresion=None, max_fusion=64, binario=False):
+    rutas = list(rutas)
+    pasada = 0
+    while len(rutas) > max_fusion:
+        nuevas = []
+        for i in range(0, len(rutas), max_fusion):
+            grupo = rutas[i:i + max_fusion]
+            ruta = os.path.join(tmp, "fusion{}-{}".format(pasada, i // max_fusion))
+            with abrir_run(ruta, "wb", compresion) as f:
+                if binario:
+                    escribir_pares(fusionar_binario(grupo, compresion), f)
+                else:
+                    for linea in fusionar(grupo, compresion):
+                        f.write(linea)
+            for vieja in grupo:
+                os.remove(vieja)
+            nuevas.append(ruta)
+        rutas = nuevas
+        pasada += 1
+    return rutas
+
+# Ordenador externo: se le añaden bloques de líneas y al final devuelve
+# todas las líneas ordenadas por clave usando como mucho `memoria` bytes
+# de registros en memoria. Con binario=True se le añaden bloques de pares
+# (clave, conteo) con agregar_pares y devuelve bloques de pares.
+class OrdenadorExterno:
+    def __init__(self, memoria=256 * MB, tmp=None, compresion=None, max_fusion=64, binario=False):
+        self.memoria = memoria
+        self.compresion = compresion
+        self.max_fusion = max_fusion
+        self.binario = binario
+        self.clave = itemgetter(0) if binario else clave
+        self.tmp = tempfile.mkdtemp(prefix="ordenacion-", dir=tmp)
+        self.lineas = []
+        self.ocupado = 0
+        self.runs = []
+
+    def agregar(self, lineas):
+        for linea in lineas:
+            if linea:
+                self.lineas.append(linea)
+                self.ocupado += len(linea) + 1
+        if self.ocupado >= self.memoria:
+            self.volcar()
+
+    # Como agregar, con pares (clave, conteo) de formato_binario.leer_pares;
+    # se cuentan la clave y unos 2 bytes de varints por registro
+    def agregar_pares(self, pares):
+        self.lineas.extend(pares)
+        self.ocupado += sum(len(par[0]) + 2 for par in pares)
+        if self.ocupado >= self.memoria:
+            self.volcar()
+
+    def volcar(self):
+        if self.lineas:
+            ruta = os.path.join(self.tmp, "run{}".format(len(self.runs)))
+            if self.binario:
+                escribir_run_binario(self.lineas, ruta, self.compresion)
+            else:
+                escribir_run(self.lineas, ruta, self.compresion)
+            self.runs.append(ruta)
+            self.lineas = []
+            self.ocupado = 0
+
+    # Bloques de líneas ordenadas (sin fin de línea), con el mismo formato
+    # que flujo_io.leer_lineas. Si todo cupo en memoria no se toca el disco.
+    def bloques(self, tam_bloque=10000):
+        if not self.runs:
+            self.lineas.sort(key=self.clave)
+            for i in range(0, len(self.lineas), tam_bloque):
+                yield self.lineas[i:i + tam_bloque]
+            self.lineas = []
+            return
+        self.volcar()
+        self.runs = reducir_runs(self.runs, self.tmp, self.compresion, self.max_fusion, self.binario)
+        if self.binario:
+            mezcla = fusionar_binario(self.runs, self.compresion)
+            while True:
+                bloque = list(islice(mezcla, tam_bloque))
+                if not bloque:
+                    break
+                yield bloque
+            return
+        mezcla = fusionar(self.runs, self.compresion)
+        while True:
+            bloque = [linea.rstrip(b"\n") for linea in islice(mezcla, tam_bloque)]
+            if not bloque:
+                break
+            yield bloque
+
+    def cerrar(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ordena por clave registros clave\\tvalor con memoria acotada")
+    parser.add_argument("--memoria-mb", type=int, default=256, help="MB de registros en memoria por run")
+    parser.add_argument("--comprimir", choices=compresiones(), default=None,
+                        help="comprime los runs temporales")
+    parser.add_argument("--max-fusion", type=int, default=64, help="runs mezclados a la vez como máximo")
+    parser.add_argument("--tmp", default=None, help="directorio para los runs temporales")
+    args = parser.parse_args()
+
+    entrada = flujo_io.entrada_binaria()
+    binario = formato_binario.es_binaria(entrada)
+    with OrdenadorExterno(args.memoria_mb * MB, args.tmp, args.comprimir, args.max_fusion, binario) as ordenador:
+        if binario:
+            # La salida sale sin comprimir por bloques: quien la lee es el
+            # reducer en la misma máquina
+            for pares in formato_binario.leer_pares(entrada, formato_binario.leer_cabecera(entrada)):
+                ordenador.agregar_pares(pares)
+            with formato_binario.EscritorBinario(flujo_io.salida_binaria()) as salida:
+                for bloque in ordenador.bloques():
+                    salida.escribir_pares(bloque)
+        else:
+            for lineas in flujo_io.leer_lineas(entrada):
+                ordenador.agregar(lineas)
+            with flujo_io.EscritorBuffer(flujo_io.salida_binaria()) as salida:
+                for bloque in ordenador.bloques():
+                    salida.escribir(b"\n".join(bloque) + b"\n")
@@ -1,7 +1,154 @@
-#!/usr/bin/python3 
-import sys 
-for line in sys.stdin: 
-    line = line.strip() 
-    words = line.split() 
-    for word in words: 
-        print("{}\t1".format(word))
\ No newline at end of file
+#!/usr/bin/python3
+import sys
+import argparse
+from collections import Counter
+
+import coocurrencia
+import flujo_io
+import formato_binario
+import metricas
+import tokenizador
+
+# Modo clásico: una línea "palabra\t1" por cada palabra. `tokenizar` parte
+# un texto en palabras (str.split o Tokenizador.tokens).
+def mapear(entrada, tokenizar=str.split):
+    for line in entrada:
+        line = line.strip()
+        words = tokenizar(line)
+        for word in words:
+            print("{}\t1".format(word))
+
+# Escribe los conteos acumulados y vacía el diccionario
+def volcar(conteos):
+    for word, count in conteos.items():
+        print("{}\t{}".format(word, count))
+    conteos.clear()
+
+# Modo combinador (in-mapper combining): se suman los conteos en un
+# diccionario y se vuelca cuando supera max_claves palabras distintas.
+# El límite se comprueba al final de cada línea, así que como mucho se
+# supera en las palabras de una sola línea.
+def mapear_combinando(entrada, max_claves, tokenizar=str.split):
+    conteos = {}
+    for line in entrada:
+        for word in tokenizar(line):
+            conteos[word] = conteos.get(word, 0) + 1
+        if len(conteos) >= max_claves:
+            volcar(conteos)
+    volcar(conteos)
+
+# Versión por bloques del modo clásico: cada bloque se parte en palabras de
+# una vez (split sobre el bloque entero equivale a strip + split por línea)
+# y se codifica y escribe en una sola operación
+def mapear_bloques(entrada, salida, tam_bloque, tokenizar=str.split):
+    for texto in flujo_io.leer_texto(entrada, tam_bloque):
+        salida.escribir_palabras(tokenizar(texto))
+
+# Versión por bloques del modo combinador. Aquí el límite se comprueba por
+# bloque, así que se puede superar en las palabras distintas de un bloque.
+def mapear_combinando_bloques(entrada, salida, tam_bloque, max_claves, tokenizar=str.split):
+    conteos = Counter()
+    for texto in flujo_io.leer_texto(entrada, tam_bloque):
+        conteos.update(tokenizar(texto))
+        if len(conteos) >= max_claves:
+            salida.escribir_pares(conteos.items())
+            conteos.clear()
+    salida.escribir_pares(conteos.items())
+
+# Convierte `tokenizar` en una función que devuelve las claves generadas
+# por `generar` (n-gramas o pares) línea a línea, para que las ventanas no
+# crucen de una línea a otra
+def claves_por_linea(tokenizar, generar):
+    def claves(texto):
+        resultado = []
+        for linea in texto.split("\n"):
+            resultado.extend(generar(tokenizar(linea)))
+        return resultado
+    return claves
+
+# Escribe las franjas acumuladas y vacía el diccionario
+def volcar_franjas(franjas, salida):
+    salida.escribir(flujo_io.codificar("".join(
+        coocurrencia.linea_franja(w, franja) for w, franja in franjas.items() if franja)))
+    franjas.clear()
+
+# Coocurrencia con franjas (stripes): siempre se agrega en el mapper y se
+# vuelca cuando el total de celdas (palabra, vecino) supera max_celdas
+def mapear_franjas(entrada, salida, tam_bloque, ventana, max_celdas, tokenizar=str.split):
+    franjas = {}
+    celdas = 0
+    for texto in flujo_io.leer_texto(entrada, tam_bloque):
+        for linea in texto.split("\n"):
+            celdas += coocurrencia.acumular_franjas(franjas, tokenizar(linea), ventana)
+        if celdas >= max_celdas:
+            volcar_franjas(franjas, salida)
+            celdas = 0
+    volcar_franjas(franjas, salida)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mapper de conteo de palabras para Hadoop streaming")
+    parser.add_argument("-c", "--combinar", action="store_true",
+                        help="agrupa los conteos dentro del mapper antes de emitirlos")
+    parser.add_argument("--max-claves", type=int, default=100000,
+                        help="palabras distintas en memoria antes de volcar (modo combinador)")
+    parser.add_argument("--por-lineas", action="store_true",
+                        help="usa la lectura línea a línea con print (versión original)")
+    parser.add_argument("--tam-bloque", type=int, default=flujo_io.TAM_BLOQUE,
+                        help="bytes leídos por bloque de la entrada")
+    parser.add_argument("--binario", action="store_true",
+                        help="emite los registros en el formato binario de formato_binario.py "
+                             "(solo para tuberías locales y ejecutor_local.py, no para Hadoop streaming)")
+    parser.add_argument("--compresion", choices=formato_binario.compresiones(), default="ninguna",
+                        help="compresión de los bloques en formato binario")
+    parser.add_argument("--ngramas", type=int, default=1,
+                        help="emite n-gramas de N palabras consecutivas de la misma línea")
+    parser.add_argument("--coocurrencia", choices=["pares", "franjas"], default=None,
+                        help="emite coocurrencias de palabras como pares o como franjas (stripes)")
+    parser.add_argument("--ventana", type=int, default=2,
+                        help="distancia máxima entre palabras que coocurren")
+    tokenizador.anadir_argumentos(parser)
+    metricas.anadir_argumentos(parser)
+    args = parser.parse_args()
+
+    tok = tokenizador.desde_argumentos(args)
+    tokenizar = str.split if tok.es_trivial() else tok.tokens
+    if args.coocurrencia == "franjas" and (args.binario or args.ngramas > 1):
+        parser.error("las franjas no se pueden combinar con --binario ni con --ngramas")
+    # La versión original lee sys.stdin y escribe con print: ni pasa por el
+    # escritor binario ni por las franjas, y las métricas no la verían
+    if args.por_lineas and (args.binario or args.coocurrencia == "franjas" or args.metricas or args.metricas_json):
+        parser.error("--por-lineas no se puede combinar con --binario, --coocurrencia franjas ni las métricas")
+    if args.coocurrencia == "pares":
+        tokenizar = claves_por_linea(tokenizar, lambda palabras: coocurrencia.pares(palabras, args.ventana))
+    elif args.ngramas > 1:
+        tokenizar = claves_por_linea(tokenizar, lambda palabras: coocurrencia.ngramas(palabras, args.ngramas))
+
+    # Con métricas se envuelven la entrada, el tokenizado y la salida
+    medidas = metricas.desde_argumentos(args, "pymap")
+    entrada = flujo_io.entrada_binaria()
+    if medidas is not None:
+        tokenizar = medidas.medir_tokenizado(tokenizar)
+        entrada = medidas.medir_entrada(entrada)
+
+    def preparar(escritor):
+        return escritor if medidas is None else medidas.medir_salida(escritor)
+
+    if args.coocurrencia == "franjas":
+        with preparar(flujo_io.EscritorBuffer(flujo_io.salida_binaria())) as salida:
+            mapear_franjas(entrada, salida, args.tam_bloque, args.ventana, args.max_claves, tokenizar)
+    elif args.por_lineas:
+        if args.combinar:
+            mapear_combinando(sys.stdin, args.max_claves, tokenizar)
+        else:
+            mapear(sys.stdin, tokenizar)
+    else:
+        if args.binario:
+            escritor = formato_binario.EscritorBinario(flujo_io.salida_binaria(), args.compresion)
+        else:
+            escritor = flujo_io.EscritorBuffer(flujo_io.salida_binaria())
+        with preparar(escritor) as salida:
+            if args.combinar:
+                mapear_combinando_bloques(entrada, salida, args.tam_bloque, args.max_claves, tokenizar)
+            else:
+                mapear_bloques(entrada, salida, args.tam_bloque, tokenizar)
+    metricas.informar(medidas, args)
@@ -1,21 +1,220 @@
-#!/usr/bin/python3 
-from operator import itemgetter 
-import sys 
-lastword = None 
-lastcount = 0 
-curword = None 
-i=1
-for line in sys.stdin: 
-    line = line.strip() 
-    curword, count = line.split('\t', 1) 
-    count = int(count)
-    #print("**",curword,str(count),"**")
-    if lastword == curword: 
-        lastcount += count 
-    else: 
-        if lastword: 
-            print("{}\t{}".format(lastword, lastcount)) 
-            lastcount = count 
-        lastword = curword
-if lastword == curword: 
-    print("{}\t{}".format(lastword, lastcount))
\ No newline at end of file
+#!/usr/bin/python3
+import sys
+import argparse
+from itertools import islice
+
+import coocurrencia
+import flujo_io
+import formato_binario
+import metricas
+import ordenacion_externa
+import resumenes
+from agregacion_hash import AgregadorHash
+
+MB = 1024 * 1024
+
+# Versión original: lee línea a línea y suma los conteos de las líneas
+# consecutivas con la misma palabra (la entrada debe venir ordenada)
+def reducir(entrada):
+    lastword = None
+    lastcount = 0
+    curword = None
+    for line in entrada:
+        line = line.strip()
+        curword, count = line.split('\t', 1)
+        count = int(count)
+        #print("**",curword,str(count),"**")
+        if lastword == curword:
+            lastcount += count
+        else:
+            if lastword:
+                print("{}\t{}".format(lastword, lastcount))
+            lastcount = count
+            lastword = curword
+    if lastword is not None:
+        print("{}\t{}".format(lastword, lastcount))
+
+# Misma agrupación trabajando sobre bytes por bloques: no hace falta
+# decodificar las claves y la salida de cada bloque se escribe de una vez.
+# `bloques` son listas de líneas como las de flujo_io.leer_lineas.
+def reducir_bloques(bloques, salida):
+    lastword = None
+    lastcount = 0
+    for lineas in bloques:
+        terminadas = []
+        for line in lineas:
+            if not line:
+                continue
+            curword, count = line.split(b'\t', 1)
+            if curword == lastword:
+                lastcount += int(count)
+            else:
+                if lastword is not None:
+                    terminadas.append(b"%s\t%d\n" % (lastword, lastcount))
+                lastword = curword
+                lastcount = int(count)
+        salida.escribir(b"".join(terminadas))
+    if lastword is not None:
+        salida.escribir(b"%s\t%d\n" % (lastword, lastcount))
+
+# Pares (palabra, conteo) de una entrada ordenada, agrupando igual que
+# reducir_bloques pero sin escribirlos (para top-K)
+def agrupar(bloques):
+    lastword = None
+    lastcount = 0
+    for lineas in bloques:
+        for line in lineas:
+            if not line:
+                continue
+            curword, count = line.split(b'\t', 1)
+            if curword == lastword:
+                lastcount += int(count)
+            else:
+                if lastword is not None:
+                    yield lastword, lastcount
+                lastword = curword
+                lastcount = int(count)
+    if lastword is not None:
+        yield lastword, lastcount
+
+# Escribe pares (palabra, conteo) en lotes
+def escribir_lotes(pares, salida, tam_lote=10000):
+    pares = iter(pares)
+    while True:
+        lote = list(islice(pares, tam_lote))
+        if not lote:
+            break
+        salida.escribir_pares(lote)
+
+# Modo hash: no necesita la entrada ordenada; agrega en un diccionario que
+# se reparte en particiones a disco si supera max_claves claves distintas.
+# Con top se emiten solo las `top` palabras más frecuentes.
+def reducir_hash(bloques, salida, max_claves, ordenada, compresion=None, top=None):
+    with AgregadorHash(max_claves, compresion=compresion) as agregador:
+        for lineas in bloques:
+            agregador.agregar(lineas)
+        if top:
+            escribir_lotes(resumenes.top_k(agregador.resultados(), top), salida)
+        else:
+            escribir_lotes(agregador.resultados(ordenada), salida)
+
+# Modo aproximado: un resumen de memoria constante (Space-Saving o
+# Count-Min) recibe todos los registros sin ordenar. Se emiten las `top`
+# palabras estimadas o, con serializar, el resumen en una línea JSON para
+# fusionarlo después con los de otros reducers (resumenes.py).
+def reducir_aproximado(bloques, salida, resumen, top, serializar):
+    actualizar = resumen.actualizar
+    for lineas in bloques:
+        for line in lineas:
+            if line:
+                word, count = line.split(b'\t', 1)
+                actualizar(word, int(count))
+    if serializar:
+        salida.escribir(flujo_io.codificar(resumenes.a_json(resumen) + "\n"))
+    else:
+        escribir_lotes(resumen.top(top), salida)
+
+# Fusiona las franjas de coocurrencia de una entrada ordenada por palabra
+def reducir_franjas(bloques, salida):
+    for w, franja in coocurrencia.fusionar_franjas(bloques):
+        salida.escribir(coocurrencia.linea_franja(w, franja))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reducer de conteo de palabras para Hadoop streaming")
+    parser.add_argument("--por-lineas", action="store_true",
+                        help="usa la lectura línea a línea con print (versión original)")
+    parser.add_argument("--tam-bloque", type=int, default=flujo_io.TAM_BLOQUE,
+                        help="bytes leídos por bloque de la entrada")
+    parser.add_argument("--ordenar", action="store_true",
+                        help="ordena la entrada antes de reducir (ordenación externa)")
+    parser.add_argument("--memoria-mb", type=int, default=256,
+                        help="MB de registros en memoria al ordenar")
+    parser.add_argument("--comprimir", choices=ordenacion_externa.compresiones(), default=None,
+                        help="comprime los ficheros temporales de la ordenación")
+    parser.add_argument("--hash", action="store_true",
+                        help="agrega con una tabla hash, sin necesidad de entrada ordenada")
+    parser.add_argument("--max-claves", type=int, default=1000000,
+                        help="claves distintas en memoria antes de volcar particiones (modo hash)")
+    parser.add_argument("--ordenada", action="store_true",
+                        help="en modo hash, emite la salida ordenada por clave")
+    parser.add_argument("--top", type=int, default=None,
+                        help="emite solo las K palabras más frecuentes, de mayor a menor")
+    parser.add_argument("--aproximado", choices=sorted(resumenes.TIPOS), default=None,
+                        help="cuenta con un resumen de memoria constante (no necesita entrada ordenada)")
+    parser.add_argument("--contadores", type=int, default=1000,
+                        help="contadores de Space-Saving o candidatos de Count-Min")
+    parser.add_argument("--ancho", type=int, default=2 ** 16, help="ancho del sketch Count-Min")
+    parser.add_argument("--profundidad", type=int, default=4, help="filas del sketch Count-Min")
+    parser.add_argument("--resumen", action="store_true",
+                        help="en modo aproximado, emite el resumen serializado para fusionarlo después")
+    parser.add_argument("--entrada", choices=["auto", "texto", "binaria"], default="auto",
+                        help="formato de la entrada; auto reconoce la cabecera del formato binario")
+    parser.add_argument("--franjas", action="store_true",
+                        help="fusiona franjas de coocurrencia (pymap.py --coocurrencia franjas)")
+    metricas.anadir_argumentos(parser)
+    args = parser.parse_args()
+    # Los resúmenes necesitan al menos un contador (y el sketch una celda)
+    for opcion, valor in (("--contadores", args.contadores), ("--ancho", args.ancho),
+                          ("--profundidad", args.profundidad)):
+        if valor < 1:
+            parser.error("{} tiene que ser al menos 1".format(opcion))
+
+    if args.por_lineas:
+        # La versión original solo suma entradas de texto ya ordenadas
+        ignoradas = [opcion for opcion, valor in [
+            ("--ordenar", args.ordenar), ("--comprimir", args.comprimir), ("--hash", args.hash),
+            ("--ordenada", args.ordenada), ("--top", args.top), ("--aproximado", args.aproximado),
+            ("--resumen", args.resumen), ("--entrada binaria", args.entrada == "binaria"),
+            ("--franjas", args.franjas), ("--metricas", args.metricas),
+            ("--metricas-json", args.metricas_json)] if valor]
+        if ignoradas:
+            parser.error("--por-lineas no se puede combinar con {}".format(", ".join(ignoradas)))
+        reducir(sys.stdin)
+        sys.exit()
+    if args.franjas:
+        # Las franjas solo se fusionan (con --ordenar si la entrada no viene
+        # ordenada); los demás modos leerían las franjas como conteos
+        ignoradas = [opcion for opcion, valor in [
+            ("--hash", args.hash), ("--aproximado", args.aproximado), ("--top", args.top),
+            ("--resumen", args.resumen)] if valor]
+        if ignoradas:
+            parser.error("--franjas no se puede combinar con {}".format(", ".join(ignoradas)))
+
+    # Con métricas se envuelven la entrada, los bloques y la salida
+    medidas = metricas.desde_argumentos(args, "pyreduce")
+    entrada = flujo_io.entrada_binaria()
+    if medidas is not None:
+        entrada = medidas.medir_entrada(entrada, contar_lineas=False)
+    bloques = formato_binario.leer_lineas_auto(entrada, args.tam_bloque, args.entrada)
+    escritor = flujo_io.EscritorBuffer(flujo_io.salida_binaria())
+    if medidas is not None:
+        bloques = medidas.contar_bloques(bloques)
+        escritor = medidas.medir_salida(escritor)
+
+    with escritor as salida:
+        if args.aproximado == "space-saving":
+            reducir_aproximado(bloques, salida, resumenes.SpaceSaving(args.contadores),
+                               args.top or 100, args.resumen)
+        elif args.aproximado == "count-min":
+            reducir_aproximado(bloques, salida,
+                               resumenes.CountMin(args.ancho, args.profundidad, args.contadores),
+                               args.top or 100, args.resumen)
+        elif args.hash:
+            reducir_hash(bloques, salida, args.max_claves, args.ordenada, args.comprimir, args.top)
+        elif args.ordenar:
+            with ordenacion_externa.OrdenadorExterno(args.memoria_mb * MB, compresion=args.comprimir) as ordenador:
+                for lineas in bloques:
+                    ordenador.agregar(lineas)
+                if args.franjas:
+                    reducir_franjas(ordenador.bloques(), salida)
+                elif args.top:
+                    escribir_lotes(resumenes.top_k(agrupar(ordenador.bloques()), args.top), salida)
+                else:
+                    reducir_bloques(ordenador.bloques(), salida)
+        elif args.franjas:
+            reducir_franjas(bloques, salida)
+        elif args.top:
+            escribir_lotes(resumenes.top_k(agrupar(bloques), args.top), salida)
+        else:
+            reducir_bloques(bloques, salida)
+    metricas.informar(medidas, args)
@@ -0,0 +1,259 @@
+#!/usr/bin/python3
+# Resúmenes de frecuencias de memoria acotada para el reducer:
+#   - top_k: las K claves más frecuentes de un flujo de conteos exactos con
+#     un heap de tamaño K
+#   - SpaceSaving: M contadores; da las claves frecuentes con un error
+#     acotado por N/M y se puede fusionar con el de otros reducers
+#   - CountMin: sketch de ancho x profundidad contadores más un conjunto de
+#     candidatos a top-K; también fusionable
+#   - HyperLogLog: número aproximado de claves distintas con 2^p registros
+#     de un byte (error típico 1.04 / sqrt(2^p))
+# Los resúmenes se serializan en una línea JSON para fusionarlos después:
+#
+#   python3 resumenes.py salida/part-* --top 100
+import argparse
+import heapq
+import json
+import math
+import sys
+import zlib
+from array import array
+
+# Las claves llegan como bytes; en JSON se guardan como texto y
+# surrogateescape permite recuperar exactamente los mismos bytes
+def clave_a_texto(clave):
+    return clave.decode("utf-8", "surrogateescape")
+
+def texto_a_clave(texto):
+    return texto.encode("utf-8", "surrogateescape")
+
+# Las K parejas (clave, conteo) con más conteo, de mayor a menor y por clave
+# en caso de empate; heapq.nsmallest mantiene un heap de tamaño K
+def top_k(pares, k):
+    return heapq.nsmallest(k, pares, key=lambda par: (-par[1], par[0]))
+
+class SpaceSaving:
+    def __init__(self, contadores=1000):
+        self.m = contadores
+        self.conteos = {}   # clave -> conteo estimado
+        self.errores = {}   # clave -> sobreestimación máxima
+        self.heap = []      # (conteo, clave), con entradas obsoletas
+        self.total = 0
+
+    # Quita del heap entradas que ya no coinciden con el conteo actual y
+    # devuelve la clave con menor conteo
+    def minimo(self):
+        while True:
+            conteo, clave = self.heap[0]
+            if self.conteos.get(clave) == conteo:
+                return clave
+            heapq.heappop(self.heap)
+
+    def actualizar(self, clave, conteo=1):
+        self.total += conteo
+        conteos = self.conteos
+        if clave in conteos:
+            conteos[clave] += conteo
+        elif len(conteos) < self.m:
+            conteos[clave] = conteo
+            self.errores[clave] = 0
+        else:
+            # la clave nueva hereda el conteo del mínimo como error
+            fuera = self.minimo()
+            minimo = conteos.pop(fuera)
+            del self.errores[fuera]
+            conteos[clave] = minimo + conteo
+            self.errores[clave] = minimo
+        heapq.heappush(self.heap, (conteos[clave], clave))
+        # el heap crece con entradas obsoletas; se reconstruye de vez en cuando
+        if len(self.heap) > 4 * self.m:
+            self.heap = [(c, k) for k, c in conteos.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, k):
+        return top_k(self.conteos.items(), k)
+
+    # Fusión de dos resúmenes: a las claves que faltan en uno se les suma el
+    # mínimo de ese resumen (su cota superior) y se quedan los M mayores
+    def fusionar(self, otro):
+        min_a = min(self.conteos.values()) if len(self.conteos) >= self.m else 0
+        min_b = min(otro.conteos.values()) if len(otro.conteos) >= otro.m else 0
+        conteos, errores = {}, {}
+        for clave in set(self.conteos) | set(otro.conteos):
+            conteos[clave] = self.conteos.get(clave, min_a) + otro.conteos.get(clave, min_b)
+            errores[clave] = self.errores.get(clave, min_a) + otro.errores.get(clave, min_b)
+        mejores = top_k(conteos.items(), self.m)
+        self.conteos = dict(mejores)
+        self.errores = {clave: errores[clave] for clave, _ in mejores}
+        self.heap = [(c, k) for k, c in self.conteos.items()]
+        heapq.heapify(self.heap)
+        self.total += otro.total
+
+    def a_dict(self):
+        return {"tipo": "space-saving", "m": self.m, "total": self.total,
+                "contadores": [[clave_a_texto(k), c, self.errores[k]] for k, c in self.conteos.items()]}
+
+    @classmethod
+    def de_dict(cls, datos):
+        resumen = cls(datos["m"])
+        resumen.total = datos["total"]
+        for texto, conteo, error in datos["contadores"]:
+            clave = texto_a_clave(texto)
+            resumen.conteos[clave] = conteo
+            resumen.errores[clave] = error
+        resumen.heap = [(c, k) for k, c in resumen.conteos.items()]
+        heapq.heapify(resumen.heap)
+        return resumen
+
+class CountMin:
+    def __init__(self, ancho=2 ** 16, profundidad=4, candidatos=1000):
+        self.ancho = ancho
+        self.profundidad = profundidad
+        self.k = candidatos
+        self.filas = [array("q", bytes(8 * ancho)) for _ in range(profundidad)]
+        self.candidatos = {}   # clave -> estimación, las k mayores vistas
+        self.heap = []         # (estimación, clave), con entradas obsoletas
+        self.total = 0
+
+    def posiciones(self, clave):
+        return [zlib.crc32(clave, semilla) % self.ancho for semilla in range(1, self.profundidad + 1)]
+
+    def estimar(self, clave):
+        return min(fila[p] for fila, p in zip(self.filas, self.posiciones(clave)))
+
+    def actualizar(self, clave, conteo=1):
+        self.total += conteo
+        estimacion = None
+        for fila, p in zip(self.filas, self.posiciones(clave)):
+            fila[p] += conteo
+            if estimacion is None or fila[p] < estimacion:
+                estimacion = fila[p]
+        self.proponer(clave, estimacion)
+
+    # Igual que en SpaceSaving: quita las entradas obsoletas del heap y
+    # devuelve el candidato con menor estimación
+    def minimo(self):
+        while True:
+            estimacion, clave = self.heap[0]
+            if self.candidatos.get(clave) == estimacion:
+                return clave
+            heapq.heappop(self.heap)
+
+    def rehacer_heap(self):
+        self.heap = [(c, k) for k, c in self.candidatos.items()]
+        heapq.heapify(self.heap)
+
+    def proponer(self, clave, estimacion):
+        candidatos = self.candidatos
+        anterior = candidatos.get(clave)
+        if anterior is not None or len(candidatos) < self.k:
+            if anterior == estimacion:
+                return
+            candidatos[clave] = estimacion
+        else:
+            fuera = self.minimo()
+            if estimacion <= candidatos[fuera]:
+                return
+            del candidatos[fuera]
+            candidatos[clave] = estimacion
+        heapq.heappush(self.heap, (estimacion, clave))
+        # el heap crece con entradas obsoletas; se reconstruye de vez en cuando
+        if len(self.heap) > 4 * self.k:
+            self.rehacer_heap()
+
+    def top(self, k):
+        return top_k(self.candidatos.items(), k)
+
+    # Los sketches con las mismas dimensiones se fusionan sumando celda a
+    # celda; los candidatos de ambos se reestiman sobre el sketch sumado
+    def fusionar(self, otro):
+        if (self.ancho, self.profundidad) != (otro.ancho, otro.profundidad):
+            raise ValueError("no se pueden fusionar sketches de distinto tamaño")
+        for fila, otra in zip(self.filas, otro.filas):
+            for i, valor in enumerate(otra):
+                if valor:
+                    fila[i] += valor
+        self.total += otro.total
+        claves = set(self.candidatos) | set(otro.candidatos)
+        self.candidatos = {}
+        self.heap = []
+        for clave in claves:
+            self.proponer(clave, self.estimar(clave))
+
+    def a_dict(self):
+        return {"tipo": "count-min", "ancho": self.ancho, "profundidad": self.profundidad,
+                "k": self.k, "total": self.total, "filas": [fila.tolist() for fila in self.filas],
+                "candidatos": [[clave_a_texto(k), c] for k, c in self.candidatos.items()]}
+
+    @classmethod
+    def de_dict(cls, datos):
+        resumen = cls(datos["ancho"], datos["profundidad"], datos["k"])
+        resumen.total = datos["total"]
+        resumen.filas = [array("q", fila) for fila in datos["filas"]]
+        resumen.candidatos = {texto_a_clave(t): c for t, c in datos["candidatos"]}
+        resumen.rehacer_heap()
+        return resumen
+
+# Usa hash() de Python, que cambia entre procesos: sirve para contar dentro
+# de un proceso, no para fusionar registros de varios
+class HyperLogLog:
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registros = bytearray(self.m)
+        self.resto = 64 - p
+
+    def actualizar(self, clave):
+        h = hash(clave) & 0xffffffffffffffff
+        i = h >> self.resto
+        # posición del primer 1 en los bits que quedan
+        rango = self.resto - (h & ((1 << self.resto) - 1)).bit_length() + 1
+        if rango > self.registros[i]:
+            self.registros[i] = rango
+
+    def estimar(self):
+        m = self.m
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimacion = alfa * m * m / sum(2.0 ** -r for r in self.registros)
+        vacios = self.registros.count(0)
+        # con pocas claves es más precisa la cuenta de registros vacíos
+        if estimacion <= 2.5 * m and vacios:
+            estimacion = m * math.log(m / vacios)
+        return int(round(estimacion))
+
+TIPOS = {"space-saving": SpaceSaving, "count-min": CountMin}
+
+def a_json(resumen):
+    return json.dumps(resumen.a_dict())
+
+def de_json(texto):
+    datos = json.loads(texto)
+    return TIPOS[datos["tipo"]].de_dict(datos)
+
+# Lee los resúmenes (una línea JSON cada uno) de varios ficheros y los fusiona
+def fusionar_ficheros(rutas):
+    total = None
+    for ruta in rutas:
+        with open(ruta, encoding="ascii") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                resumen = de_json(linea)
+                if total is None:
+                    total = resumen
+                else:
+                    total.fusionar(resumen)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fusiona los resúmenes aproximados de varios reducers")
+    parser.add_argument("ficheros", nargs="+", help="ficheros con resúmenes generados con pyreduce.py --resumen")
+    parser.add_argument("--top", type=int, default=100, help="claves más frecuentes a mostrar")
+    args = parser.parse_args()
+
+    resumen = fusionar_ficheros(args.ficheros)
+    if resumen is None:
+        sys.exit("no se ha encontrado ningún resumen")
+    salida = sys.stdout.buffer
+    for clave, conteo in resumen.top(args.top):
+        salida.write(b"%s\t%d\n" % (clave, conteo))
@@ -0,0 +1,39 @@
+# python3 -m pytest test_limpiar_csv.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import limpiar_csv
+import limpieza
+
+def test_process_row_cambia_la_coma_decimal():
+    assert limpiar_csv.process_row(['x', '7,9', '-12,5']) == ['x', '7.9', '-12.5']
+
+def test_process_row_deja_el_texto_con_comas():
+    fila = ['Action, Adventure', '1,2,3', '7,', 'null']
+    assert limpiar_csv.process_row(fila) == fila
+
+# "7,9" llega entre comillas en el CSV; sin la coma ya no hacen falta
+def test_limpiar_corrige_las_celdas_entrecomilladas(tmp_path):
+    entrada = tmp_path / 'entrada.csv'
+    salida = tmp_path / 'salida.csv'
+    entrada.write_text('x,"7,9"\n"Action, Adventure","6,6"\n', encoding='utf-8')
+    for procesos in (1, 2):
+        assert limpiar_csv.limpiar(str(entrada), str(salida), procesos, filas_lote=1) == 2
+        assert salida.read_text(encoding='utf-8').splitlines() == ['x,7.9', '"Action, Adventure",6.6']
+
+# Un presupuesto que no es un número no se queda como nulo sin avisar: la
+# fila se descarta y se cuenta, o con filas_malas="error" se para
+def test_limpieza_descarta_las_filas_con_texto_en_columnas_numericas(tmp_path):
+    entrada = tmp_path / 'entrada.csv'
+    salida = tmp_path / 'salida.csv'
+    entrada.write_text('Iron Man,Jon Favreau,null,02/05/08,"7,9",79,94,91,3.7,A,140,319,585.8\n'
+                       'Thor,Kenneth Branagh,null,06/05/11,7.0,57,77,76,3.1,B+,desconocido,181,449.3\n',
+                       encoding='utf-8')
+    assert limpieza.limpiar(str(entrada), str(salida), 'csv', filas_malas='saltar') == (1, 1)
+    assert salida.read_text(encoding='utf-8').startswith('Iron Man,Jon Favreau,\\N,02/05/08,7.9,79,')
+    with pytest.raises(ValueError, match="línea 2 .*'desconocido' en budget"):
+        limpieza.limpiar(str(entrada), str(salida), 'csv', filas_malas='error')
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+# Normalización y partición en palabras para pymap.py. Todas las
+# operaciones trabajan sobre el bloque de texto completo (lower, replace,
+# normalize, translate o una expresión regular compilada) en lugar de
+# palabra a palabra, y solo el filtro de stopwords recorre las palabras.
+#
+#   python3 tokenizador.py    -> cardinalidad y MB/s de cada configuración
+#                                sobre el_quijote.txt
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+# Palabras vacías del español más habituales
+STOPWORDS_ES = """
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde
+durante e el ella ellas ellos en entre era eras es esa esas ese eso esos esta estaba
+estas este esto estos fue fueron ha habia han hasta hay la las le les lo los mas me
+mi mis mucho muy nada ni no nos nosotros o os otra otras otro otros para pero poco
+por porque que quien se sea ser si sin sino sobre su sus tambien tan te tu tus un una
+uno unos y ya yo él más qué sí también había cuál quién
+""".split()
+
+# Vocales acentuadas que se sustituyen al quitar acentos; la ñ se mantiene
+# porque en español es otra letra ("año" y "ano" no son la misma palabra).
+# También se cubren las formas descompuestas (vocal + marca combinable),
+# así no hace falta pasar antes por NFC.
+ACENTOS = {
+    "á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u", "ü": "u",
+    "à": "a", "è": "e", "ì": "i", "ò": "o", "ù": "u",
+    "Á": "A", "É": "E", "Í": "I", "Ó": "O", "Ú": "U", "Ü": "U",
+    "À": "A", "È": "E", "Ì": "I", "Ò": "O", "Ù": "U",
+    "n\u0303": "ñ", "N\u0303": "Ñ",
+    "\u0301": "", "\u0300": "", "\u0308": "",
+}
+
+# Signos de puntuación y símbolos de los primeros bloques Unicode (latín,
+# puntuación general, monedas...), que se convierten en espacios
+def caracteres_puntuacion(hasta=0x3000):
+    return [chr(c) for c in range(hasta)
+            if unicodedata.category(chr(c))[0] in "PS"]
+
+class Tokenizador:
+    # metodo: cómo se trata la puntuación sobre el bloque entero
+    #   "sub":   sustitución con una clase de caracteres compilada + split
+    #   "tabla": str.translate con tabla de puntuación + split
+    #   "regex": findall de secuencias de letras y dígitos
+    # acentos: None, "nfc" (unifica formas compuestas/descompuestas) o
+    #          "quitar" (quita las tildes de las vocales, mantiene la ñ)
+    def __init__(self, minusculas=False, puntuacion=False, acentos=None, stopwords=None, metodo="sub"):
+        if acentos not in (None, "nfc", "quitar"):
+            raise ValueError("acentos debe ser None, 'nfc' o 'quitar'")
+        if metodo not in ("sub", "tabla", "regex"):
+            raise ValueError("metodo debe ser 'sub', 'tabla' o 'regex'")
+        self.minusculas = minusculas
+        self.puntuacion = puntuacion
+        self.acentos = acentos
+        self.metodo = metodo
+
+        signos = caracteres_puntuacion() if puntuacion else []
+        self.tabla = dict.fromkeys(map(ord, signos), " ")
+        self.clase = re.compile("[" + re.escape("".join(signos)) + "]") if signos else None
+        # Secuencias de letras y dígitos ([^\W_]) más las marcas diacríticas
+        # combinables, que \w no incluye y aparecen en textos sin NFC
+        self.patron = re.compile(r"(?:[^\W_]|[\u0300-\u036f])+" if puntuacion else r"\S+")
+
+        # Las stopwords se normalizan igual que el texto
+        self.stopwords = None
+        if stopwords:
+            self.stopwords = set(self.tokens(" ".join(stopwords), filtrar=False))
+
+    def normalizar(self, texto):
+        if self.acentos == "nfc":
+            if not unicodedata.is_normalized("NFC", texto):
+                texto = unicodedata.normalize("NFC", texto)
+        elif self.acentos == "quitar":
+            # replace encadenados: mucho más rápido que translate o re.sub
+            # con función para un puñado de caracteres
+            for origen, destino in ACENTOS.items():
+                texto = texto.replace(origen, destino)
+        if self.minusculas:
+            texto = texto.lower()
+        if self.puntuacion and self.metodo == "sub":
+            texto = self.clase.sub(" ", texto)
+        elif self.puntuacion and self.metodo == "tabla":
+            texto = texto.translate(self.tabla)
+        return texto
+
+    # Palabras de un bloque de texto (una o muchas líneas)
+    def tokens(self, texto, filtrar=True):
+        texto = self.normalizar(texto)
+        if self.metodo == "regex":
+            palabras = self.patron.findall(texto)
+        else:
+            palabras = texto.split()
+        if filtrar and self.stopwords:
+            stop = self.stopwords
+            palabras = [w for w in palabras if w not in stop]
+        return palabras
+
+    # True si no cambia nada respecto a split(), para usar el camino directo
+    def es_trivial(self):
+        return not (self.minusculas or self.puntuacion or self.acentos or self.stopwords
+                    or self.metodo == "regex")
+
+def leer_stopwords(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+# Añade al parser las opciones de normalización (las usa pymap.py)
+def anadir_argumentos(parser):
+    grupo = parser.add_argument_group("normalización")
+    grupo.add_argument("-n", "--normalizar", action="store_true",
+                       help="atajo para --minusculas --sin-puntuacion --acentos nfc")
+    grupo.add_argument("--minusculas", action="store_true", help="pasa el texto a minúsculas")
+    grupo.add_argument("--sin-puntuacion", action="store_true", help="la puntuación separa palabras")
+    grupo.add_argument("--acentos", choices=["nfc", "quitar"], default=None,
+                       help="nfc unifica la codificación; quitar elimina las tildes (no la ñ)")
+    grupo.add_argument("--stopwords", nargs="?", const="es", default=None,
+                       help="filtra palabras vacías: lista interna del español o un fichero")
+    grupo.add_argument("--metodo", choices=["sub", "tabla", "regex"], default="sub",
+                       help="cómo se quita la puntuación: re.sub con clase de caracteres, "
+                            "str.translate o re.findall")
+
+def desde_argumentos(args):
+    stopwords = None
+    if args.stopwords == "es":
+        stopwords = STOPWORDS_ES
+    elif args.stopwords:
+        stopwords = leer_stopwords(args.stopwords)
+    return Tokenizador(
+        minusculas=args.minusculas or args.normalizar,
+        puntuacion=args.sin_puntuacion or args.normalizar,
+        acentos=args.acentos or ("nfc" if args.normalizar else None),
+        stopwords=stopwords,
+        metodo=args.metodo,
+    )
+
+if __name__ == "__main__":
+    quijote = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "..", "Spark", "recursos", "el_quijote.txt")
+    parser = argparse.ArgumentParser(description="Cardinalidad de claves y rendimiento de cada normalización")
+    parser.add_argument("fichero", nargs="?", default=quijote)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.fichero, encoding="utf-8") as f:
+        texto = f.read()
+    mb = len(texto.encode("utf-8")) / (1024 * 1024)
+
+    configuraciones = [
+        ("split", Tokenizador()),
+        ("minusculas", Tokenizador(minusculas=True)),
+        ("min+punt sub", Tokenizador(minusculas=True, puntuacion=True)),
+        ("min+punt tabla", Tokenizador(minusculas=True, puntuacion=True, metodo="tabla")),
+        ("min+punt regex", Tokenizador(minusculas=True, puntuacion=True, metodo="regex")),
+        ("min+punt+nfc", Tokenizador(minusculas=True, puntuacion=True, acentos="nfc")),
+        ("min+punt+sin acentos", Tokenizador(minusculas=True, puntuacion=True, acentos="quitar")),
+        ("todo+stopwords", Tokenizador(minusculas=True, puntuacion=True, acentos="quitar",
+                                       stopwords=STOPWORDS_ES)),
+    ]
+    base = None
+    print("{:<22} {:>10} {:>10} {:>10} {:>9}".format("configuración", "palabras", "claves", "reducción", "MB/s"))
+    for nombre, tokenizador in configuraciones:
+        inicio = time.perf_counter()
+        for _ in range(args.repeticiones):
+            palabras = tokenizador.tokens(texto)
+        segundos = (time.perf_counter() - inicio) / args.repeticiones
+        claves = len(Counter(palabras))
+        base = base or claves
+        print("{:<22} {:>10} {:>10} {:>9.1f}% {:>9.1f}".format(
+            nombre, len(palabras), claves, 100 * (1 - claves / base), mb / segundos), file=sys.stdout)
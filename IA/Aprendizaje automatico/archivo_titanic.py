@@ -1,12 +1,11 @@
+# Solo lo que usan las funciones del modelo: este fichero se importa para
+# cargar Titanic_model.pkl y model_selection, compose... no hacen falta
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score, RandomizedSearchCV
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import OneHotEncoder,  StandardScaler, FunctionTransformer
-from sklearn.pipeline import Pipeline, make_pipeline
-from sklearn import set_config
-from sklearn.compose import ColumnTransformer
-import joblib
+from sklearn.preprocessing import FunctionTransformer
+from sklearn.pipeline import make_pipeline
 
 def column_family(X):
     return X[:, [0]] + X[:, [1]]
@@ -31,7 +30,77 @@ def categorize_age(X):
     
     return categorized_age.reshape(-1, 1)
 
-final_model_reloaded = joblib.load("Titanic_model.pkl")
-new_data = pd.read_csv("titanic.csv")  # Escribe la ruta del archivo 
-predictions = final_model_reloaded.predict(new_data)
-print(predictions)
\ No newline at end of file
+# Versiones vectorizadas de las funciones de arriba como transformadores sin
+# estado: solo devuelven números (float64), sin pasar por arrays de objetos ni
+# por pd.cut, y escriben en un array reservado de antemano. Las funciones se
+# quedan porque Titanic_model.pkl las tiene guardadas; actualizar_pipeline
+# cambia en el modelo ya cargado cada FunctionTransformer por su versión
+# nueva, con las mismas predicciones.
+class Transformador(TransformerMixin, BaseEstimator):
+    def fit(self, X, y=None):
+        return self
+
+    # No aprenden nada: están listos para transform sin fit
+    def __sklearn_is_fitted__(self):
+        return True
+
+    # Una columna de salida por cada una de entrada, con el mismo nombre
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(input_features, dtype=object)
+
+class SumaFamilia(Transformador):
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        salida = np.empty((X.shape[0], 1))
+        np.add(X[:, 0], X[:, 1], out=salida[:, 0])
+        return salida
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(["family"], dtype=object)
+
+class CodificarSexo(Transformador):
+    # 'male' -> 0 y cualquier otro valor -> 1, como encode_sex, pero sin
+    # modificar la entrada
+    def transform(self, X):
+        X = np.asarray(X)
+        salida = np.empty((X.shape[0], 1))
+        salida[:, 0] = X[:, 0] != "male"
+        return salida
+
+class TramosEdad(Transformador):
+    # Mismos tramos que categorize_age: (-1, 16] -> 1, (16, 32] -> 2 ... (64, 100] -> 5
+    bordes = np.array([-1, 16, 32, 48, 64, 100], dtype=np.float64)
+
+    def transform(self, X):
+        edades = np.asarray(X, dtype=np.float64)[:, 0]
+        tramos = np.searchsorted(self.bordes, edades, side="left")
+        # Fuera de (-1, 100] pd.cut daba NaN y astype(int) fallaba; NaN
+        # también cae al final
+        if len(tramos) and (tramos.min() < 1 or tramos.max() >= len(self.bordes)):
+            raise ValueError("Hay edades fuera del rango (-1, 100]")
+        salida = np.empty((edades.shape[0], 1))
+        salida[:, 0] = tramos
+        return salida
+
+NUEVOS = {"column_family": SumaFamilia, "encode_sex": CodificarSexo, "categorize_age": TramosEdad}
+
+# Sustituye en un pipeline del Titanic ya entrenado los FunctionTransformer
+# de column_family, encode_sex y categorize_age por los transformadores de
+# arriba (el resto del modelo no cambia)
+def actualizar_pipeline(modelo):
+    for _, transformador, _ in modelo[0].transformers_:
+        for i, (nombre, paso) in enumerate(getattr(transformador, "steps", [])):
+            funcion = getattr(getattr(paso, "func", None), "__name__", None)
+            if isinstance(paso, FunctionTransformer) and funcion in NUEVOS:
+                transformador.steps[i] = (nombre, NUEVOS[funcion]())
+    return modelo
+
+# Las funciones de arriba tienen que existir al cargar el modelo, así que
+# otros scripts (modelos.py, puntuar_lote.py) importan este fichero sin
+# ejecutar la predicción
+if __name__ == "__main__":
+    import joblib
+    final_model_reloaded = actualizar_pipeline(joblib.load("Titanic_model.pkl"))
+    new_data = pd.read_csv("titanic.csv")  # Escribe la ruta del archivo 
+    predictions = final_model_reloaded.predict(new_data)
+    print(predictions)
\ No newline at end of file
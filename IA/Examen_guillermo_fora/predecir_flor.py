@@ -19,7 +19,7 @@ def predecir():
         anc_sepalo = float(input("Escribe la anchura del sépalo: "))
         lar_sepalo = float(input("Escribe la largura del sépalo: "))
         
-        if anc_petalo <= 0 or lar_petalo <= 0 or anc_petalo <= 0 or lar_petalo <= 0 :
+        if anc_petalo <= 0 or lar_petalo <= 0 or anc_sepalo <= 0 or lar_sepalo <= 0 :
             raise ValueError("Los valores de anchura y largura del petalo y sepalo deben ser mayores que 0.")
         nueva_muestra = np.array([lar_sepalo, anc_sepalo, lar_petalo, anc_petalo]).reshape(1, -1)
 
@@ -0,0 +1,134 @@
+# Artefactos de modelo para cargar con memoria compartida: el modelo se
+# vuelve a guardar con joblib sin comprimir, de forma que joblib.load con
+# mmap_mode='r' proyecta los arrays de NumPy (coeficientes, medias del
+# escalador...) en lugar de leerlos y copiarlos, y varios procesos que
+# cargan el mismo fichero comparten las mismas páginas físicas.
+# Ojo: los árboles de sklearn copian sus nodos a memoria propia al
+# deserializarse, así que en un RandomForest solo se comparte lo que no son
+# nodos.
+#
+#   python3 artefactos.py exportar titanic
+#   python3 artefactos.py medir titanic -p 4   carga en frío, RSS y PSS por
+#                                              proceso, antes y después
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# sha1 del .pkl del que sale un artefacto (este, el bosque de
+# bosque_plano.py o el módulo de exportar_numpy.py). Cada artefacto lo
+# guarda y modelos.py no lo usa si el .pkl ha cambiado desde entonces.
+def sha1_fichero(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+# Fichero del artefacto junto al .pkl original: modelo.pkl -> modelo.mmap.joblib
+def ruta_artefacto(ruta_pkl):
+    return os.path.splitext(ruta_pkl)[0] + '.mmap.joblib'
+
+# Se guarda el estimador junto con el sha1 del .pkl del que sale
+def exportar(estimador, destino, origen_sha1=None):
+    import joblib
+    joblib.dump({'origen_sha1': origen_sha1, 'modelo': estimador}, destino, compress=0)
+    return destino
+
+# Devuelve el estimador y el sha1 de su .pkl (None en los artefactos
+# exportados antes de guardarlo, que solo tienen el estimador)
+def cargar(destino, mmap=True):
+    import joblib
+    contenido = joblib.load(destino, mmap_mode='r' if mmap else None)
+    if isinstance(contenido, dict) and 'modelo' in contenido:
+        return contenido['modelo'], contenido.get('origen_sha1')
+    return contenido, None
+
+# Memoria del proceso en bytes según /proc (Linux). PSS reparte las páginas
+# compartidas entre los procesos que las usan, RSS las cuenta enteras.
+def memoria():
+    datos = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for linea in f:
+                partes = linea.split()
+                if partes[0] in ('Rss:', 'Pss:'):
+                    datos[partes[0][:-1].lower()] = int(partes[1]) * 1024
+    except OSError:
+        pass
+    return datos
+
+# Proceso hijo de `medir`: carga el modelo, informa y espera a que el padre
+# le pida la memoria con todos los hijos vivos a la vez
+def hijo(nombre, artefacto):
+    import modelos
+    # sklearn se importa antes de medir: aquí solo interesa lo que cuesta el
+    # modelo en sí, no importar sklearn
+    import joblib
+    import sklearn.compose, sklearn.ensemble, sklearn.impute, sklearn.linear_model
+    import sklearn.pipeline, sklearn.preprocessing, sklearn.svm
+    antes = memoria()
+    info = modelos.MODELOS[nombre]
+    if 'funciones' in info:
+        modelos.registrar_funciones(info['funciones'])
+    ruta = os.path.join(modelos.DIRECTORIO, info['ruta'])
+    inicio = time.perf_counter()
+    if artefacto:
+        modelo, _ = cargar(ruta_artefacto(ruta), mmap=True)
+    else:
+        modelo = joblib.load(ruta)
+    segundos = time.perf_counter() - inicio
+    print(json.dumps({'carga_s': segundos, 'antes': antes}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(memoria()), flush=True)
+    return modelo
+
+def medir(nombre, procesos, artefacto):
+    orden = [sys.executable, os.path.abspath(__file__), '_hijo', nombre] + (['--artefacto'] if artefacto else [])
+    hijos = [subprocess.Popen(orden, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=DIRECTORIO)
+             for _ in range(procesos)]
+    cargas = [json.loads(h.stdout.readline()) for h in hijos]
+    for h in hijos:
+        h.stdin.write('\n')
+        h.stdin.flush()
+    memorias = [json.loads(h.stdout.readline()) for h in hijos]
+    for h in hijos:
+        h.wait()
+    n = len(hijos)
+    return {
+        'carga_ms': sum(c['carga_s'] for c in cargas) / n * 1000,
+        'rss_mb': sum(m['rss'] - c['antes']['rss'] for m, c in zip(memorias, cargas)) / n / 2 ** 20,
+        'pss_mb': sum(m['pss'] - c['antes']['pss'] for m, c in zip(memorias, cargas)) / n / 2 ** 20,
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '_hijo':
+        hijo(sys.argv[2], '--artefacto' in sys.argv)
+        sys.exit(0)
+
+    import modelos
+    parser = argparse.ArgumentParser(description='Exporta modelos para cargarlos con mmap y mide la carga')
+    parser.add_argument('accion', choices=['exportar', 'medir'])
+    parser.add_argument('modelos', nargs='*', help='por defecto todos los de modelos.py')
+    parser.add_argument('-p', '--procesos', type=int, default=4, help='procesos que cargan a la vez al medir')
+    args = parser.parse_args()
+
+    for nombre in args.modelos or list(modelos.MODELOS):
+        ruta = os.path.join(modelos.DIRECTORIO, modelos.MODELOS[nombre]['ruta'])
+        if args.accion == 'exportar':
+            destino = exportar(modelos.Modelo(nombre).modelo, ruta_artefacto(ruta), sha1_fichero(ruta))
+            print('{:<10} {} ({:.1f} KB -> {:.1f} KB)'.format(nombre, os.path.relpath(destino, DIRECTORIO),
+                  os.path.getsize(ruta) / 1024, os.path.getsize(destino) / 1024))
+            continue
+        if not os.path.exists(ruta_artefacto(ruta)):
+            print('{:<10} sin artefacto, usa antes: artefactos.py exportar {}'.format(nombre, nombre))
+            continue
+        for etiqueta, artefacto in (('pkl', False), ('mmap', True)):
+            r = medir(nombre, args.procesos, artefacto)
+            print('{:<10} {:<5} carga {:>8.1f} ms   RSS {:>6.2f} MB   PSS {:>6.2f} MB por proceso ({} procesos)'.format(
+                nombre, etiqueta, r['carga_ms'], r['rss_mb'], r['pss_mb'], args.procesos))
@@ -0,0 +1,275 @@
+# Bosque aleatorio "plano": convierte un RandomForestClassifier ya entrenado
+# (solo o al final de un Pipeline con SimpleImputer y/o StandardScaler, como
+# modelo_ej1.pkl) en unos pocos arrays contiguos de NumPy y lo evalúa sin
+# pasar por sklearn:
+#   hijos                hijos izquierdo y derecho de cada nodo (2*nodo y
+#                        2*nodo+1), con los índices de todo el bosque; en las
+#                        hojas los dos apuntan a la propia hoja
+#   variable, umbral     variable y umbral de cada corte
+#   valor                probabilidades de cada clase en cada nodo
+#   raices               nodo raíz de cada árbol
+# Un lote entero baja por todos los árboles a la vez: en cada paso se
+# avanza un nivel en los pares (fila, árbol) que aún no han llegado a una
+# hoja, y los que llegan se quitan del conjunto activo, así que el trabajo
+# es la suma de las profundidades recorridas y no pares x `profundidad`
+# (en un bosque profundo la mayoría de ramas acaba mucho antes). Aun así,
+# en lotes grandes sklearn recorre cada árbol en C y va más rápido; a partir
+# de MAX_FILAS filas se usa el estimador original, que se carga del .pkl
+# la primera vez que hace falta (cargar con ruta_pkl). Se reproducen los
+# mismos cálculos que sklearn (escalado en float64, comparación en float32 y
+# suma de árboles en el mismo orden), así que el resultado es idéntico a
+# predict/predict_proba. El umbral se guarda en float32 redondeado hacia
+# abajo: para un x en float32, x <= umbral64 equivale a x <= umbral32.
+# Se guarda como un directorio de .npy que se carga con mmap, de forma que
+# varios procesos comparten los nodos (cosa que el pickle de sklearn no
+# permite).
+#
+#   python3 bosque_plano.py convertir flor      -> modelo_ej1.bosque/
+#   python3 bosque_plano.py comprobar flor      compara con sklearn y mide
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import artefactos
+
+# Filas que se recorren de una vez
+BLOQUE = 4096
+# Filas a partir de las que predict usa el estimador de sklearn si lo hay
+MAX_FILAS = 500
+
+ARRAYS = ['relleno', 'media', 'escala', 'hijos', 'variable', 'umbral', 'valor', 'raices', 'clases']
+
+# Directorio del bosque junto al .pkl: modelo.pkl -> modelo.bosque
+def ruta_bosque(ruta_pkl):
+    return os.path.splitext(ruta_pkl)[0] + '.bosque'
+
+# Pasos de un Pipeline, deshaciendo los Pipeline anidados
+def pasos_pipeline(estimador):
+    if not hasattr(estimador, 'named_steps'):
+        return [estimador]
+    return [paso for interno in estimador.named_steps.values() for paso in pasos_pipeline(interno)]
+
+class BosquePlano:
+    def __init__(self, arrays, profundidad, n_variables, ruta_pkl=None):
+        self.arrays = arrays
+        for nombre in ARRAYS:
+            setattr(self, nombre, arrays.get(nombre))
+        self.profundidad = profundidad
+        self.n_variables = n_variables
+        self.classes_ = self.clases
+        self.n_arboles = len(self.raices)
+        self.n_nodos = len(self.variable)
+        # En las hojas los dos hijos apuntan a la propia hoja
+        self.hoja = self.hijos[0::2] == np.arange(self.n_nodos)
+        # Estimador de sklearn equivalente para los lotes grandes
+        self.ruta_pkl = ruta_pkl
+        self.respaldo = None
+        # sha1 del .pkl del que sale (lo pone cargar con el de bosque.json)
+        self.origen_sha1 = None
+
+    @classmethod
+    def desde_sklearn(cls, estimador):
+        pasos = pasos_pipeline(estimador)
+        bosque = pasos[-1]
+        if type(bosque).__name__ != 'RandomForestClassifier':
+            raise ValueError('el último paso tiene que ser un RandomForestClassifier, no {}'.format(
+                type(bosque).__name__))
+        if bosque.n_outputs_ != 1:
+            raise ValueError('solo se admiten bosques con una salida')
+        n = bosque.n_features_in_
+        arrays = {'relleno': None, 'media': None, 'escala': None}
+        for paso in pasos[:-1]:
+            tipo = type(paso).__name__
+            if tipo == 'SimpleImputer' and arrays['media'] is None and arrays['relleno'] is None:
+                if not (isinstance(paso.missing_values, float) and np.isnan(paso.missing_values)):
+                    raise ValueError('solo se admite SimpleImputer con missing_values=nan')
+                if np.isnan(paso.statistics_).any() or getattr(paso, 'add_indicator', False):
+                    raise ValueError('SimpleImputer con columnas vacías o indicador no admitido')
+                arrays['relleno'] = np.asarray(paso.statistics_, dtype=np.float64)
+            elif tipo == 'StandardScaler' and arrays['media'] is None:
+                arrays['media'] = np.asarray(paso.mean_ if paso.with_mean else np.zeros(n), dtype=np.float64)
+                arrays['escala'] = np.asarray(paso.scale_ if paso.with_std else np.ones(n), dtype=np.float64)
+            else:
+                raise ValueError('paso no admitido antes del bosque: {}'.format(tipo))
+
+        hijos, variable, umbral, valor, raices = [], [], [], [], []
+        inicio = 0
+        profundidad = 0
+        for arbol in bosque.estimators_:
+            t = arbol.tree_
+            hoja = t.children_left == -1
+            propio = np.arange(inicio, inicio + t.node_count)
+            hijos.append(np.stack([np.where(hoja, propio, t.children_left + inicio),
+                                   np.where(hoja, propio, t.children_right + inicio)], axis=1).ravel())
+            variable.append(np.where(hoja, 0, t.feature))
+            umbral.append(np.where(hoja, 0.0, t.threshold))
+            # Mismas probabilidades que DecisionTreeClassifier.predict_proba
+            v = t.value[:, 0, :bosque.n_classes_].astype(np.float64)
+            normal = v.sum(axis=1, keepdims=True)
+            normal[normal == 0.0] = 1.0
+            valor.append(v / normal)
+            raices.append(inicio)
+            inicio += t.node_count
+            profundidad = max(profundidad, t.max_depth)
+        umbral = np.concatenate(umbral)
+        umbral32 = umbral.astype(np.float32)
+        arriba = umbral32 > umbral
+        umbral32[arriba] = np.nextafter(umbral32[arriba], np.float32(-np.inf))
+        arrays.update({
+            'hijos': np.concatenate(hijos).astype(np.int32),
+            'variable': np.concatenate(variable).astype(np.int32),
+            'umbral': umbral32,
+            'valor': np.ascontiguousarray(np.concatenate(valor)),
+            'raices': np.array(raices, dtype=np.int32),
+            'clases': np.asarray(bosque.classes_),
+        })
+        return cls({k: v for k, v in arrays.items() if v is not None}, profundidad, n)
+
+    # origen_sha1 es el sha1 del .pkl convertido, para saber si se ha vuelto
+    # a entrenar después
+    def guardar(self, directorio, origen_sha1=None):
+        os.makedirs(directorio, exist_ok=True)
+        for nombre, array in self.arrays.items():
+            np.save(os.path.join(directorio, nombre + '.npy'), array)
+        with open(os.path.join(directorio, 'bosque.json'), 'w', encoding='utf-8') as f:
+            json.dump({'profundidad': self.profundidad, 'n_variables': self.n_variables,
+                       'arrays': list(self.arrays), 'origen_sha1': origen_sha1}, f)
+
+    # Con ruta_pkl, los lotes de MAX_FILAS filas o más van al estimador de
+    # sklearn de ese .pkl
+    @classmethod
+    def cargar(cls, directorio, mmap=True, ruta_pkl=None):
+        with open(os.path.join(directorio, 'bosque.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {nombre: np.load(os.path.join(directorio, nombre + '.npy'), mmap_mode='r' if mmap else None)
+                  for nombre in meta['arrays']}
+        bosque = cls(arrays, meta['profundidad'], meta['n_variables'], ruta_pkl)
+        bosque.origen_sha1 = meta.get('origen_sha1')
+        return bosque
+
+    # Estimador de sklearn para los lotes grandes; None si no hay .pkl
+    def estimador_sklearn(self):
+        if self.respaldo is None and self.ruta_pkl is not None:
+            import joblib
+            self.respaldo = joblib.load(self.ruta_pkl)
+        return self.respaldo
+
+    # Imputación y escalado como SimpleImputer y StandardScaler (float64),
+    # y paso a float32 como hace el bosque antes de recorrer los árboles
+    def preparar(self, X):
+        X = np.array(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_variables:
+            raise ValueError('se esperaban {} variables y hay {}'.format(self.n_variables, X.shape[1]))
+        if self.relleno is not None:
+            faltan = np.isnan(X)
+            if faltan.any():
+                X[faltan] = np.take(self.relleno, np.nonzero(faltan)[1])
+        elif np.isnan(X).any():
+            raise ValueError('la entrada tiene NaN y el modelo no imputa valores')
+        if self.media is not None:
+            X -= self.media
+            X /= self.escala
+        return X.astype(np.float32)
+
+    # Hoja a la que llega cada fila en cada árbol: matriz (árboles, filas)
+    def hojas(self, X):
+        X = self.preparar(X)
+        n = X.shape[0]
+        # X traspuesta y aplanada: el valor de la variable v de la fila i está
+        # en v * n + i. np.take sobre arrays 1D es bastante más rápido que la
+        # indexación con dos ejes
+        plano = np.ascontiguousarray(X.T).ravel()
+        entero = np.int32 if plano.size < 2 ** 31 and 2 * self.n_nodos < 2 ** 31 else np.int64
+        # Pares (árbol, fila) aplanados: nodos[t * n + i]
+        nodos = np.repeat(self.raices.astype(entero), n)
+        activos = np.flatnonzero(~np.take(self.hoja, nodos)).astype(entero)
+        actuales = np.take(nodos, activos)
+        filas = activos % entero(n)
+        while activos.size:
+            derecha = (np.take(plano, np.take(self.variable, actuales) * entero(n) + filas)
+                       > np.take(self.umbral, actuales))
+            actuales = np.take(self.hijos, 2 * actuales + derecha)
+            sigue = ~np.take(self.hoja, actuales)
+            if sigue.all():
+                continue
+            nodos[activos[~sigue]] = actuales[~sigue]
+            activos, actuales, filas = activos[sigue], actuales[sigue], filas[sigue]
+        return nodos.reshape(self.n_arboles, n)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[0] >= MAX_FILAS and self.estimador_sklearn() is not None:
+            return self.respaldo.predict_proba(X)
+        # Por bloques de filas, para que los arrays intermedios quepan en caché
+        salida = np.empty((X.shape[0], self.valor.shape[1]))
+        for i in range(0, X.shape[0], BLOQUE):
+            nodos = self.hojas(X[i:i + BLOQUE])
+            suma = salida[i:i + BLOQUE]
+            suma[:] = 0.0
+            # Árbol a árbol y en orden, igual que sklearn, para dar los mismos
+            # decimales
+            for t in range(self.n_arboles):
+                suma += np.take(self.valor, nodos[t], axis=0)
+            suma /= self.n_arboles
+        return salida
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 2 and X.shape[0] >= MAX_FILAS and self.estimador_sklearn() is not None:
+            return self.respaldo.predict(X)
+        return self.clases[self.predict_proba(X).argmax(axis=1)]
+
+def convertir(ruta_pkl, estimador=None):
+    import joblib
+    estimador = estimador if estimador is not None else joblib.load(ruta_pkl)
+    bosque = BosquePlano.desde_sklearn(estimador)
+    bosque.guardar(ruta_bosque(ruta_pkl), artefactos.sha1_fichero(ruta_pkl))
+    return bosque
+
+def medir(funcion, X, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(X)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+if __name__ == '__main__':
+    import modelos
+    parser = argparse.ArgumentParser(description='Convierte un RandomForest a arrays planos y lo compara con sklearn')
+    parser.add_argument('accion', choices=['convertir', 'comprobar'])
+    parser.add_argument('modelo', help='nombre de modelos.py o ruta a un .pkl')
+    parser.add_argument('--filas', type=int, default=10000, help='filas aleatorias para comprobar')
+    args = parser.parse_args()
+
+    if args.modelo in modelos.MODELOS:
+        sk = modelos.Modelo(args.modelo).modelo
+        ruta = os.path.join(modelos.DIRECTORIO, modelos.MODELOS[args.modelo]['ruta'])
+    else:
+        import joblib
+        ruta = args.modelo
+        sk = joblib.load(ruta)
+
+    if args.accion == 'convertir':
+        bosque = convertir(ruta, sk)
+        print('{} árboles, {} nodos, profundidad {} -> {}'.format(
+            bosque.n_arboles, bosque.n_nodos, bosque.profundidad, ruta_bosque(ruta)))
+    else:
+        bosque = BosquePlano.cargar(ruta_bosque(ruta))
+        rng = np.random.default_rng(0)
+        X = rng.normal(3.5, 2.0, size=(args.filas, bosque.n_variables))
+        X[rng.random(X.shape) < 0.01] = np.nan if bosque.relleno is not None else 0.0
+        # Sin respaldo: se compara y se mide siempre el recorrido plano
+        iguales = (np.array_equal(sk.predict(X), bosque.predict(X))
+                   and np.array_equal(sk.predict_proba(X), bosque.predict_proba(X)))
+        print('predict y predict_proba idénticos en {} filas: {}'.format(args.filas, 'sí' if iguales else 'NO'))
+        for filas, repeticiones in ((1, 200), (100, 50), (MAX_FILAS, 10), (args.filas, 3)):
+            a = medir(sk.predict, X[:filas], repeticiones)
+            b = medir(bosque.predict, X[:filas], repeticiones)
+            print('{:>6} filas   sklearn {:>9.3f} ms   plano {:>9.3f} ms   x{:.1f}'.format(filas, a, b, a / b))
+        print('con el .pkl, a partir de {} filas se usa sklearn'.format(MAX_FILAS))
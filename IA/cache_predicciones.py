@@ -0,0 +1,177 @@
+# Caché LRU de predicciones delante de un Modelo de modelos.py, en dos
+# niveles:
+#   1. la fila tal como llega: si es idéntica a una ya vista no se ejecuta
+#      nada del pipeline
+#   2. la fila ya preprocesada (la salida de todos los pasos del pipeline
+#      menos el último): en el Titanic dos pasajeros con edades 20 y 25 caen
+#      en el mismo tramo de categorize_age y comparten entrada, y en
+#      préstamos las categorías de purpose son pocas. Si ya se ha visto, el
+#      último paso (el bosque, la regresión...) no se ejecuta
+# La fila preprocesada se canoniza a float64 (el ColumnTransformer del
+# Titanic devuelve objetos), con -0.0 como 0.0 y un único NaN, y su clave
+# son sus bytes. Cada nivel guarda como mucho `max_entradas` claves y al
+# pasarse expulsa la usada hace más tiempo. Con un lote, solo las filas que
+# fallan se preprocesan y van al modelo, en un único predict.
+#
+#   python3 cache_predicciones.py titanic prestamos    aciertos y ms por fila
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import modelos
+
+# Matriz en float64 con -0.0 como 0.0 y un único NaN, para usar sus bytes
+# como clave
+def canonizar(X):
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    X = np.array(X, dtype=np.float64)
+    X += 0.0
+    X[np.isnan(X)] = np.nan
+    return X
+
+# Diccionario LRU con tope de entradas
+class LRU:
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.expulsiones = 0
+
+    def get(self, clave):
+        valor = self.entradas.get(clave)
+        if valor is not None:
+            self.entradas.move_to_end(clave)
+        return valor
+
+    def put(self, clave, valor):
+        self.entradas[clave] = valor
+        self.entradas.move_to_end(clave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+            self.expulsiones += 1
+
+    def __len__(self):
+        return len(self.entradas)
+
+class CachePredicciones:
+    def __init__(self, modelo, max_entradas=10000):
+        self.modelo = modelo
+        self.max_entradas = max_entradas
+        self.crudas = LRU(max_entradas)
+        self.preprocesadas = LRU(max_entradas)
+        self.cerrojo = threading.Lock()
+        self.aciertos_crudas = 0
+        self.aciertos_preprocesadas = 0
+        self.fallos = 0
+        estimador = modelo.modelo
+        # Un Pipeline se parte en preprocesado y último paso; cualquier otro
+        # modelo solo usa el primer nivel
+        if hasattr(estimador, 'steps') and len(estimador.steps) > 1:
+            self.preproceso, self.final = estimador[:-1], estimador[-1]
+        else:
+            self.preproceso, self.final = None, estimador
+
+    # Claves del primer nivel: la fila de entrada con NaN como None, para que
+    # dos vacíos sean la misma clave
+    def claves_crudas(self, X):
+        if hasattr(X, 'itertuples'):
+            return [tuple(None if v != v else v for v in fila) for fila in X.itertuples(index=False, name=None)]
+        return [canonizar(fila).tobytes() for fila in X]
+
+    # Predicción de las filas de X (ya comprobadas con el esquema)
+    def predecir(self, X):
+        crudas = self.claves_crudas(X)
+        salida = [None] * len(crudas)
+        faltan = []
+        with self.cerrojo:
+            for i, clave in enumerate(crudas):
+                salida[i] = self.crudas.get(clave)
+                if salida[i] is None:
+                    faltan.append(i)
+            self.aciertos_crudas += len(crudas) - len(faltan)
+        if not faltan:
+            return np.array(salida)
+
+        resto = X.iloc[faltan] if hasattr(X, 'iloc') else X[faltan]
+        with self.modelo.sin_comprobaciones():
+            Xc = canonizar(self.preproceso.transform(resto) if self.preproceso is not None else resto)
+        claves = [fila.tobytes() for fila in Xc]
+        sin_prediccion = []
+        with self.cerrojo:
+            for j, (i, clave) in enumerate(zip(faltan, claves)):
+                salida[i] = self.preprocesadas.get(clave)
+                if salida[i] is None:
+                    sin_prediccion.append(j)
+            self.aciertos_preprocesadas += len(faltan) - len(sin_prediccion)
+            self.fallos += len(sin_prediccion)
+        if sin_prediccion:
+            with self.modelo.sin_comprobaciones():
+                nuevas = self.final.predict(Xc[sin_prediccion])
+            with self.cerrojo:
+                for j, prediccion in zip(sin_prediccion, nuevas):
+                    salida[faltan[j]] = prediccion
+                    self.preprocesadas.put(claves[j], prediccion)
+        with self.cerrojo:
+            for i in faltan:
+                self.crudas.put(crudas[i], salida[i])
+        return np.array(salida)
+
+    # Mete en la caché las predicciones de un lote de filas conocidas de
+    # antemano (p. ej. las más frecuentes del histórico)
+    def precalcular(self, X):
+        self.modelo.comprobar(X)
+        self.predecir(X)
+
+    def estadisticas(self):
+        consultas = self.aciertos_crudas + self.aciertos_preprocesadas + self.fallos
+        aciertos = self.aciertos_crudas + self.aciertos_preprocesadas
+        return {'consultas': consultas, 'aciertos_fila': self.aciertos_crudas,
+                'aciertos_preprocesada': self.aciertos_preprocesadas, 'fallos': self.fallos,
+                'tasa_aciertos': round(aciertos / consultas, 4) if consultas else 0,
+                'entradas': [len(self.crudas), len(self.preprocesadas)], 'max_entradas': self.max_entradas,
+                'expulsiones': self.crudas.expulsiones + self.preprocesadas.expulsiones}
+
+# Consultas de una fila sacadas con repetición de las `distintas` primeras
+# filas de `df`, una a una: con y sin caché, ms por consulta
+def medir(modelo, df, consultas, max_entradas, distintas, semilla=0):
+    import pandas as pd
+    X = modelo.matriz_tabla(df)
+    indices = np.random.default_rng(semilla).integers(0, min(len(df), distintas), consultas)
+    filas = [X.iloc[[i]] if isinstance(X, pd.DataFrame) else X[[i]] for i in indices]
+    cache = CachePredicciones(modelo, max_entradas)
+    inicio = time.perf_counter()
+    sin = [modelo.predecir_matriz(f)[0] for f in filas]
+    ms_sin = (time.perf_counter() - inicio) / consultas * 1000
+    modelo.cache = cache
+    inicio = time.perf_counter()
+    con = [modelo.predecir_matriz(f)[0] for f in filas]
+    ms_con = (time.perf_counter() - inicio) / consultas * 1000
+    modelo.cache = None
+    return ms_sin, ms_con, sin == con, cache.estadisticas()
+
+if __name__ == '__main__':
+    import os
+    import pandas as pd
+    DATOS = {
+        'titanic': 'Aprendizaje automatico/titanic.csv',
+        'prestamos': 'Clasificacion/datos/loan_data.csv',
+    }
+    parser = argparse.ArgumentParser(description='Mide la caché de predicciones con consultas repetidas')
+    parser.add_argument('modelos', nargs='*', help='por defecto {}'.format(', '.join(DATOS)))
+    parser.add_argument('--consultas', type=int, default=3000)
+    parser.add_argument('--max-entradas', type=int, default=1000)
+    parser.add_argument('--distintas', type=int, default=200,
+                        help='las consultas se repiten entre estas primeras filas del fichero')
+    args = parser.parse_args()
+
+    for nombre in args.modelos or list(DATOS):
+        modelo = modelos.Modelo(nombre)
+        df = pd.read_csv(os.path.join(modelos.DIRECTORIO, DATOS[nombre]))
+        ms_sin, ms_con, iguales, estadisticas = medir(modelo, df, args.consultas, args.max_entradas,
+                                                       args.distintas)
+        print('{:<10} sin caché {:.3f} ms/consulta   con caché {:.3f} ms/consulta   x{:.1f}   iguales: {}'.format(
+            nombre, ms_sin, ms_con, ms_sin / ms_con, 'sí' if iguales else 'NO'))
+        print('{:<10} {}'.format('', estadisticas))
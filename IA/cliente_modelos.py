@@ -0,0 +1,100 @@
+# Cliente ligero de servidor_modelos.py: sustituye a predecir_flor.py,
+# predecir_co2.py, predecir_diabetes.py y prediccion_prestamos.py sin cargar
+# sklearn ni el modelo (solo usa la biblioteca estándar).
+#   python3 cliente_modelos.py flor                  pide los valores por teclado
+#   python3 cliente_modelos.py flor 5.1 3.5 1.4 0.2  una fila (orden de columnas)
+#   python3 cliente_modelos.py co2 - < filas.csv     una fila por línea (lote)
+#   python3 cliente_modelos.py --lista               modelos y columnas
+import argparse
+import http.client
+import json
+import socket
+import sys
+
+class ConexionUnix(http.client.HTTPConnection):
+    def __init__(self, ruta, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.ruta = ruta
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.ruta)
+
+class Cliente:
+    def __init__(self, host='127.0.0.1', puerto=8765, ruta_socket=None):
+        if ruta_socket:
+            self.conexion = ConexionUnix(ruta_socket)
+        else:
+            self.conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+
+    def pedir(self, metodo, ruta, datos=None):
+        cuerpo = None if datos is None else json.dumps(datos).encode('utf-8')
+        cabeceras = {'Content-Type': 'application/json'} if cuerpo else {}
+        self.conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+        respuesta = self.conexion.getresponse()
+        resultado = json.loads(respuesta.read())
+        if respuesta.status != 200:
+            raise ValueError(resultado.get('error', 'error {}'.format(respuesta.status)))
+        return resultado
+
+    def modelos(self):
+        return self.pedir('GET', '/modelos')
+
+    def predecir(self, modelo, filas):
+        return self.pedir('POST', '/predecir/{}'.format(modelo), {'filas': filas})
+
+    def cerrar(self):
+        self.conexion.close()
+
+# Pide por teclado las columnas que tienen pregunta, como los scripts originales
+def pedir_fila(descripcion):
+    print("Introduce los siguientes valores para realizar la predicción:")
+    texto = set(descripcion.get('texto', []))
+    fila = {}
+    for columna, pregunta in descripcion['preguntas'].items():
+        valor = input('{}: '.format(pregunta)).strip()
+        if not valor:
+            raise ValueError("El campo '{}' no puede estar vacío.".format(columna))
+        fila[columna] = valor if columna in texto else float(valor)
+    return fila
+
+def mostrar(resultado):
+    etiquetas = resultado.get('etiquetas') or [None] * len(resultado['predicciones'])
+    for prediccion, etiqueta in zip(resultado['predicciones'], etiquetas):
+        print('{}\t{}'.format(prediccion, etiqueta) if etiqueta is not None else prediccion)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pide predicciones al servidor de modelos')
+    parser.add_argument('modelo', nargs='?', help='flor, co2, diabetes, prestamos...')
+    parser.add_argument('valores', nargs='*',
+                        help="valores de una fila en el orden de las columnas, o '-' para leer filas de stdin")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--socket', default=None, help='socket Unix del servidor')
+    parser.add_argument('--lista', action='store_true', help='muestra los modelos disponibles')
+    args = parser.parse_args()
+
+    cliente = Cliente(args.host, args.puerto, args.socket)
+    try:
+        if args.lista or not args.modelo:
+            for nombre, descripcion in cliente.modelos().items():
+                print('{:<10} {}'.format(nombre, ', '.join(descripcion['columnas'])))
+        elif args.valores == ['-']:
+            filas = [linea.strip().split(',') for linea in sys.stdin if linea.strip()]
+            mostrar(cliente.predecir(args.modelo, filas))
+        elif args.valores:
+            mostrar(cliente.predecir(args.modelo, [args.valores]))
+        else:
+            descripcion = cliente.modelos()[args.modelo]
+            resultado = cliente.predecir(args.modelo, [pedir_fila(descripcion)])
+            etiqueta = (resultado.get('etiquetas') or [None])[0]
+            print('La predicción es: {}'.format(etiqueta if etiqueta is not None else resultado['predicciones'][0]))
+    except (ValueError, KeyError) as e:
+        print('Error: {}'.format(e), file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        print('Error: no se puede conectar con el servidor de modelos ({})'.format(e), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        cliente.cerrar()
@@ -0,0 +1,175 @@
+# Exporta un pipeline lineal ya entrenado (mejor_modelo_co2.pkl,
+# mejor_modelo_ridge.pkl...) a un módulo de Python que solo necesita NumPy,
+# para usarlo donde no se puede importar sklearn. Pasos admitidos:
+#   SimpleImputer           al principio, rellena los NaN
+#   StandardScaler          afín
+#   PolynomialFeatures      se guarda la matriz de exponentes (powers_)
+#   LinearRegression, Ridge, Lasso, ElasticNet   afín, al final
+# Los pasos afines seguidos se funden en uno solo (X @ matriz + desplazamiento),
+# así que sin PolynomialFeatures la predicción de un lote es una única
+# multiplicación de matrices. Los coeficientes se escriben con repr, que
+# conserva todos los decimales de cada float.
+#
+#   python3 exportar_numpy.py co2 diabetes     -> mejor_modelo_co2_numpy.py ...
+# y después modelos.Modelo(nombre, plano=True) o predecir.py usan el módulo.
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+import artefactos
+
+LINEALES = ['LinearRegression', 'Ridge', 'Lasso', 'ElasticNet']
+
+# Módulo exportado junto al .pkl: modelo.pkl -> modelo_numpy.py
+def ruta_modulo(ruta_pkl):
+    return os.path.splitext(ruta_pkl)[0] + '_numpy.py'
+
+def cargar(ruta):
+    nombre = 'exportado_' + os.path.splitext(os.path.basename(ruta))[0]
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+# Compone dos transformaciones afines X @ m + c
+def componer(afin, matriz, desplazamiento):
+    if afin is None:
+        return matriz, desplazamiento
+    return afin[0] @ matriz, afin[1] @ matriz + desplazamiento
+
+# Recorre el pipeline y devuelve las etapas que escribe el módulo:
+# ('relleno', valores), ('afin', matriz, desplazamiento), ('potencias', exponentes)
+def etapas(estimador):
+    pasos = list(estimador.named_steps.values()) if hasattr(estimador, 'named_steps') else [estimador]
+    salida = []
+    afin = None
+    for i, paso in enumerate(pasos):
+        tipo = type(paso).__name__
+        if tipo == 'SimpleImputer':
+            if salida or afin is not None:
+                raise ValueError('SimpleImputer solo se admite al principio del pipeline')
+            if not (isinstance(paso.missing_values, float) and np.isnan(paso.missing_values)):
+                raise ValueError('solo se admite SimpleImputer con missing_values=nan')
+            if np.isnan(paso.statistics_).any() or paso.add_indicator:
+                raise ValueError('SimpleImputer con columnas vacías o indicador no admitido')
+            salida.append(('relleno', np.asarray(paso.statistics_, dtype=np.float64)))
+        elif tipo == 'StandardScaler':
+            n = paso.n_features_in_
+            escala = paso.scale_ if paso.with_std else np.ones(n)
+            media = paso.mean_ if paso.with_mean else np.zeros(n)
+            afin = componer(afin, np.diag(1.0 / escala), -media / escala)
+        elif tipo == 'PolynomialFeatures':
+            if afin is not None:
+                salida.append(('afin',) + afin)
+                afin = None
+            salida.append(('potencias', np.asarray(paso.powers_, dtype=np.int64)))
+        elif tipo in LINEALES:
+            if i != len(pasos) - 1:
+                raise ValueError('{} tiene que ser el último paso'.format(tipo))
+            coeficientes = np.asarray(paso.coef_, dtype=np.float64)
+            afin = componer(afin, coeficientes.T, np.asarray(paso.intercept_, dtype=np.float64))
+        else:
+            raise ValueError('paso no admitido: {}'.format(tipo))
+    if type(pasos[-1]).__name__ not in LINEALES:
+        raise ValueError('el último paso tiene que ser uno de {}'.format(', '.join(LINEALES)))
+    salida.append(('afin',) + afin)
+    return salida
+
+def literal(array):
+    return 'np.array({!r}, dtype=np.{})'.format(array.tolist(), array.dtype)
+
+# Código fuente del módulo exportado. ORIGEN_SHA1 es el sha1 del .pkl del
+# que sale, para saber si se ha vuelto a entrenar después de exportarlo
+def generar(estimador, origen, columnas=None, sha1=None):
+    lineas = [
+        '# Generado por exportar_numpy.py a partir de {}; no editar a mano.'.format(origen),
+        '# Solo necesita NumPy: predecir(X) recibe una fila o una matriz con las',
+        '# columnas en el orden de COLUMNAS.',
+        'import numpy as np',
+        '',
+        'ORIGEN_SHA1 = {!r}'.format(sha1),
+        'COLUMNAS = {!r}'.format(list(columnas) if columnas is not None else None),
+    ]
+    cuerpo = [
+        'def predecir(X):',
+        '    X = np.array(X, dtype=np.float64)',
+        '    if X.ndim == 1:',
+        '        X = X.reshape(1, -1)',
+    ]
+    afines = 0
+    for etapa in etapas(estimador):
+        if etapa[0] == 'relleno':
+            lineas.append('RELLENO = {}'.format(literal(etapa[1])))
+            cuerpo += [
+                '    faltan = np.isnan(X)',
+                '    if faltan.any():',
+                '        X[faltan] = np.take(RELLENO, np.nonzero(faltan)[1])',
+            ]
+        elif etapa[0] == 'potencias':
+            lineas.append('POTENCIAS = {}'.format(literal(etapa[1])))
+            cuerpo.append('    X = np.prod(X[:, None, :] ** POTENCIAS, axis=2)')
+        else:
+            afines += 1
+            lineas.append('MATRIZ_{} = {}'.format(afines, literal(etapa[1])))
+            lineas.append('DESPLAZAMIENTO_{} = {}'.format(afines, literal(np.asarray(etapa[2]))))
+            cuerpo.append('    X = X @ MATRIZ_{0} + DESPLAZAMIENTO_{0}'.format(afines))
+    cuerpo += [
+        '    return X',
+        '',
+        '# Mismo nombre que en sklearn, para usarlo en su lugar',
+        'predict = predecir',
+    ]
+    return '\n'.join(lineas + ['', ''] + cuerpo) + '\n'
+
+def exportar(estimador, destino, origen, columnas=None, sha1=None):
+    with open(destino, 'w', encoding='utf-8') as f:
+        f.write(generar(estimador, origen, columnas, sha1))
+    return destino
+
+# Segundos de arrancar Python y ejecutar `codigo`
+def arranque(codigo):
+    import subprocess
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, '-W', 'ignore', '-c', codigo], check=True)
+    return time.perf_counter() - inicio
+
+if __name__ == '__main__':
+    import modelos
+    parser = argparse.ArgumentParser(description='Exporta pipelines lineales a módulos que solo usan NumPy')
+    parser.add_argument('modelos', nargs='*', help='por defecto co2 y diabetes')
+    parser.add_argument('--filas', type=int, default=100000, help='filas aleatorias para comprobar')
+    args = parser.parse_args()
+
+    for nombre in args.modelos or ['co2', 'diabetes']:
+        info = modelos.MODELOS[nombre]
+        ruta = os.path.join(modelos.DIRECTORIO, info['ruta'])
+        sk = modelos.Modelo(nombre).modelo
+        destino = exportar(sk, ruta_modulo(ruta), info['ruta'], info['columnas'], artefactos.sha1_fichero(ruta))
+        exportado = cargar(destino)
+
+        rng = np.random.default_rng(0)
+        ejemplo = np.array(info['ejemplo'], dtype=np.float64)
+        X = ejemplo * rng.uniform(0.5, 1.5, size=(args.filas, len(ejemplo)))
+        diferencia = np.abs(sk.predict(X) - exportado.predecir(X)).max()
+        inicio = time.perf_counter()
+        sk.predict(X)
+        ms_sk = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        exportado.predecir(X)
+        ms_np = (time.perf_counter() - inicio) * 1000
+
+        fila = repr(info['ejemplo'])
+        carpeta = os.path.dirname(destino)
+        modulo = os.path.splitext(os.path.basename(destino))[0]
+        s_sk = arranque('import joblib; joblib.load({!r}).predict([{}])'.format(ruta, fila))
+        s_np = arranque('import sys; sys.path.insert(0, {!r}); import {}; {}.predecir({})'.format(
+            carpeta, modulo, modulo, fila))
+        print('{:<10} -> {}'.format(nombre, os.path.relpath(destino, modelos.DIRECTORIO)))
+        print('{:<10} diferencia máxima con sklearn {:.2e}   {} filas: sklearn {:.1f} ms, numpy {:.1f} ms'.format(
+            '', diferencia, args.filas, ms_sk, ms_np))
+        print('{:<10} arrancar y predecir una fila: sklearn {:.0f} ms, numpy {:.0f} ms'.format(
+            '', s_sk * 1000, s_np * 1000))
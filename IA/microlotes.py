@@ -0,0 +1,103 @@
+# Agrupa en microlotes las predicciones de una fila que llegan a la vez de
+# varios clientes. Con una fila, casi todo el tiempo de predict se va en la
+# validación de sklearn y en recorrer el pipeline, no en el cálculo, así que
+# un único predict con 64 filas cuesta poco más que uno con una.
+#   - cada petición deja su fila en una cola y espera su resultado
+#   - un hilo saca filas hasta juntar `max_lote` o hasta que la primera lleva
+#     `max_espera` segundos esperando, hace un predict y reparte la salida
+#   - si el predict del lote falla (p. ej. una categoría desconocida en una
+#     fila), se repite fila a fila para que el error solo llegue a esa fila
+#
+#   python3 microlotes.py --hilos 32     compara filas/s con y sin microlotes
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import modelos
+
+class Agrupador:
+    def __init__(self, modelo, max_lote=64, max_espera=0.002):
+        self.modelo = modelo
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.cola = queue.SimpleQueue()
+        self.lotes = 0
+        self.filas = 0
+        self.hilo = threading.Thread(target=self.bucle, daemon=True)
+        self.hilo.start()
+
+    # Devuelve un Future con la predicción de la fila (como tipo de Python);
+    # los errores de formato de la fila saltan aquí mismo
+    def enviar(self, fila):
+        futuro = Future()
+        self.cola.put((self.modelo.valores(fila), futuro))
+        return futuro
+
+    def predecir(self, fila, timeout=None):
+        return self.enviar(fila).result(timeout)
+
+    def recoger(self):
+        lote = [self.cola.get()]
+        limite = time.perf_counter() + self.max_espera
+        while len(lote) < self.max_lote:
+            restante = limite - time.perf_counter()
+            try:
+                lote.append(self.cola.get_nowait() if restante <= 0 else self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def bucle(self):
+        while True:
+            lote = self.recoger()
+            self.lotes += 1
+            self.filas += len(lote)
+            try:
+                salida = self.modelo.predecir_matriz(self.modelo.matriz_valores([v for v, _ in lote])).tolist()
+            except Exception:
+                salida = None
+            if salida is not None:
+                for (_, futuro), prediccion in zip(lote, salida):
+                    futuro.set_result(prediccion)
+                continue
+            for valores, futuro in lote:
+                try:
+                    futuro.set_result(self.modelo.predecir_matriz(self.modelo.matriz_valores([valores])).tolist()[0])
+                except Exception as e:
+                    futuro.set_exception(e)
+
+    def estadisticas(self):
+        return {'lotes': self.lotes, 'filas': self.filas,
+                'filas_por_lote': round(self.filas / self.lotes, 2) if self.lotes else 0}
+
+# Filas/s con `hilos` clientes concurrentes pidiendo una fila cada vez
+def medir(predecir, fila, hilos, peticiones):
+    def cliente():
+        for _ in range(peticiones):
+            predecir(fila)
+    trabajadores = [threading.Thread(target=cliente) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    return hilos * peticiones / (time.perf_counter() - inicio)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compara predicciones concurrentes con y sin microlotes')
+    parser.add_argument('--modelos', default='flor,prestamos')
+    parser.add_argument('--hilos', type=int, default=32, help='clientes concurrentes')
+    parser.add_argument('--peticiones', type=int, default=100, help='predicciones por cliente')
+    parser.add_argument('--max-lote', type=int, default=64)
+    parser.add_argument('--max-espera-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    for nombre, modelo in modelos.cargar_modelos(args.modelos.split(',')).items():
+        fila = modelo.info['ejemplo']
+        sin = medir(lambda f: modelo.predecir([f]), fila, args.hilos, args.peticiones)
+        agrupador = Agrupador(modelo, args.max_lote, args.max_espera_ms / 1000)
+        con = medir(agrupador.predecir, fila, args.hilos, args.peticiones)
+        print('{:<10} sin microlotes {:>9.0f} filas/s   con microlotes {:>9.0f} filas/s   x{:.1f}   {}'.format(
+            nombre, sin, con, con / sin, agrupador.estadisticas()))
@@ -0,0 +1,307 @@
+# Registro de los modelos guardados con joblib que se sirven desde
+# servidor_modelos.py: fichero, columnas de entrada en el orden en que se
+# entrenaron, preguntas para pedirlas por teclado y cómo mostrar la salida.
+# joblib (y con él sklearn) y pandas se importan solo cuando hacen falta: un
+# bosque de bosque_plano.py o un módulo de exportar_numpy.py con entrada
+# numérica se usan solo con NumPy, que es lo que permite a predecir.py
+# arrancar rápido.
+import contextlib
+import importlib.util
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import artefactos
+import bosque_plano
+import exportar_numpy
+import validacion
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Los modelos se entrenaron con DataFrame; con arrays sklearn avisaría en
+# cada predict de que faltan los nombres de columna
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+COLUMNAS_IRIS = ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)']
+
+MODELOS = {
+    'flor': {
+        'ruta': 'Examen_guillermo_fora/modelo_ej1.pkl',
+        'columnas': COLUMNAS_IRIS,
+        'preguntas': {
+            'sepal length (cm)': 'Escribe la largura del sépalo',
+            'sepal width (cm)': 'Escribe la anchura del sépalo',
+            'petal length (cm)': 'Escribe la largura del pétalo',
+            'petal width (cm)': 'Escribe la anchura del pétalo',
+        },
+        'etiquetas': ['setosa', 'versicolor', 'virginica'],
+        'ejemplo': [5.1, 3.5, 1.4, 0.2],
+        # Las cuatro medidas tienen que ser positivas (predecir_flor.py solo
+        # comprobaba las del pétalo); el pipeline imputa los vacíos
+        'esquema': {columna: {'min': 0, 'min_abierto': True, 'nulos': True} for columna in COLUMNAS_IRIS},
+    },
+    'co2': {
+        'ruta': 'Regresion/mejor_modelo_co2.pkl',
+        'columnas': ['Volume', 'Weight'],
+        'preguntas': {
+            'Volume': 'Ingrese el valor de Volume',
+            'Weight': 'Ingrese el valor de Weight',
+        },
+        'ejemplo': [1600, 1300],
+        'esquema': {
+            'Volume': {'min': 0, 'min_abierto': True},
+            'Weight': {'min': 0, 'min_abierto': True},
+        },
+    },
+    # El Ridge se entrenó con las 10 variables del dataset diabetes de
+    # sklearn (predecir_diabetes.py solo pedía 9 y el predict fallaba)
+    'diabetes': {
+        'ruta': 'Regresion/mejor_modelo_ridge.pkl',
+        'columnas': ['age', 'sex', 'bmi', 'bp', 's1', 's2', 's3', 's4', 's5', 's6'],
+        'preguntas': {
+            'age': 'Edad (years)',
+            'sex': 'Sexo (0=Femenino, 1=Masculino)',
+            'bmi': 'Índice de masa corporal (BMI)',
+            'bp': 'Presión arterial promedio (BP)',
+            's1': 'Suma de las medidas del tricep (S1)',
+            's2': 'Nivel de insulina (S2)',
+            's3': 'Nivel de glucosa (S3)',
+            's4': 'Medicamento (S4)',
+            's5': 'Familiares con diabetes (S5)',
+            's6': 'Nivel de azúcar en sangre (S6)',
+        },
+        'ejemplo': [0.038, 0.051, 0.062, 0.022, -0.044, -0.035, -0.043, -0.003, 0.020, -0.018],
+        # El dataset de sklearn viene centrado y escalado (todas las columnas
+        # quedan en torno a ±0,2): una edad de 50 o un sexo de 1 son errores
+        'esquema': {columna: {'min': -1, 'max': 1}
+                    for columna in ['age', 'sex', 'bmi', 'bp', 's1', 's2', 's3', 's4', 's5', 's6']},
+    },
+    # El pipeline de préstamos necesita un DataFrame con los nombres de
+    # columna (ColumnTransformer) y 'purpose' es texto
+    'prestamos': {
+        'ruta': 'Clasificacion/mejor_modelo_prestamos.pkl',
+        'columnas': ['credit.policy', 'purpose', 'int.rate', 'installment', 'fico', 'revol.bal',
+                     'revol.util', 'inq.last.6mths', 'pub.rec'],
+        'texto': ['purpose'],
+        'dataframe': True,
+        'por_defecto': {'credit.policy': 1},
+        'preguntas': {
+            'int.rate': 'Tasa de interés (int_rate)',
+            'installment': 'Cuota del préstamo (installment)',
+            'fico': 'Puntaje FICO (fico)',
+            'revol.bal': 'Balance de crédito Revolving (revol_bal)',
+            'revol.util': 'Utilización del crédito Revolving (revol_util)',
+            'inq.last.6mths': 'Consultas de crédito en los últimos 6 meses (inq_last_6mths)',
+            'pub.rec': 'Registros públicos (pub_rec)',
+            'purpose': 'Propósito del préstamo (purpose)',
+        },
+        'etiquetas': ['El préstamo NO será pagado.', 'El préstamo SERÁ pagado.'],
+        'ejemplo': {'purpose': 'debt_consolidation', 'int.rate': 0.1189, 'installment': 829.1, 'fico': 737,
+                    'revol.bal': 28854, 'revol.util': 52.1, 'inq.last.6mths': 0, 'pub.rec': 0},
+        # Las categorías de purpose son las que vio el OneHotEncoder
+        # (handle_unknown='error'); el pipeline imputa los vacíos
+        'esquema': {
+            'credit.policy': {'categorias': [0, 1], 'nulos': True},
+            'purpose': {'tipo': 'texto', 'nulos': True,
+                        'categorias': ['all_other', 'credit_card', 'debt_consolidation', 'educational',
+                                       'home_improvement', 'major_purchase', 'small_business']},
+            'int.rate': {'min': 0, 'max': 1, 'nulos': True},
+            'installment': {'min': 0, 'nulos': True},
+            'fico': {'min': 300, 'max': 850, 'nulos': True},
+            'revol.bal': {'min': 0, 'nulos': True},
+            'revol.util': {'min': 0, 'nulos': True},
+            'inq.last.6mths': {'tipo': 'int', 'min': 0, 'nulos': True},
+            'pub.rec': {'tipo': 'int', 'min': 0, 'nulos': True},
+        },
+    },
+    # El pipeline del Titanic usa funciones propias (column_family,
+    # categorize_age...) que pickle busca en __main__; una vez cargado,
+    # actualizar_pipeline las cambia por sus versiones vectorizadas
+    'titanic': {
+        'ruta': 'Aprendizaje automatico/Titanic_model.pkl',
+        'funciones': 'Aprendizaje automatico/archivo_titanic.py',
+        'actualizar': 'actualizar_pipeline',
+        'columnas': ['pclass', 'sex', 'age', 'sibsp', 'parch', 'fare', 'embarked'],
+        'texto': ['sex', 'embarked'],
+        'dataframe': True,
+        'preguntas': {
+            'pclass': 'Clase del billete (1, 2 o 3)',
+            'sex': 'Sexo (male o female)',
+            'age': 'Edad',
+            'sibsp': 'Hermanos o pareja a bordo',
+            'parch': 'Padres o hijos a bordo',
+            'fare': 'Precio del billete',
+            'embarked': 'Puerto de embarque (S, C o Q)',
+        },
+        'etiquetas': ['No sobrevive', 'Sobrevive'],
+        'ejemplo': [3, 'male', 22.0, 1, 0, 7.25, 'S'],
+        'esquema': {
+            'pclass': {'categorias': [1, 2, 3]},
+            'sex': {'tipo': 'texto', 'categorias': ['male', 'female']},
+            'age': {'min': 0, 'max': 100, 'nulos': True},
+            'sibsp': {'tipo': 'int', 'min': 0, 'nulos': True},
+            'parch': {'tipo': 'int', 'min': 0, 'nulos': True},
+            'fare': {'min': 0, 'nulos': True},
+            'embarked': {'tipo': 'texto', 'categorias': ['S', 'C', 'Q'], 'nulos': True},
+        },
+    },
+}
+
+# Lo que el cliente necesita saber de cada modelo (sin la ruta)
+def descripcion(nombre):
+    info = MODELOS[nombre]
+    return {clave: info[clave] for clave in ('columnas', 'preguntas', 'etiquetas', 'texto', 'por_defecto', 'ejemplo',
+                                            'esquema')
+            if clave in info}
+
+# Carga el script con las funciones que necesita un pickle y las deja en
+# __main__, que es donde pickle las busca al deserializar. Devuelve el módulo
+def registrar_funciones(ruta):
+    ruta = os.path.join(DIRECTORIO, ruta)
+    nombre = 'funciones_' + os.path.splitext(os.path.basename(ruta))[0]
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    sys.modules[nombre] = modulo
+    principal = sys.modules['__main__']
+    for atributo, valor in vars(modulo).items():
+        if callable(valor) and getattr(valor, '__module__', None) == nombre and not hasattr(principal, atributo):
+            setattr(principal, atributo, valor)
+    return modulo
+
+# Un artefacto guarda el sha1 del .pkl del que sale; si ya no coincide con
+# el del .pkl actual (se ha vuelto a entrenar) se avisa y no se usa
+def vigente(modelo, registrado, ruta_pkl, ruta_artefacto):
+    if registrado == artefactos.sha1_fichero(ruta_pkl):
+        return modelo
+    print('aviso: {} no sale de la versión actual de {}, se carga el .pkl'.format(
+        os.path.relpath(ruta_artefacto, DIRECTORIO), os.path.relpath(ruta_pkl, DIRECTORIO)), file=sys.stderr)
+    return None
+
+class Modelo:
+    # Con mmap se carga el artefacto de artefactos.py si existe, para que
+    # varios procesos compartan los arrays del modelo. Con plano se usa el
+    # bosque convertido con bosque_plano.py o el módulo de exportar_numpy.py
+    # si existen (los dos sin sklearn). En todos los casos solo si salen del
+    # .pkl tal como está ahora.
+    def __init__(self, nombre, info=None, mmap=False, plano=False):
+        self.nombre = nombre
+        self.info = info or MODELOS[nombre]
+        self.columnas = self.info['columnas']
+        self.texto = set(self.info.get('texto', []))
+        self.por_defecto = self.info.get('por_defecto', {})
+        self.etiquetas = self.info.get('etiquetas')
+        # CachePredicciones opcional (cache_predicciones.py)
+        self.cache = None
+        inicio = time.perf_counter()
+        funciones = registrar_funciones(self.info['funciones']) if 'funciones' in self.info else None
+        ruta = os.path.join(DIRECTORIO, self.info['ruta'])
+        artefacto = artefactos.ruta_artefacto(ruta)
+        bosque = bosque_plano.ruta_bosque(ruta)
+        exportado = exportar_numpy.ruta_modulo(ruta)
+        self.modelo = None
+        if plano and os.path.exists(bosque):
+            convertido = bosque_plano.BosquePlano.cargar(bosque, mmap=True, ruta_pkl=ruta)
+            self.modelo = vigente(convertido, convertido.origen_sha1, ruta, bosque)
+        if self.modelo is None and plano and os.path.exists(exportado):
+            modulo = exportar_numpy.cargar(exportado)
+            self.modelo = vigente(modulo, getattr(modulo, 'ORIGEN_SHA1', None), ruta, exportado)
+        if self.modelo is None and mmap and os.path.exists(artefacto):
+            estimador, origen_sha1 = artefactos.cargar(artefacto, mmap=True)
+            self.modelo = vigente(estimador, origen_sha1, ruta, artefacto)
+        if self.modelo is None:
+            import joblib
+            self.modelo = joblib.load(ruta)
+        if 'actualizar' in self.info and hasattr(self.modelo, 'steps'):
+            self.modelo = getattr(funciones, self.info['actualizar'])(self.modelo)
+        self.segundos_carga = time.perf_counter() - inicio
+
+    # Una fila puede ser una lista en el orden de `columnas` o un dict por
+    # nombre de columna; las que falten se toman de `por_defecto`. None
+    # pasa a NaN, el valor vacío que imputan los pipelines (el esquema dice
+    # si la columna lo admite)
+    def valores(self, fila):
+        if isinstance(fila, dict):
+            faltan = [c for c in self.columnas if c not in fila and c not in self.por_defecto]
+            if faltan:
+                raise ValueError("faltan las columnas {}".format(", ".join(faltan)))
+            fila = [fila[c] if c in fila else self.por_defecto[c] for c in self.columnas]
+        elif len(fila) != len(self.columnas):
+            con_defecto = [c for c in self.columnas if c not in self.por_defecto]
+            if len(fila) != len(con_defecto):
+                raise ValueError("se esperaban {} valores ({}) y hay {}".format(
+                    len(self.columnas), ", ".join(self.columnas), len(fila)))
+            fila = dict(zip(con_defecto, fila))
+            fila = [fila[c] if c in fila else self.por_defecto[c] for c in self.columnas]
+        return [float('nan') if v is None else str(v) if c in self.texto else float(v)
+                for c, v in zip(self.columnas, fila)]
+
+    # Matriz de entrada del modelo para una lista de filas
+    def matriz(self, filas):
+        return self.matriz_valores([self.valores(fila) for fila in filas])
+
+    # Igual pero con filas ya pasadas por valores()
+    def matriz_valores(self, valores):
+        if self.info.get('dataframe'):
+            import pandas as pd
+            return pd.DataFrame(valores, columns=self.columnas)
+        return np.array(valores, dtype=float).reshape(len(valores), len(self.columnas))
+
+    # Entrada del modelo a partir de un DataFrame con (al menos) las columnas
+    # del modelo; las que falten se rellenan con `por_defecto`
+    def matriz_tabla(self, df):
+        faltan = [c for c in self.columnas if c not in df.columns and c not in self.por_defecto]
+        if faltan:
+            raise ValueError("faltan las columnas {}".format(", ".join(faltan)))
+        df = df.assign(**{c: v for c, v in self.por_defecto.items() if c not in df.columns})[self.columnas]
+        if self.info.get('dataframe'):
+            return df
+        return df.to_numpy(dtype=float)
+
+    # Máscara de filas del lote que no cumplen el esquema del modelo
+    # (validacion.py) y los primeros errores en texto
+    def filas_invalidas(self, X):
+        esquema = self.info.get('esquema')
+        if not esquema:
+            return np.zeros(len(X), dtype=bool), []
+        return validacion.validar(X, self.columnas, esquema)
+
+    # Comprueba todo el lote con el esquema del modelo y lanza ValueError con
+    # las primeras filas que no lo cumplen
+    def comprobar(self, X):
+        _, errores = self.filas_invalidas(X)
+        if errores:
+            raise ValueError('; '.join(errores))
+
+    # Para llamar al modelo con el lote ya comprobado: sklearn se salta su
+    # propia comprobación de que todos los valores son finitos
+    def sin_comprobaciones(self):
+        if not self.info.get('esquema') or 'sklearn' not in sys.modules:
+            return contextlib.nullcontext()
+        import sklearn
+        return sklearn.config_context(assume_finite=True)
+
+    def predecir_matriz(self, X):
+        self.comprobar(X)
+        if self.cache is not None:
+            return self.cache.predecir(X)
+        with self.sin_comprobaciones():
+            return self.modelo.predict(X)
+
+    # Predicciones como tipos de Python (int para clases, float para regresión)
+    def predecir(self, filas):
+        salida = self.predecir_matriz(self.matriz(filas))
+        return salida.tolist()
+
+    def etiqueta(self, prediccion):
+        if self.etiquetas is None:
+            return None
+        return self.etiquetas[int(prediccion)]
+
+def cargar_modelos(nombres=None, mmap=False, plano=False):
+    return {nombre: Modelo(nombre, mmap=mmap, plano=plano) for nombre in (nombres or MODELOS)}
@@ -0,0 +1,153 @@
+# Punto de entrada ligero para una predicción suelta desde la terminal (lo
+# que hacen predecir_flor.py, archivo_titanic.py o ej1-examen.py). Casi todo
+# el tiempo de esos scripts se va en importar sklearn y pandas, no en
+# predecir, así que aquí:
+#   1. si hay un servidor_modelos.py escuchando en el socket, se le pregunta a
+#      él (modelo ya cargado y caliente; solo se importa la biblioteca
+#      estándar)
+#   2. si no, se carga el modelo en este proceso importando solo lo que hace
+#      falta: con un bosque de bosque_plano.py basta NumPy, y si no joblib
+#      importa únicamente los módulos de sklearn que usa el .pkl
+# Con --arrancar, si no hay servidor se deja uno en segundo plano (se cierra
+# solo tras --inactivo segundos sin uso) para que las siguientes llamadas
+# vayan por el camino 1. Con --tiempos se muestra en qué se va el arranque
+# (como python -X importtime, agrupado por paquete).
+#
+#   python3 predecir.py flor 5.1 3.5 1.4 0.2
+#   python3 predecir.py --arrancar titanic 3 male 22 1 0 7.25 S
+#   python3 predecir.py --tiempos flor 5.1 3.5 1.4 0.2
+import argparse
+import json
+import os
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+SOCKET = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'modelos-{}.sock'.format(os.getuid()))
+
+# POST al servidor por el socket Unix escribiendo la petición HTTP a mano:
+# http.client (el de cliente_modelos.py) importa el paquete email y eso solo
+# ya son ~40 ms de arranque
+def pedir_unix(ruta_socket, ruta, datos):
+    import socket
+    cuerpo = json.dumps(datos).encode('utf-8')
+    cabecera = ('POST {} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                'Content-Length: {}\r\nConnection: close\r\n\r\n').format(ruta, len(cuerpo))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+        conexion.settimeout(30)
+        conexion.connect(ruta_socket)
+        conexion.sendall(cabecera.encode('ascii') + cuerpo)
+        respuesta = b''
+        while True:
+            trozo = conexion.recv(65536)
+            if not trozo:
+                break
+            respuesta += trozo
+    cabeceras, _, cuerpo = respuesta.partition(b'\r\n\r\n')
+    return int(cabeceras.split(None, 2)[1]), json.loads(cuerpo)
+
+# Predicción con el servidor caliente; None si no hay servidor o no tiene el
+# modelo
+def predecir_servidor(nombre, valores, ruta_socket):
+    if not os.path.exists(ruta_socket):
+        return None
+    try:
+        codigo, resultado = pedir_unix(ruta_socket, '/predecir/{}'.format(nombre), {'filas': [valores]})
+    except OSError:
+        return None
+    if codigo == 404 and 'modelo desconocido' in resultado.get('error', ''):
+        return None
+    if codigo != 200:
+        raise ValueError(resultado.get('error', 'error {}'.format(codigo)))
+    return resultado
+
+def predecir_local(nombre, valores, fases=None):
+    inicio = time.perf_counter()
+    import modelos
+    importado = time.perf_counter()
+    modelo = modelos.Modelo(nombre, plano=True)
+    cargado = time.perf_counter()
+    prediccion = modelo.predecir([valores])[0]
+    if fases is not None:
+        fases.update({'importar': importado - inicio, 'cargar': cargado - importado,
+                      'predecir': time.perf_counter() - cargado})
+    return {'predicciones': [prediccion], 'etiquetas': [modelo.etiqueta(prediccion)]}
+
+def arrancar_servidor(ruta_socket, inactivo):
+    import subprocess
+    orden = [sys.executable, os.path.join(DIRECTORIO, 'servidor_modelos.py'), '--socket', ruta_socket,
+             '--plano', '--inactivo', str(inactivo)]
+    subprocess.Popen(orden, cwd=DIRECTORIO, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+
+# Tiempo de import por paquete a partir de la salida de -X importtime. Se
+# suma el tiempo propio de cada módulo (sin sus imports) en su paquete raíz,
+# así numpy cuenta como numpy aunque lo importe modelos
+def tiempos_import(salida):
+    paquetes = {}
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        propio, _, nombre = linea[len('import time:'):].split('|')
+        paquete = nombre.strip().split('.')[0]
+        paquetes[paquete] = paquetes.get(paquete, 0) + int(propio) / 1e6
+    return paquetes
+
+def diagnostico(nombre, valores, ruta_socket):
+    import subprocess
+    orden = [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--local', '--fases', nombre] + valores
+    inicio = time.perf_counter()
+    hecho = subprocess.run(orden, cwd=DIRECTORIO, capture_output=True, text=True)
+    total = time.perf_counter() - inicio
+    if hecho.returncode != 0:
+        print(hecho.stderr.splitlines()[-1] if hecho.stderr else 'Error', file=sys.stderr)
+        sys.exit(1)
+    fases = json.loads(hecho.stdout.splitlines()[-1])
+    paquetes = tiempos_import(hecho.stderr)
+    print('Proceso completo (sin servidor): {:.0f} ms'.format(total * 1000))
+    for fase in ('importar', 'cargar', 'predecir'):
+        print('  {:<10} {:>8.1f} ms'.format(fase, fases[fase] * 1000))
+    print('Imports por paquete:')
+    for paquete, segundos in sorted(paquetes.items(), key=lambda p: -p[1])[:15]:
+        print('  {:<24} {:>8.1f} ms'.format(paquete, segundos * 1000))
+    if os.path.exists(ruta_socket):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--socket', ruta_socket, nombre] + valores,
+                       cwd=DIRECTORIO, capture_output=True)
+        print('Proceso completo con el servidor caliente: {:.0f} ms'.format((time.perf_counter() - inicio) * 1000))
+
+def mostrar(resultado):
+    etiqueta = (resultado.get('etiquetas') or [None])[0]
+    prediccion = resultado['predicciones'][0]
+    print('{}\t{}'.format(prediccion, etiqueta) if etiqueta is not None else prediccion)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Predicción de una fila con el menor arranque posible')
+    parser.add_argument('modelo', help='flor, co2, diabetes, prestamos, titanic')
+    parser.add_argument('valores', nargs='+', help='valores de la fila en el orden de las columnas')
+    parser.add_argument('--socket', default=SOCKET, help='socket Unix del servidor caliente')
+    parser.add_argument('--local', action='store_true', help='no usa el servidor aunque esté arrancado')
+    parser.add_argument('--arrancar', action='store_true',
+                        help='si no hay servidor, deja uno en segundo plano para las siguientes llamadas')
+    parser.add_argument('--inactivo', type=float, default=900,
+                        help='segundos sin uso tras los que se cierra el servidor arrancado')
+    parser.add_argument('--tiempos', action='store_true', help='muestra en qué se va el tiempo de arranque')
+    parser.add_argument('--fases', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tiempos:
+        diagnostico(args.modelo, args.valores, args.socket)
+        sys.exit(0)
+    try:
+        resultado = None if args.local else predecir_servidor(args.modelo, args.valores, args.socket)
+        if resultado is None:
+            if args.arrancar and not args.local:
+                arrancar_servidor(args.socket, args.inactivo)
+            fases = {} if args.fases else None
+            resultado = predecir_local(args.modelo, args.valores, fases)
+        mostrar(resultado)
+        if args.fases:
+            print(json.dumps(fases))
+    except (ValueError, KeyError) as e:
+        print('Error: {}'.format(e), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,232 @@
+# Puntúa un fichero entero (CSV o Parquet) con uno de los modelos de
+# modelos.py sin cargarlo todo en memoria:
+#   - la entrada se lee en trozos de `filas_lote` filas
+#   - los trozos se reparten entre un pool de procesos que cargan el modelo
+#     una vez cada uno; como mucho hay 2 trozos por proceso en vuelo y la
+#     salida se escribe en el orden de la entrada
+#   - la salida (Parquet, Feather o CSV) lleva las columnas que se pidan de
+#     la entrada, la predicción, su etiqueta y, si el modelo tiene
+#     predict_proba, una columna prob_<clase> por clase
+#   - las filas que no cumplen el esquema del modelo no paran el trabajo:
+#     salen con la predicción vacía, se cuentan y, con --rechazos, se
+#     copian tal cual a un CSV aparte
+#
+#   python3 puntuar_lote.py prestamos Clasificacion/datos/loan_data.csv prestamos.parquet \
+#       --conservar credit.policy,purpose -p 4
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import modelos
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATOS = ['parquet', 'feather', 'csv']
+
+# Modelo cargado en cada proceso del pool
+MODELO = None
+
+def iniciar(nombre, mmap=False):
+    global MODELO
+    MODELO = modelos.Modelo(nombre, mmap=mmap)
+
+# Valores de las filas válidas colocados en su posición de un trozo de n
+# filas; las no válidas quedan vacías. El tipo sale del dtype de `valores`,
+# no de lo que quede en el trozo, para que el esquema de la salida no cambie
+# aunque ninguna fila sea válida: los enteros pasan a Int64 (entero con
+# vacíos) y los objetos (las etiquetas) a string
+def completar(valores, validas, n):
+    valores = np.asarray(valores)
+    if validas.all():
+        columna = pd.Series(valores)
+    else:
+        columna = pd.Series(valores, index=np.flatnonzero(validas)).reindex(range(n))
+    if np.issubdtype(valores.dtype, np.integer):
+        columna = columna.astype('Int64')
+    elif valores.dtype == object:
+        columna = columna.astype('string')
+    return columna
+
+# Devuelve la salida del trozo y la máscara de filas que no cumplen el
+# esquema, que salen con la predicción vacía
+def puntuar(df, conservar=(), modelo=None):
+    modelo = modelo or MODELO
+    X = modelo.matriz_tabla(df)
+    salida = df[list(conservar)].reset_index(drop=True)
+    invalidas, _ = modelo.filas_invalidas(X)
+    validas = ~invalidas
+    if invalidas.any():
+        X = X[validas]
+    estimador = modelo.modelo
+    if hasattr(estimador, 'predict_proba'):
+        clases = estimador.classes_
+        # sklearn no admite lotes vacíos: un trozo sin filas válidas no se
+        # manda al modelo
+        with modelo.sin_comprobaciones():
+            probabilidades = estimador.predict_proba(X) if len(X) else np.empty((0, len(clases)))
+        # La predicción de un clasificador es la clase más probable
+        prediccion = clases[probabilidades.argmax(axis=1)]
+        salida['prediccion'] = completar(prediccion, validas, len(df))
+        for i, clase in enumerate(clases):
+            salida['prob_{}'.format(clase)] = completar(probabilidades[:, i], validas, len(df))
+    else:
+        # Sin filas válidas la predicción vacía lleva el tipo de las clases
+        # (o float en una regresión)
+        vacia = np.empty(0, dtype=getattr(estimador, 'classes_', np.empty(0)).dtype)
+        with modelo.sin_comprobaciones():
+            prediccion = estimador.predict(X) if len(X) else vacia
+        salida['prediccion'] = completar(prediccion, validas, len(df))
+    if modelo.etiquetas is not None:
+        etiquetas = np.array(modelo.etiquetas, dtype=object)[np.asarray(prediccion).astype(int)]
+        salida['etiqueta'] = completar(etiquetas, validas, len(df))
+    return salida, invalidas
+
+def leer_trozos(entrada, filas_lote):
+    if entrada.endswith('.parquet'):
+        if pyarrow is None:
+            raise ValueError('leer Parquet necesita el paquete pyarrow')
+        for lote in pyarrow.parquet.ParquetFile(entrada).iter_batches(batch_size=filas_lote):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(entrada, chunksize=filas_lote)
+
+# Tipos de Arrow de las columnas de la entrada que se conocen de antemano
+# (los de un Parquet); de un CSV no se sabe nada hasta leerlo
+def tipos_entrada(entrada, columnas):
+    if not entrada.endswith('.parquet') or pyarrow is None:
+        return {}
+    esquema = pyarrow.parquet.ParquetFile(entrada).schema_arrow
+    return {c: esquema.field(c).type for c in columnas if c in esquema.names}
+
+class Escritor:
+    def __init__(self, salida, formato, tipos=None):
+        if formato != 'csv' and pyarrow is None:
+            raise ValueError('el formato {} necesita el paquete pyarrow'.format(formato))
+        self.salida = salida
+        self.formato = formato
+        self.tipos = tipos or {}
+        self.escritor = None
+        self.fichero = None
+
+    # Esquema de la salida a partir del primer trozo: las columnas con tipo
+    # conocido lo llevan, y las que en ese trozo solo tienen vacíos (tipo
+    # null, al que no se puede convertir nada) pasan a string
+    def fijar_esquema(self, esquema):
+        campos = []
+        for campo in esquema:
+            if campo.name in self.tipos:
+                campo = campo.with_type(self.tipos[campo.name])
+            elif pyarrow.types.is_null(campo.type):
+                campo = campo.with_type(pyarrow.string())
+            campos.append(campo)
+        return pyarrow.schema(campos)
+
+    def escribir(self, df):
+        if self.formato == 'csv':
+            df.to_csv(self.salida, mode='a' if self.fichero else 'w', header=not self.fichero, index=False)
+            self.fichero = True
+            return
+        tabla = pyarrow.Table.from_pandas(df, preserve_index=False)
+        if self.escritor is None:
+            self.esquema = self.fijar_esquema(tabla.schema)
+            if self.formato == 'parquet':
+                self.escritor = pyarrow.parquet.ParquetWriter(self.salida, self.esquema)
+            else:
+                self.fichero = pyarrow.OSFile(self.salida, 'wb')
+                self.escritor = pyarrow.ipc.new_file(self.fichero, self.esquema)
+        self.escritor.write_table(tabla.cast(self.esquema))
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        if self.formato != 'csv' and self.fichero is not None:
+            self.fichero.close()
+
+# Devuelve las filas escritas y cuántas no cumplían el esquema. Con
+# rechazos, las filas no válidas de la entrada se copian a ese CSV
+def puntuar_fichero(nombre, entrada, salida, formato='parquet', procesos=1, filas_lote=50000, conservar=(),
+                    mmap=False, rechazos=None):
+    filas = 0
+    rechazadas = 0
+    escritor = Escritor(salida, formato, tipos_entrada(entrada, conservar) if formato != 'csv' else None)
+    escritor_rechazos = Escritor(rechazos, 'csv') if rechazos else None
+
+    def escribir(trozo, hecho):
+        nonlocal filas, rechazadas
+        df, invalidas = hecho
+        escritor.escribir(df)
+        filas += len(df)
+        if invalidas.any():
+            rechazadas += int(invalidas.sum())
+            if escritor_rechazos is not None:
+                escritor_rechazos.escribir(trozo[invalidas])
+
+    try:
+        if procesos > 1:
+            with ProcessPoolExecutor(procesos, initializer=iniciar, initargs=(nombre, mmap)) as pool:
+                pendientes = deque()
+                for trozo in leer_trozos(entrada, filas_lote):
+                    pendientes.append((trozo, pool.submit(puntuar, trozo, conservar)))
+                    if len(pendientes) >= 2 * procesos:
+                        trozo, tarea = pendientes.popleft()
+                        escribir(trozo, tarea.result())
+                while pendientes:
+                    trozo, tarea = pendientes.popleft()
+                    escribir(trozo, tarea.result())
+        else:
+            modelo = modelos.Modelo(nombre, mmap=mmap)
+            for trozo in leer_trozos(entrada, filas_lote):
+                escribir(trozo, puntuar(trozo, conservar, modelo))
+    finally:
+        escritor.cerrar()
+        if escritor_rechazos is not None:
+            escritor_rechazos.cerrar()
+    return filas, rechazadas
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Puntúa un CSV o Parquet por trozos con un modelo guardado')
+    parser.add_argument('modelo', choices=list(modelos.MODELOS))
+    parser.add_argument('entrada', help='fichero .csv o .parquet')
+    parser.add_argument('salida')
+    parser.add_argument('-f', '--formato', choices=FORMATOS, default=None,
+                        help='por defecto según la extensión de la salida (parquet si no se reconoce)')
+    parser.add_argument('-p', '--procesos', type=int, default=os.cpu_count() or 1, help='procesos del pool')
+    parser.add_argument('--filas-lote', type=int, default=50000, help='filas de cada trozo')
+    parser.add_argument('--conservar', default='',
+                        help='columnas de la entrada que se copian a la salida, separadas por comas')
+    parser.add_argument('--mmap', action='store_true',
+                        help='carga el artefacto de artefactos.py con mmap (los procesos comparten los arrays)')
+    parser.add_argument('--rechazos', default=None,
+                        help='CSV donde se copian las filas de la entrada que no cumplen el esquema')
+    args = parser.parse_args()
+
+    formato = args.formato
+    if formato is None:
+        extension = os.path.splitext(args.salida)[1].lstrip('.')
+        formato = extension if extension in FORMATOS else 'parquet'
+    conservar = [c for c in args.conservar.split(',') if c]
+
+    inicio = time.perf_counter()
+    try:
+        filas, rechazadas = puntuar_fichero(args.modelo, args.entrada, args.salida, formato, args.procesos,
+                                            args.filas_lote, conservar, args.mmap, args.rechazos)
+    except (ValueError, KeyError) as e:
+        print('Error: {}'.format(e), file=sys.stderr)
+        sys.exit(1)
+    segundos = time.perf_counter() - inicio
+    print('{} filas en {:.2f} s ({:.0f} filas/s) -> {}'.format(filas, segundos, filas / max(segundos, 1e-9),
+                                                              args.salida), file=sys.stderr)
+    if rechazadas:
+        print('{} filas no cumplen el esquema y salen sin predicción{}'.format(
+            rechazadas, ' (copiadas a {})'.format(args.rechazos) if args.rechazos else ''), file=sys.stderr)
@@ -0,0 +1,173 @@
+# Servidor local de predicciones: carga los modelos de modelos.py una sola
+# vez y los mantiene en memoria, así cada predicción ya no paga arrancar
+# Python, importar sklearn y deserializar el .pkl. Habla HTTP con JSON por
+# TCP o por un socket Unix:
+#   GET  /modelos              columnas, preguntas y etiquetas de cada modelo
+#   POST /predecir/<modelo>    {"fila": [...]} o {"filas": [[...], {...}]}
+#        -> {"predicciones": [...], "etiquetas": [...], "ms_modelo": 0.4}
+#   GET  /estadisticas         lotes y filas por lote de cada modelo (con
+#                              --microlotes) y aciertos de la caché (con
+#                              --cache)
+# Con --microlotes las peticiones de una fila que llegan a la vez se juntan
+# en un solo predict (ver microlotes.py). Con --cache N las filas repetidas
+# salen de una caché LRU de N entradas (ver cache_predicciones.py).
+#
+#   python3 servidor_modelos.py                     (127.0.0.1:8765)
+#   python3 servidor_modelos.py --socket /tmp/modelos.sock
+# y desde otra terminal cliente_modelos.py. Con --inactivo N se cierra solo
+# tras N segundos sin peticiones (así lo arranca predecir.py --arrancar).
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import modelos
+from cache_predicciones import CachePredicciones
+from microlotes import Agrupador
+
+class Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # El servidor guarda los modelos cargados en self.server.modelos
+
+    def responder(self, codigo, datos):
+        self.server.ultima = time.monotonic()
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/modelos':
+            self.responder(200, {nombre: modelos.descripcion(nombre) for nombre in self.server.modelos})
+        elif self.path.rstrip('/') == '/estadisticas':
+            datos = {nombre: agrupador.estadisticas() for nombre, agrupador in self.server.agrupadores.items()}
+            for nombre, modelo in self.server.modelos.items():
+                if modelo.cache is not None:
+                    datos.setdefault(nombre, {})['cache'] = modelo.cache.estadisticas()
+            self.responder(200, datos)
+        else:
+            self.responder(404, {'error': 'ruta desconocida: {}'.format(self.path)})
+
+    def do_POST(self):
+        partes = self.path.strip('/').split('/')
+        longitud = int(self.headers.get('Content-Length', 0))
+        cuerpo = self.rfile.read(longitud)
+        if len(partes) != 2 or partes[0] != 'predecir':
+            self.responder(404, {'error': 'ruta desconocida: {}'.format(self.path)})
+            return
+        modelo = self.server.modelos.get(partes[1])
+        if modelo is None:
+            self.responder(404, {'error': 'modelo desconocido: {}'.format(partes[1])})
+            return
+        try:
+            peticion = json.loads(cuerpo)
+            filas = peticion['filas'] if 'filas' in peticion else [peticion['fila']]
+            agrupador = self.server.agrupadores.get(partes[1])
+            inicio = time.perf_counter()
+            if agrupador is not None and len(filas) == 1:
+                predicciones = [agrupador.predecir(filas[0])]
+            else:
+                predicciones = modelo.predecir(filas)
+            ms = (time.perf_counter() - inicio) * 1000
+        except (ValueError, KeyError, TypeError) as e:
+            self.responder(400, {'error': str(e)})
+            return
+        respuesta = {'predicciones': predicciones, 'ms_modelo': round(ms, 3)}
+        if modelo.etiquetas is not None:
+            respuesta['etiquetas'] = [modelo.etiqueta(p) for p in predicciones]
+        self.responder(200, respuesta)
+
+    # Por un socket Unix no hay dirección de cliente
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, formato, *args):
+        if self.server.verbose:
+            super().log_message(formato, *args)
+
+# La cola de conexiones por defecto (5) se llena con muchos clientes a la vez
+class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def crear_servidor(cargados, host='127.0.0.1', puerto=8765, ruta_socket=None, verbose=False,
+                   microlotes=False, max_lote=64, max_espera=0.002, cache=0):
+    if ruta_socket:
+        if os.path.exists(ruta_socket):
+            os.remove(ruta_socket)
+        servidor = ServidorUnix(ruta_socket, Manejador)
+    else:
+        servidor = Servidor((host, puerto), Manejador)
+    servidor.modelos = cargados
+    servidor.verbose = verbose
+    servidor.agrupadores = {}
+    servidor.ultima = time.monotonic()
+    if cache:
+        for modelo in cargados.values():
+            modelo.cache = CachePredicciones(modelo, cache)
+    if microlotes:
+        servidor.agrupadores = {nombre: Agrupador(modelo, max_lote, max_espera)
+                                for nombre, modelo in cargados.items()}
+    return servidor
+
+# Cierra el servidor cuando lleva `segundos` sin responder a nadie
+def cerrar_si_inactivo(servidor, segundos):
+    def vigilar():
+        while time.monotonic() - servidor.ultima < segundos:
+            time.sleep(min(1.0, segundos))
+        servidor.shutdown()
+    threading.Thread(target=vigilar, daemon=True).start()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sirve las predicciones de los modelos guardados')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--socket', default=None, help='escucha en este socket Unix en lugar de TCP')
+    parser.add_argument('--modelos', default=None,
+                        help='modelos a cargar separados por comas (por defecto {})'.format(','.join(modelos.MODELOS)))
+    parser.add_argument('--mmap', action='store_true',
+                        help='carga los artefactos de artefactos.py con mmap si existen')
+    parser.add_argument('--plano', action='store_true',
+                        help='usa los bosques convertidos con bosque_plano.py si existen')
+    parser.add_argument('--microlotes', action='store_true',
+                        help='junta en un solo predict las peticiones de una fila concurrentes')
+    parser.add_argument('--max-lote', type=int, default=64, help='filas como mucho por microlote')
+    parser.add_argument('--max-espera-ms', type=float, default=2.0,
+                        help='ms que se espera a más filas antes de predecir un microlote')
+    parser.add_argument('--cache', type=int, default=0,
+                        help='entradas de la caché LRU de predicciones de cada modelo (0 sin caché)')
+    parser.add_argument('--inactivo', type=float, default=None,
+                        help='se cierra tras estos segundos sin peticiones')
+    parser.add_argument('-v', '--verbose', action='store_true', help='muestra cada petición')
+    args = parser.parse_args()
+
+    nombres = args.modelos.split(',') if args.modelos else None
+    cargados = modelos.cargar_modelos(nombres, args.mmap, args.plano)
+    for nombre, modelo in cargados.items():
+        # Predicción de calentamiento para que no la pague el primer cliente
+        modelo.predecir([modelo.info['ejemplo']])
+        print('{:<10} cargado en {:.3f} s'.format(nombre, modelo.segundos_carga), file=sys.stderr)
+
+    servidor = crear_servidor(cargados, args.host, args.puerto, args.socket, args.verbose,
+                              args.microlotes, args.max_lote, args.max_espera_ms / 1000, args.cache)
+    print('Escuchando en {}'.format(args.socket or 'http://{}:{}'.format(args.host, args.puerto)), file=sys.stderr)
+    if args.inactivo:
+        cerrar_si_inactivo(servidor, args.inactivo)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
@@ -0,0 +1,60 @@
+# python3 -m pytest test_puntuar_lote.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import modelos
+import puntuar_lote
+
+FILAS = [[5.1, 3.5, 1.4, 0.2], [6.2, 2.9, 4.3, 1.3], [6.3, 3.3, 6.0, 2.5], [5.0, 3.4, 1.5, 0.2],
+         [6.7, 3.1, 4.4, 1.4], [7.7, 3.8, 6.7, 2.2], [4.9, 3.0, 1.4, 0.2], [5.8, 2.7, 5.1, 1.9]]
+
+# Una fila con la largura del sépalo negativa en mitad del segundo trozo:
+# esa sale vacía y el resto se puntúa igual que con el modelo directamente
+def test_fila_invalida_en_mitad_de_un_trozo(tmp_path):
+    df = pd.DataFrame(FILAS, columns=modelos.COLUMNAS_IRIS)
+    df['id'] = range(len(df))
+    df.loc[5, 'sepal length (cm)'] = -1.0
+    entrada = tmp_path / 'flores.csv'
+    df.to_csv(entrada, index=False)
+    salida = tmp_path / 'flores_puntuadas.csv'
+    rechazos = tmp_path / 'rechazos.csv'
+
+    filas, rechazadas = puntuar_lote.puntuar_fichero('flor', str(entrada), str(salida), 'csv', filas_lote=4,
+                                                     conservar=['id'], rechazos=str(rechazos))
+
+    assert (filas, rechazadas) == (8, 1)
+    resultado = pd.read_csv(salida)
+    assert resultado['id'].tolist() == list(range(8))
+    assert pd.isna(resultado.loc[5, 'prediccion']) and pd.isna(resultado.loc[5, 'etiqueta'])
+    assert resultado.drop(index=5)[['prob_0', 'prob_1', 'prob_2']].notna().all().all()
+    validas = df.drop(index=5)
+    esperado = modelos.Modelo('flor').modelo.predict(validas[modelos.COLUMNAS_IRIS].to_numpy())
+    assert np.array_equal(resultado.drop(index=5)['prediccion'].to_numpy(), esperado)
+    assert pd.read_csv(rechazos)['id'].tolist() == [5]
+
+# El primer trozo entero es inválido: el esquema del Parquet no puede salir
+# de él (etiqueta y la columna conservada vacía serían de tipo null) y los
+# trozos siguientes tienen que poder escribirse igual
+def test_parquet_con_el_primer_trozo_invalido(tmp_path):
+    df = pd.DataFrame(FILAS, columns=modelos.COLUMNAS_IRIS)
+    df['nota'] = [None] * 4 + ['a', 'b', 'c', 'd']
+    df.loc[0:3, 'petal width (cm)'] = -1.0
+    entrada = tmp_path / 'flores.parquet'
+    df.to_parquet(entrada, index=False)
+    salida = tmp_path / 'flores_puntuadas.parquet'
+
+    filas, rechazadas = puntuar_lote.puntuar_fichero('flor', str(entrada), str(salida), 'parquet', filas_lote=4,
+                                                     conservar=['nota'])
+
+    assert (filas, rechazadas) == (8, 4)
+    resultado = pd.read_parquet(salida)
+    assert resultado['nota'].tolist()[4:] == ['a', 'b', 'c', 'd']
+    assert resultado['prediccion'].isna().tolist() == [True] * 4 + [False] * 4
+    assert resultado['etiqueta'].iloc[4:].notna().all()
+    esperado = modelos.Modelo('flor').modelo.predict(df.iloc[4:][modelos.COLUMNAS_IRIS].to_numpy())
+    assert np.array_equal(resultado['prediccion'].iloc[4:].to_numpy(dtype=np.int64), esperado)
@@ -0,0 +1,89 @@
+# Validación de entradas con el esquema declarado en modelos.py, de una vez
+# para todo el lote (una operación de NumPy por columna y comprobación, no
+# una por fila). Cada columna del esquema puede llevar:
+#   tipo        'float' (por defecto), 'int' (número sin decimales) o 'texto'
+#   min, max    límites incluidos; con min_abierto / max_abierto se excluyen
+#   categorias  valores permitidos (para texto o para números como pclass)
+#   nulos       si admite valores vacíos (NaN/None), porque el pipeline los
+#               imputa; por defecto no
+# Los infinitos nunca se admiten. Una vez validado el lote, el modelo puede
+# llamarse con assume_finite y sklearn no vuelve a repasar cada valor.
+import numpy as np
+
+MAX_ERRORES = 5
+
+# Valores de una columna como array de NumPy, venga X como DataFrame o matriz
+def columna(X, columnas, nombre):
+    if hasattr(X, 'columns'):
+        return X[nombre].to_numpy()
+    return X[:, columnas.index(nombre)]
+
+def describir(regla):
+    if regla.get('tipo') == 'texto' and 'categorias' not in regla:
+        return 'un texto no vacío'
+    partes = []
+    if 'categorias' in regla:
+        partes.append('uno de {}'.format(', '.join(str(c) for c in regla['categorias'])))
+    if 'min' in regla:
+        partes.append('{} {}'.format('>' if regla.get('min_abierto') else '>=', regla['min']))
+    if 'max' in regla:
+        partes.append('{} {}'.format('<' if regla.get('max_abierto') else '<=', regla['max']))
+    if regla.get('tipo') == 'int':
+        partes.append('sin decimales')
+    return ' y '.join(partes) or 'un número finito'
+
+# Máscara de filas que no cumplen la regla de una columna
+def filas_malas(valores, regla):
+    tipo = regla.get('tipo', 'float')
+    if tipo == 'texto' or valores.dtype == object:
+        import pandas as pd
+        if tipo != 'texto':
+            # Columna numérica que llega como texto (p. ej. desde un CSV)
+            nulo = np.asarray(pd.isna(valores))
+            numeros = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype=float)
+            return (np.isnan(numeros) & ~nulo) | filas_malas(numeros, regla)
+        if 'categorias' not in regla:
+            return np.asarray(pd.isna(valores)) & (not regla.get('nulos', False))
+        # isin de pandas va por hash; np.isin con objetos ordena y es ~3
+        # veces más lento. Los vacíos solo se buscan entre las que no están
+        malas = ~pd.Series(valores).isin(regla['categorias']).to_numpy()
+        if regla.get('nulos', False) and malas.any():
+            malas[malas] = ~np.asarray(pd.isna(valores[malas]))
+        return malas
+    valores = valores.astype(float, copy=False)
+    nulo = np.isnan(valores)
+    malas = np.isinf(valores)
+    if not regla.get('nulos', False):
+        malas |= nulo
+    con_valor = ~nulo
+    if 'categorias' in regla:
+        malas |= con_valor & ~np.isin(valores, regla['categorias'])
+    if 'min' in regla:
+        malas |= con_valor & ((valores <= regla['min']) if regla.get('min_abierto') else (valores < regla['min']))
+    if 'max' in regla:
+        malas |= con_valor & ((valores >= regla['max']) if regla.get('max_abierto') else (valores > regla['max']))
+    if tipo == 'int':
+        malas |= con_valor & ~np.isinf(valores) & (valores != np.floor(valores))
+    return malas
+
+# Devuelve la máscara de filas inválidas y los primeros errores en texto
+def validar(X, columnas, esquema, max_errores=MAX_ERRORES):
+    n = len(X)
+    invalidas = np.zeros(n, dtype=bool)
+    errores = []
+    for nombre, regla in esquema.items():
+        valores = columna(X, columnas, nombre)
+        malas = filas_malas(valores, regla)
+        if not malas.any():
+            continue
+        invalidas |= malas
+        for fila in np.flatnonzero(malas)[:max_errores - len(errores)]:
+            valor = valores[fila]
+            valor = valor.item() if isinstance(valor, np.generic) else valor
+            if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+                errores.append("fila {}: '{}' no puede estar vacío".format(fila, nombre))
+            else:
+                errores.append("fila {}: '{}' = {!r} debe ser {}".format(fila, nombre, valor, describir(regla)))
+    if invalidas.sum() > len(errores):
+        errores.append('{} filas no válidas en total'.format(int(invalidas.sum())))
+    return invalidas, errores
@@ -1,17 +1,270 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
 import pandas as pd
 
-# Cargar el archivo CSV original
-df = pd.read_csv('Marvel_Movies_Dataset.csv')
-
-# Reemplazar comas por puntos en todas las columnas numéricas
-# Es importante asegurarse de que solo las columnas numéricas se vean afectadas
-df['IMDb'] = df['IMDb'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['IMDB_Metascore'] = df['IMDB_Metascore'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['RottenTomatoes_Critics'] = df['RottenTomatoes_Critics'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['RottenTomatoes_Audience'] = df['RottenTomatoes_Audience'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['Budget'] = df['Budget'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['Domestic_Gross'] = df['Domestic_Gross'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-df['Worldwide_Gross'] = df['Worldwide_Gross'].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
-
-# Guardar el archivo corregido
-df.to_csv('Marvel_Movies_Dataset_Copy.csv', index=False)
+# limpieza.py, la limpieza por lotes con salida tipada que comparten
+# limpiar_csv.py y limpiar_lote.py, está en BIGDATA/Hadoop
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BIGDATA', 'Hadoop'))
+import limpieza
+
+# Columnas numéricas del dataset de Marvel que vienen con coma decimal
+COLUMNAS = ['IMDb', 'IMDB_Metascore', 'RottenTomatoes_Critics', 'RottenTomatoes_Audience',
+            'Budget', 'Domestic_Gross', 'Worldwide_Gross']
+
+# Un número con coma o punto decimal opcional, p. ej. "7,9", "-12" o "3.5"
+PATRON_NUMERO = r'-?\d+(?:[.,]\d+)?'
+
+# Versión original: una lambda por celda con Series.apply, columna a columna.
+# El resultado sigue siendo texto. Se mantiene para comparar en el benchmark.
+def corregir_apply(df, columnas=COLUMNAS):
+    for columna in columnas:
+        df[columna] = df[columna].apply(lambda x: str(x).replace(',', '.') if isinstance(x, str) else x)
+    return df
+
+# Columnas de texto en las que todos los valores de la muestra (todo el
+# fichero con muestra=None) son números y alguno lleva coma decimal
+def detectar_columnas(df, muestra=1000):
+    columnas = []
+    for columna in df.columns:
+        if df[columna].dtype != object:
+            continue
+        valores = df[columna].dropna()
+        if muestra is not None:
+            valores = valores.head(muestra)
+        valores = valores.astype(str)
+        if valores.empty:
+            continue
+        if valores.str.fullmatch(PATRON_NUMERO).all() and valores.str.contains(',', regex=False).any():
+            columnas.append(columna)
+    return columnas
+
+# Versión vectorizada: las columnas de texto se concatenan en una sola
+# Series, se hace un único str.replace sobre todas y se convierten a float de
+# golpe. Si algún valor no es un número no se toca df y se lanza ValueError
+# con la columna y el valor, en vez de dejarlo como NaN sin avisar.
+def corregir(df, columnas=COLUMNAS):
+    columnas = [c for c in columnas if df[c].dtype == object]
+    if not columnas:
+        return df
+    valores = pd.concat([df[c] for c in columnas], ignore_index=True).str.replace(',', '.', regex=False)
+    try:
+        numeros = valores.to_numpy(dtype=float)
+    except ValueError:
+        for i, columna in enumerate(columnas):
+            trozo = valores.iloc[i * len(df):(i + 1) * len(df)]
+            malos = trozo[trozo.notna() & pd.to_numeric(trozo, errors='coerce').isna()]
+            if not malos.empty:
+                raise ValueError("la columna {} tiene valores que no son números, p. ej. {!r}".format(
+                    columna, df[columna].iloc[malos.index[0] - i * len(df)])) from None
+        raise
+    df[columnas] = numeros.reshape(len(columnas), len(df)).T
+    return df
+
+# Lectura con la corrección hecha por el propio parser de pandas: decimal=','
+# convierte directamente a float las columnas numéricas con coma decimal
+def leer_con_decimal(entrada):
+    return pd.read_csv(entrada, decimal=',')
+
+# Plan de tipos: se infiere una vez a partir de una muestra del fichero y se
+# guarda en .planes/<hash de la cabecera>.json junto a la entrada, así los
+# ficheros con la misma cabecera (las exportaciones de cada noche) lo
+# reutilizan y read_csv ya no tiene que adivinar tipos ni deja columnas object.
+#   tipo      int, float, category o string
+#   decimal   ',' si la columna viene con coma decimal (se lee como texto y
+#             se corrige con corregir)
+#   usecols   columnas que se leen (se quitan las "Unnamed" vacías)
+PATRON_ENTERO = r'-?\d+'
+PATRON_PUNTO = r'-?\d+(?:\.\d+)?'
+PATRON_COMA = r'-?\d+(?:,\d+)?'
+MUESTRA_PLAN = 10000
+MAX_CATEGORIAS = 1000
+VERSION_PLAN = 1
+
+def hash_cabecera(entrada):
+    with open(entrada, 'rb') as f:
+        cabecera = f.readline().rstrip(b'\r\n')
+    return hashlib.sha1(cabecera).hexdigest()
+
+def ruta_plan(entrada, clave):
+    return os.path.join(os.path.dirname(os.path.abspath(entrada)), '.planes', clave + '.json')
+
+def inferir_columna(valores):
+    valores = valores.dropna().astype(str).str.strip()
+    valores = valores[valores != '']
+    if valores.empty:
+        return None
+    if valores.str.fullmatch(PATRON_ENTERO).all():
+        return {'tipo': 'int', 'decimal': '.'}
+    if valores.str.fullmatch(PATRON_PUNTO).all():
+        return {'tipo': 'float', 'decimal': '.'}
+    if valores.str.fullmatch(PATRON_COMA).all():
+        return {'tipo': 'float', 'decimal': ','}
+    distintos = valores.nunique()
+    if distintos <= MAX_CATEGORIAS and distintos <= len(valores) // 2:
+        return {'tipo': 'category'}
+    return {'tipo': 'string'}
+
+def inferir_plan(entrada, muestra=MUESTRA_PLAN):
+    df = pd.read_csv(entrada, nrows=muestra, dtype=str)
+    columnas = {}
+    for columna in df.columns:
+        tipo = inferir_columna(df[columna])
+        if tipo is None:
+            if columna.startswith('Unnamed:'):
+                continue
+            tipo = {'tipo': 'string'}
+        columnas[columna] = tipo
+    return {'version': VERSION_PLAN, 'cabecera': hash_cabecera(entrada), 'muestra': len(df),
+            'usecols': list(columnas), 'columnas': columnas}
+
+# Devuelve el plan guardado para la cabecera de `entrada` o lo infiere y lo
+# guarda. El segundo valor dice si se ha reutilizado.
+def cargar_plan(entrada, reinferir=False, muestra=MUESTRA_PLAN):
+    ruta = ruta_plan(entrada, hash_cabecera(entrada))
+    if not reinferir and os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            plan = json.load(f)
+        if plan.get('version') == VERSION_PLAN:
+            return plan, True
+    plan = inferir_plan(entrada, muestra)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    return plan, False
+
+# Tipos para read_csv según el plan; los enteros con nulos como Int64
+def dtypes_plan(plan):
+    dtypes = {}
+    for columna, info in plan['columnas'].items():
+        if info.get('decimal') == ',':
+            dtypes[columna] = str
+        else:
+            dtypes[columna] = {'int': 'Int64', 'float': 'float64', 'category': 'category',
+                               'string': 'string'}[info['tipo']]
+    return dtypes
+
+def leer_con_plan(entrada, plan):
+    df = pd.read_csv(entrada, usecols=plan['usecols'], dtype=dtypes_plan(plan))
+    corregir(df, [c for c, info in plan['columnas'].items() if info.get('decimal') == ','])
+    return df
+
+# Lee con el plan guardado (o lo infiere). Si algo fuera de la muestra no
+# encaja con él, avisa por stderr y vuelve a inferirlo con el fichero entero.
+# Devuelve el DataFrame, el plan y si se ha reutilizado.
+def leer_plan(entrada, reinferir=False, muestra=MUESTRA_PLAN):
+    plan, reutilizado = cargar_plan(entrada, reinferir, muestra)
+    try:
+        return leer_con_plan(entrada, plan), plan, reutilizado
+    except (ValueError, TypeError) as e:
+        print("aviso: {}; se vuelve a inferir el plan con el fichero entero".format(e), file=sys.stderr)
+    plan, reutilizado = cargar_plan(entrada, True, None)
+    return leer_con_plan(entrada, plan), plan, reutilizado
+
+# Escribe el DataFrame conservando sus tipos: texto es el CSV de siempre con
+# cabecera; csv, parquet y feather como en limpieza.py (csv sin cabecera y
+# con el nulo de Hive; parquet y feather con pyarrow)
+def escribir(df, salida, formato='texto'):
+    if formato == 'texto':
+        df.to_csv(salida, index=False)
+    elif formato == 'csv':
+        df.to_csv(salida, header=False, index=False, na_rep=limpieza.NULO_HIVE)
+    elif limpieza.pyarrow is None:
+        raise ValueError('el formato {} necesita el paquete pyarrow'.format(formato))
+    elif formato == 'parquet':
+        df.to_parquet(salida, index=False)
+    else:
+        df.to_feather(salida)
+
+# DataFrame sintético con el formato del dataset para medir rendimiento
+def generar_ejemplo(filas, semilla=42):
+    rng = np.random.default_rng(semilla)
+    datos = {'Title': ['Película {}'.format(i) for i in range(filas)]}
+    for columna in COLUMNAS:
+        valores = np.round(rng.uniform(0, 1000, filas), 1).astype(str)
+        datos[columna] = np.char.replace(valores, '.', ',')
+    return pd.DataFrame(datos)
+
+# Filas/s de cada versión incluyendo la lectura del CSV, que es lo que
+# cuesta de verdad cuando se ejecuta el script
+def benchmark(filas):
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'ejemplo.csv')
+        generar_ejemplo(filas).to_csv(ruta, index=False)
+        versiones = [
+            ('apply (original)', lambda: corregir_apply(pd.read_csv(ruta))),
+            ('vectorizada', lambda: corregir(pd.read_csv(ruta))),
+            ('decimal al leer', lambda: leer_con_decimal(ruta)),
+        ]
+        for nombre, funcion in versiones:
+            inicio = time.perf_counter()
+            funcion()
+            segundos = time.perf_counter() - inicio
+            print("{:<18} {:>10} filas {:>8.3f} s {:>12.0f} filas/s".format(nombre, filas, segundos, filas / segundos))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cambia la coma decimal por punto en las columnas numéricas")
+    parser.add_argument("entrada", nargs="?", default='Marvel_Movies_Dataset.csv')
+    parser.add_argument("salida", nargs="?", default='Marvel_Movies_Dataset_Copy.csv')
+    parser.add_argument("--columnas", default=None,
+                        help="columnas a corregir separadas por comas (por defecto las del dataset de Marvel)")
+    parser.add_argument("--auto", action="store_true",
+                        help="detecta las columnas numéricas con coma decimal")
+    parser.add_argument("--al-leer", action="store_true",
+                        help="corrige al leer con read_csv(decimal=',')")
+    parser.add_argument("-f", "--formato", choices=["texto"] + limpieza.FORMATOS, default="texto",
+                        help="texto escribe el CSV con cabecera; sin --plan el resto usa limpieza.py con los "
+                             "tipos de tabla.txt, y con --plan se escriben los tipos del plan")
+    parser.add_argument("-p", "--plan", action="store_true",
+                        help="lee con el plan de tipos guardado para esta cabecera (lo infiere la primera vez)")
+    parser.add_argument("--reinferir", action="store_true",
+                        help="con --plan, vuelve a inferir el plan aunque exista")
+    parser.add_argument("--muestra", type=int, default=MUESTRA_PLAN,
+                        help="filas de muestra para inferir el plan")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="FILAS",
+                        help="compara filas/s de la versión con apply, la vectorizada y decimal al leer")
+    args = parser.parse_args()
+    if (args.plan or args.formato != "texto") and (args.auto or args.columnas or args.al_leer):
+        parser.error("--auto, --columnas y --al-leer solo se aplican con -f texto y sin --plan")
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        if args.plan:
+            df, plan, reutilizado = leer_plan(args.entrada, args.reinferir, args.muestra)
+            print("Plan {} ({})".format('reutilizado' if reutilizado else 'inferido',
+                                         ruta_plan(args.entrada, plan['cabecera'])))
+        elif args.formato != "texto":
+            # Limpieza común por lotes con los tipos de tabla.txt
+            filas, descartadas = limpieza.limpiar(args.entrada, args.salida, args.formato)
+            print("{} filas, {} descartadas -> {}".format(filas, descartadas, args.salida))
+            df = None
+        elif args.al_leer:
+            df = leer_con_decimal(args.entrada)
+        else:
+            # Cargar el archivo CSV original
+            df = pd.read_csv(args.entrada)
+            if args.auto:
+                try:
+                    corregir(df, detectar_columnas(df))
+                except ValueError as e:
+                    # La muestra no basta: se detectan con todas las filas
+                    print("aviso: {}; se vuelven a detectar las columnas con el fichero entero".format(e),
+                          file=sys.stderr)
+                    corregir(df, detectar_columnas(df, None))
+            else:
+                columnas = [c.strip() for c in args.columnas.split(',')] if args.columnas else COLUMNAS
+                try:
+                    corregir(df, columnas)
+                except ValueError as e:
+                    sys.exit("error: {}".format(e))
+
+        # Guardar el archivo corregido
+        if df is not None:
+            escribir(df, args.salida, args.formato)
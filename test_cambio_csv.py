@@ -0,0 +1,39 @@
+# python3 -m pytest test_cambio_csv.py
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cambio_csv
+
+def test_corregir_cambia_la_coma_decimal():
+    df = pd.DataFrame({'IMDb': ['7,9', '6,6'], 'Budget': ['140', None]})
+    cambio_csv.corregir(df, ['IMDb', 'Budget'])
+    assert df['IMDb'].tolist() == [7.9, 6.6]
+    assert df['Budget'].iloc[0] == 140.0 and pd.isna(df['Budget'].iloc[1])
+
+def test_corregir_no_deja_nan_sin_avisar():
+    df = pd.DataFrame({'IMDb': ['7,9', '6,6'], 'Budget': ['140', 'desconocido']})
+    with pytest.raises(ValueError, match="Budget.*'desconocido'"):
+        cambio_csv.corregir(df, ['IMDb', 'Budget'])
+    assert df['IMDb'].tolist() == ['7,9', '6,6']
+
+# Con una muestra de 2 filas Nota parece un número con coma decimal; la
+# tercera no lo es, así que el plan se vuelve a inferir con el fichero entero
+# y la columna se queda como texto en vez de llenarse de NaN
+def test_leer_plan_vuelve_a_inferir_si_la_muestra_no_basta(tmp_path, capsys):
+    entrada = tmp_path / 'datos.csv'
+    entrada.write_text('Titulo,Nota,Votos\nA,"7,9",10\nB,"6,6",20\nC,sin nota,30\n', encoding='utf-8')
+    df, plan, reutilizado = cambio_csv.leer_plan(str(entrada), muestra=2)
+    assert 'se vuelve a inferir' in capsys.readouterr().err
+    assert not reutilizado
+    assert plan['columnas']['Nota']['tipo'] == 'string'
+    assert df['Nota'].tolist() == ['7,9', '6,6', 'sin nota']
+    assert df['Votos'].tolist() == [10, 20, 30]
+
+    # La siguiente pasada reutiliza el plan ya corregido sin avisar
+    df, plan, reutilizado = cambio_csv.leer_plan(str(entrada))
+    assert reutilizado and capsys.readouterr().err == ''